@@ -7,9 +7,21 @@ Exposes subpackages:
 - handlers  → Telegram callback query handlers (dashboard, alerts, settings)
 - jobs      → background job scheduling / processors
 - utils     → helpers, I/O, environment, dashboard builder
+
+Subpackages are imported on first attribute access, so `import api` (and
+every serverless cold start that only needs part of it) stays cheap.
 """
 
-from . import commands, handlers, jobs, utils
+import importlib
+
+_SUBPACKAGES = ("commands", "handlers", "jobs", "utils")
+
+
+def __getattr__(name):
+    if name in _SUBPACKAGES:
+        return importlib.import_module(f".{name}", __name__)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 __all__ = [
     "commands",
@@ -5,6 +5,14 @@ Currently only:
   - start.py → /start command and deep-link filter handling
 """
 
-from .start import start
+import importlib
+
+
+def __getattr__(name):
+    # lazy: start.py pulls in telegram + the dashboard
+    if name == "start":
+        return importlib.import_module(".start", __name__).start
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 __all__ = ["start"]
@@ -5,10 +5,11 @@ from io import BytesIO
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 
-from api.utils.io import read_queue, write_queue
+from api.utils.io import read_queue, enqueue, ack
 from api.utils.state import USER_DISP, ALL_DASH_MSGS
+from api.utils.media import reply_media, remember_kind
 from api.handlers.dashboard import build_dashboard
-from shared.fan_registry import register_user, get_telegram_id
+from api.utils.resolve import register_user, get_telegram_id
 
 def _relay_keyboard(creator: str, content_id: str | None = None) -> InlineKeyboardMarkup:
     unlock_cb = f"unlock|{content_id}" if content_id else "unlock"
@@ -35,7 +36,8 @@ async def _send_relay_from_queue(bot_msg, cmd: dict):
     Requirements:
       - NO fallbacks visible to fans.
       - Only send if we have a usable TG file_id (Fan-scoped ideally).
-      - Support photo / animation (GIF) / video / document based on file_id.
+      - Support photo / animation (GIF) / video / document based on file_id
+        (kind memoized in utils.media, cascade only on a miss).
       - If nothing usable, DO NOTHING (silent skip).
     """
     creator = cmd.get("creator", "?")
@@ -66,29 +68,13 @@ async def _send_relay_from_queue(bot_msg, cmd: dict):
     if not fid:
         return  # no leaks to the client
 
-    # Try in order; if the type is wrong, Telegram will raise; we just move on.
-    try:
-        await bot_msg.reply_photo(photo=fid, caption=caption, reply_markup=_relay_keyboard(creator, content_id))
-        return
-    except Exception:
-        pass
-    try:
-        await bot_msg.reply_animation(animation=fid, caption=caption, reply_markup=_relay_keyboard(creator, content_id))
-        return
-    except Exception:
-        pass
-    try:
-        await bot_msg.reply_video(video=fid, caption=caption, reply_markup=_relay_keyboard(creator, content_id))
-        return
-    except Exception:
-        pass
-    try:
-        await bot_msg.reply_document(document=fid, caption=caption, reply_markup=_relay_keyboard(creator, content_id))
-        return
-    except Exception:
-        pass
+    tv = cmd.get("teaser")
+    if isinstance(tv, dict) and tv.get("file_id") == fid:
+        remember_kind(fid, tv.get("kind"))
+
+    # Memoized kind first; on a miss try photo → animation → video → document.
     # If all attempts fail, do not send any text fallback to the fan.
-    return
+    await reply_media(bot_msg, fid, caption=caption, reply_markup=_relay_keyboard(creator, content_id))
 
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -105,24 +91,22 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     USER_DISP[tg] = disp
 
     # (Informational) Let Proxy know this fan exists
-    queue = read_queue()
-    queue.append({"type": "joined", "nyx_id": str(tg), "display": disp})
-    write_queue(queue)
+    enqueue({"type": "joined", "nyx_id": str(tg), "display": disp})
 
     # Deep-link filter handling
     if context.args:
         arg = context.args[0]
         queue = read_queue()
-        kept, to_send = [], []
+        to_send = []
         for c in queue:
             try:
                 if get_telegram_id(str(c.get("nyx_id"))) != tg:
-                    kept.append(c); continue
+                    continue
                 if c.get("type") not in ("relay", "subchg", "dm", "fan_relay", "fan_dm"):
-                    kept.append(c); continue
+                    continue
                 parts = arg.split("_", 2)
                 if len(parts) != 3:
-                    kept.append(c); continue
+                    continue
                 frag_type, frag_creator = parts[1], parts[2]
                 base = (
                     "relay" if c.get("type") in ("relay", "fan_relay")
@@ -130,11 +114,9 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 )
                 if frag_type == base and c.get("creator") == frag_creator:
                     to_send.append(c)
-                else:
-                    kept.append(c)
             except Exception:
-                kept.append(c)
-        write_queue(kept)
+                continue
+        ack(to_send)
 
         for c in to_send:
             t = c.get("type")
@@ -5,24 +5,23 @@ Exposes:
 - register_handlers → attaches commands and callback query handlers
 """
 
-from telegram.ext import CommandHandler, CallbackQueryHandler
-
-# Import callback functions at module load (safe; no circular with commands)
-from .callbacks import (
-    show_alerts,
-    show_digest,
-    show_settings,
-    show_settings_menu,
-    set_daily,
-    set_weekly,
-    toggle_mute,
-    back_to_post,
-    # unlock flow
-    unlock_start,
-    unlock_back,
-    unlock_confirm,
-)
-from .error_handler import setup_error_handler
+import importlib
+
+# name → module; imported on first use (callbacks pull in telegram + the dashboard)
+_LAZY = {
+    "show_alerts": ".callbacks",
+    "show_digest": ".callbacks",
+    "show_settings": ".callbacks",
+    "setup_error_handler": ".error_handler",
+}
+
+
+def __getattr__(name):
+    mod = _LAZY.get(name)
+    if mod is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(mod, __name__), name)
+
 
 __all__ = [
     "show_alerts",
@@ -38,8 +37,37 @@ def register_handlers(app):
     Register all handlers (commands + callbacks) for NyxFan.
     Mirrors the wiring from the original single-file index.py.
     """
+    from telegram.ext import CommandHandler as _CommandHandler, CallbackQueryHandler as _CallbackQueryHandler
+    from api.utils.metrics import timed
+
+    # every handler call is timed (nyxfan_handler_seconds{handler=<function name>})
+    def CommandHandler(command, callback, *args, **kwargs):
+        return _CommandHandler(command, _timed(callback), *args, **kwargs)
+
+    def CallbackQueryHandler(callback, *args, **kwargs):
+        return _CallbackQueryHandler(_timed(callback), *args, **kwargs)
+
+    def _timed(callback):
+        return timed("nyxfan_handler_seconds", "nyxfan_handler_errors_total", handler=callback.__name__)(callback)
+
     # Import /start inside the function to avoid circular import with commands.start
-    from api.commands import start
+    from api.commands.start import start
+    from .callbacks import (
+        show_alerts,
+        show_digest,
+        show_settings,
+        show_settings_menu,
+        set_immediate,
+        set_daily,
+        set_weekly,
+        toggle_mute,
+        back_to_post,
+        # unlock flow
+        unlock_start,
+        unlock_back,
+        unlock_confirm,
+    )
+    from .error_handler import setup_error_handler
 
     # Command handlers
     app.add_handler(CommandHandler("start", start))
@@ -51,6 +79,7 @@ def register_handlers(app):
 
     # Per-post Settings menu callbacks
     app.add_handler(CallbackQueryHandler(show_settings_menu, pattern=r"^settings\|.+$"))
+    app.add_handler(CallbackQueryHandler(set_immediate,      pattern=r"^set_immediate\|.+$"))
     app.add_handler(CallbackQueryHandler(set_daily,          pattern=r"^set_daily\|.+$"))
     app.add_handler(CallbackQueryHandler(set_weekly,         pattern=r"^set_weekly\|.+$"))
     app.add_handler(CallbackQueryHandler(toggle_mute,        pattern=r"^toggle_mute\|.+$"))
@@ -10,11 +10,14 @@ from telegram import (
 )
 from telegram.ext import ContextTypes
 
-from api.utils.io import read_queue, write_queue, read_notifs, write_notifs
+from api.utils.io import read_queue, enqueue, ack, read_notifs, write_notifs, get_prefs
 from api.utils.state import ORIG_CAPTION, ALL_DASH_MSGS
 from api.utils.env import BOT_USERNAME
 from api.handlers.dashboard import build_dashboard
-from shared.fan_registry import get_telegram_id
+from api.utils.media import reply_media, remember_kind
+from api.utils.completion import expect as expect_delivery, wait as wait_delivery
+from api.jobs.digest import held, release
+from api.utils.resolve import get_telegram_id
 
 
 # ───────────────────────────── helpers ─────────────────────────────
@@ -104,42 +107,12 @@ def _fix_dash_header(text: str, user_display: str, tg_id: int) -> str:
     except Exception:
         return text
 
-async def _await_unlock_delivery(content_id: str, chat_id: int, *, timeout: float = 10.0, poll: float = 0.25) -> bool:
-    """
-    Wait until the Proxy has finished delivering the unlock (matching unlock_deliver
-    disappears from the queue). This ensures the dashboard lands AFTER the last unlockable.
-    """
-    import time, asyncio
-    deadline = time.monotonic() + timeout
-    while time.monotonic() < deadline:
-        try:
-            q = read_queue()
-            pending = False
-            for c in q:
-                try:
-                    if (
-                        isinstance(c, dict)
-                        and c.get("type") in ("unlock_deliver", "fan_unlock_deliver")
-                        and c.get("content_id") == content_id
-                        and (c.get("teaser_msg_chat_id") or c.get("fan_chat_id")) == chat_id
-                    ):
-                        pending = True
-                        break
-                except Exception:
-                    pass
-            if not pending:
-                return True
-        except Exception:
-            pass
-        await asyncio.sleep(poll)
-    return False
-
 async def _send_relay_from_cmd(msg, cmd: dict) -> None:
     """
     Fan-side 'View All' sender for a single RELAY item.
     Requirements:
       - Use ONLY Telegram file_ids (Fan-scoped preferred, but any file_id attempt quietly).
-      - Try photo → animation → video → document.
+      - Use the memoized kind; only on a miss try photo → animation → video → document.
       - If nothing usable, DO NOTHING (no fan-visible text fallback).
     """
     creator = cmd.get("creator", "?")
@@ -170,28 +143,13 @@ async def _send_relay_from_cmd(msg, cmd: dict) -> None:
     if not fid:
         return
 
-    # Try in order; if wrong kind, Telegram raises → silently try next
-    try:
-        await msg.reply_photo(photo=fid, caption=caption, reply_markup=_relay_keyboard(creator, content_id))
-        return
-    except Exception:
-        pass
-    try:
-        await msg.reply_animation(animation=fid, caption=caption, reply_markup=_relay_keyboard(creator, content_id))
-        return
-    except Exception:
-        pass
-    try:
-        await msg.reply_video(video=fid, caption=caption, reply_markup=_relay_keyboard(creator, content_id))
-        return
-    except Exception:
-        pass
-    try:
-        await msg.reply_document(document=fid, caption=caption, reply_markup=_relay_keyboard(creator, content_id))
-        return
-    except Exception:
-        pass
+    tv = cmd.get("teaser")
+    if isinstance(tv, dict) and tv.get("file_id") == fid:
+        remember_kind(fid, tv.get("kind"))
+
+    # Memoized kind first; on a miss Telegram raises for the wrong kind → try next.
     # No fan-visible fallback.
+    await reply_media(msg, fid, caption=caption, reply_markup=_relay_keyboard(creator, content_id))
 
 
 def _get_user_prefs(tg_id: int, creator: str) -> dict:
@@ -204,18 +162,11 @@ def _get_user_prefs(tg_id: int, creator: str) -> dict:
         }
       }
     """
-    data = read_notifs()
-    user = data.get(str(tg_id), {}) if isinstance(data, dict) else {}
-    prefs = user.get(creator, {}) if isinstance(user, dict) else {}
-    if not isinstance(prefs, dict):
-        prefs = {}
-    prefs.setdefault("mode", "immediate")
-    prefs.setdefault("muted", False)
-    return prefs
+    return get_prefs(tg_id, creator)
 
 
 def _set_user_prefs(tg_id: int, creator: str, **changes) -> dict:
-    data = read_notifs()
+    data = read_notifs(fresh=True)   # not the throttled cache: we write the whole file back
     if not isinstance(data, dict):
         data = {}
     user = data.setdefault(str(tg_id), {})
@@ -226,8 +177,12 @@ def _set_user_prefs(tg_id: int, creator: str, **changes) -> dict:
     if not isinstance(prefs, dict):
         prefs = {}
         user[creator] = prefs
+    was_blocked = bool(prefs.get("muted", False)) or held(prefs)
     prefs.update(changes)
     write_notifs(data)
+    if was_blocked and not (prefs.get("muted", False) or held(prefs)):
+        # muted / digest-held items the consumer already passed go out now
+        release(tg_id, creator)
     return prefs
 
 
@@ -240,7 +195,6 @@ async def show_alerts(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     queue = read_queue()
     pending: List[dict] = []
-    kept: List[dict] = []
     for c in queue:
         try:
             if (
@@ -248,21 +202,16 @@ async def show_alerts(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 and c.get("type") in ("relay", "dm", "subchg", "fan_relay", "fan_dm")
                 and get_telegram_id(str(c.get("nyx_id"))) == user_tg
             ):
-                # Only surface muted creators; un-muted never appear here
+                # Only muted creators and those held for a daily/weekly digest;
+                # immediate ones were already delivered
                 creator = str(c.get("creator", "?"))
-                from api.utils.io import read_notifs
-                prefs = (read_notifs() or {}).get(str(user_tg), {}).get(creator, {}) or {}
-                if prefs.get("muted", False):
+                prefs = get_prefs(user_tg, creator)
+                if prefs["muted"] or held(prefs):
                     pending.append(c)
-                else:
-                    kept.append(c)
-            else:
-                kept.append(c)
         except Exception:
-            kept.append(c)
+            continue
 
-    from api.utils.io import write_queue
-    write_queue(kept)
+    ack(pending)
 
     for c in pending:
         t = c.get("type")
@@ -337,7 +286,7 @@ async def show_settings(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def show_settings_menu(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     Per-post 'Settings' button → edit that message's caption into a settings menu
-    with buttons for Daily / Weekly / Toggle Mute / Back.
+    with buttons for Immediate / Daily / Weekly / Toggle Mute / Back.
     """
     qd = update.callback_query
     await qd.answer()
@@ -367,7 +316,8 @@ async def show_settings_menu(update: Update, context: ContextTypes.DEFAULT_TYPE)
         "Choose an option below:",
     ]
     kb = InlineKeyboardMarkup([
-        [InlineKeyboardButton("Daily",   callback_data=f"set_daily|{creator}"),
+        [InlineKeyboardButton("Immediate", callback_data=f"set_immediate|{creator}"),
+         InlineKeyboardButton("Daily",   callback_data=f"set_daily|{creator}"),
          InlineKeyboardButton("Weekly",  callback_data=f"set_weekly|{creator}")],
         [InlineKeyboardButton("Toggle Mute", callback_data=f"toggle_mute|{creator}")],
         [InlineKeyboardButton("Back",    callback_data=f"back|{creator}")],
@@ -383,6 +333,18 @@ async def show_settings_menu(update: Update, context: ContextTypes.DEFAULT_TYPE)
         pass
 
 
+async def set_immediate(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    qd = update.callback_query
+    await qd.answer()
+    parts = (qd.data or "").split("|", 1)
+    if len(parts) != 2:
+        return
+    creator = parts[1]
+    tg = update.effective_user.id
+    prefs = _set_user_prefs(tg, creator, mode="immediate")
+    await _refresh_settings_menu(qd, creator, prefs)
+
+
 async def set_daily(update: Update, context: ContextTypes.DEFAULT_TYPE):
     qd = update.callback_query
     await qd.answer()
@@ -434,7 +396,8 @@ async def _refresh_settings_menu(qd, creator: str, prefs: dict) -> None:
         "Choose an option below:",
     ]
     kb = InlineKeyboardMarkup([
-        [InlineKeyboardButton("Daily",   callback_data=f"set_daily|{creator}"),
+        [InlineKeyboardButton("Immediate", callback_data=f"set_immediate|{creator}"),
+         InlineKeyboardButton("Daily",   callback_data=f"set_daily|{creator}"),
          InlineKeyboardButton("Weekly",  callback_data=f"set_weekly|{creator}")],
         [InlineKeyboardButton("Toggle Mute", callback_data=f"toggle_mute|{creator}")],
         [InlineKeyboardButton("Back",    callback_data=f"back|{creator}")],
@@ -583,7 +546,9 @@ async def unlock_confirm(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if reg and isinstance(reg.get("items"), list):
         items = reg["items"]
 
-    q.append({
+    # Listen before enqueueing so a fast delivery can't finish unheard
+    delivered = expect_delivery(content_id, chat_id)
+    enqueue({
         "type": "fan_unlock_deliver",
         "nyx_id": str(tg_id),
         "teaser_msg_chat_id": chat_id,
@@ -591,7 +556,6 @@ async def unlock_confirm(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "content_id": content_id,
         "items": items,
     })
-    write_queue(q)
 
     # revert caption to original + toast
     orig_key = f"{chat_id}:{msg_id}"
@@ -607,9 +571,9 @@ async def unlock_confirm(update: Update, context: ContextTypes.DEFAULT_TYPE):
     except Exception:
         pass
 
-    # Wait for proxy to finish deliver → then insert fresh dashboard
+    # Wait for the delivery job to signal completion → then insert fresh dashboard
     try:
-        await _await_unlock_delivery(content_id, chat_id, timeout=6.0, poll=0.25)
+        await wait_delivery(delivered, timeout=6.0)
     except Exception:
         pass
     try:
@@ -4,17 +4,9 @@ from __future__ import annotations
 from typing import Tuple, List, Dict, Any
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 
-from api.utils.io import read_queue, read_notifs
+from api.utils.pending import summary as pending_summary
 from api.utils.state import USER_DISP
 from api.utils.env import BOT_USERNAME
-from shared.fan_registry import get_telegram_id
-
-
-def _is_creator_muted(tg_id: int, creator: str) -> bool:
-    data = read_notifs() or {}
-    u = data.get(str(tg_id), {}) if isinstance(data, dict) else {}
-    prefs = u.get(creator, {}) if isinstance(u, dict) else {}
-    return bool(prefs.get("muted", False))
 
 
 def build_dashboard(tg_id: int) -> Tuple[str, InlineKeyboardMarkup]:
@@ -28,32 +20,8 @@ def build_dashboard(tg_id: int) -> Tuple[str, InlineKeyboardMarkup]:
     disp = USER_DISP.get(tg_id, str(tg_id))
     header = f"{disp}’s Dashboard"
 
-    queue = read_queue()
-
-    # creator → {posts, prices, dms}
-    summary: dict[str, dict[str, int]] = {}
-    for c in queue:
-        try:
-            t = c.get("type")
-            if t not in ("relay", "subchg", "dm", "fan_relay", "fan_dm"):
-                continue
-            if get_telegram_id(str(c.get("nyx_id"))) != tg_id:
-                continue
-
-            creator = str(c.get("creator", "?"))
-            if not _is_creator_muted(tg_id, creator):
-                # un-muted alerts should NEVER appear on the dashboard
-                continue
-
-            grp = summary.setdefault(creator, {"posts": 0, "prices": 0, "dms": 0})
-            if t in ("relay", "fan_relay"):
-                grp["posts"] += 1
-            elif t == "subchg":
-                grp["prices"] += 1
-            elif t in ("dm", "fan_dm"):
-                grp["dms"] += 1
-        except Exception:
-            continue
+    # creator → {posts, prices, dms}; kept incrementally, muted creators only
+    summary = pending_summary(tg_id)
 
     if summary:
         lines = ["🔔 *Pending Alerts:*", ""]
@@ -3,14 +3,22 @@
 NyxFan entrypoint.
 
 Wires together:
-- utils.env        → builds `app`
+- utils.env        → builds the Telegram `application`
 - utils.errors     → global error handler
 - handlers.*       → /start and UI callbacks
 - jobs.refresh     → background job to process dash refresh pings (ONLY)
+- jobs.wakeup      → runs those jobs as soon as work shows up (the schedule is a safety poll)
+- jobs.digest      → daily / weekly digests for fans not on "immediate"
+- webhook          → `app`, the WSGI server Vercel serves (/api/webhook, /api/drain)
+
+`python api/index.py` runs long-polling with the background workers;
+on Vercel the same handlers run per request through the webhook.
+The Application (and the handler modules) are only built on first use.
 """
 
 # --- Import path bootstrap: ensure the directory that CONTAINS 'api/' is on sys.path
 from pathlib import Path
+import os
 import sys as _sys
 _HERE = Path(__file__).resolve()
 _PROJECT_ROOT = _HERE.parents[1]  # the directory that contains the 'api' package
@@ -18,43 +26,170 @@ if str(_PROJECT_ROOT) not in _sys.path:
     _sys.path.insert(0, str(_PROJECT_ROOT))
 # --- end bootstrap
 
-from api.utils.env import app
-from api.utils.errors import on_error
-from api.handlers import register_handlers
-from api.jobs.refresh import process_fan_queue
-from api.jobs.processor_fan import process_fan_jobs
-
-# Error handler
-app.add_error_handler(on_error)
-
-# Register all bot handlers (commands + callbacks)
-register_handlers(app)
-
-# Fan-side background consumer (only dash_refresh edits)
-print("[NyxFan] scheduling fan dash_refresh worker…")
-app.job_queue.run_repeating(
-    process_fan_queue,
-    interval=3.0,
-    first=2.0,
-    name="fan_dash_refresh",
-    job_kwargs={
-        "max_instances": 1,
-        "coalesce": True,
-        "misfire_grace_time": 60,
-    },
-)
-print("[NyxFan] fan dash_refresh worker scheduled.")
-
-print("[NyxFan] scheduling fan consumer…")
-app.job_queue.run_repeating(
-    process_fan_jobs,
-    interval=3.5,
-    first=1.0,
-    name="fan_consumer",
-    job_kwargs={"max_instances": 1, "coalesce": True, "misfire_grace_time": 60},
-)
-print("[NyxFan] fan consumer scheduled.")
+from api.utils.env import get_app, on_build
+from api.utils.io import compact_queue
+
+
+def _wire(application) -> None:
+    from api.utils.errors import on_error
+    from api.handlers import register_handlers
+
+    # Error handler
+    application.add_error_handler(on_error)
+
+    # Register all bot handlers (commands + callbacks)
+    register_handlers(application)
+
+
+# Handlers are attached whenever (and wherever) the Application gets built
+on_build(_wire)
+
+# Queue writes are compare-and-swap / claim based, so ticks may overlap safely
+WORKER_INSTANCES = max(1, int(os.getenv("NYXFAN_WORKER_INSTANCES", "2")))
+
+# Polling mode writes the metrics (utils/metrics.py) here every METRICS_INTERVAL s ("" → off)
+METRICS_FILE     = os.getenv("NYXFAN_METRICS_FILE", str(_PROJECT_ROOT.parent / "shared" / "nyxfan_metrics.prom"))
+METRICS_INTERVAL = float(os.getenv("NYXFAN_METRICS_INTERVAL", "15"))
+
+
+async def _compact_queue(context) -> None:
+    compact_queue()
+
+
+async def _write_metrics(context) -> None:
+    from api.utils.metrics import write_snapshot
+
+    try:
+        write_snapshot(Path(METRICS_FILE))
+    except Exception as e:
+        print(f"[NyxFan] metrics snapshot failed: {e!r}")
+
+
+async def _flush_state(context) -> None:
+    from api.utils import media, state
+
+    state.flush()
+    media.flush()   # kinds learned since the last burst, once FLUSH_INTERVAL has passed
+
+
+async def _log_http_pools(context) -> None:
+    from api.utils.env import http_stats
+
+    for st in http_stats():
+        if st["waited"] or st["timeouts"]:
+            avg = st["wait_total"] / st["waited"] if st["waited"] else 0.0
+            print(
+                f"[NyxFan] http pool {st['name']}: {st['waited']}/{st['requests']} calls waited "
+                f"(avg {avg:.3f}s, max {st['wait_max']:.3f}s), {st['timeouts']} pool timeouts"
+            )
+
+
+def schedule_workers(application) -> None:
+    """Polling mode: background consumers on the job queue (needs the job-queue extra)."""
+    from api.jobs.refresh import process_fan_queue
+    from api.jobs.processor_fan import process_fan_jobs, FAN_TYPES
+    from api.jobs import wakeup
+    from api.jobs.digest import process_digests
+    from api.utils.metrics import timed
+    from api.utils import state
+
+    def _tick(name: str, fn):
+        # nyxfan_job_tick_seconds{job=<name>}; also covers wakeup-driven runs
+        return timed("nyxfan_job_tick_seconds", job=name)(fn)
+
+    def _worker(name: str, fn):
+        # woken runs bypass max_instances → one shared cap for both paths
+        return wakeup.limited(_tick(name, fn), WORKER_INSTANCES)
+
+    # Fan-side background consumer (only dash_refresh edits)
+    print("[NyxFan] scheduling fan dash_refresh worker…")
+    fan_dash_job = application.job_queue.run_repeating(
+        _worker("fan_dash_refresh", process_fan_queue),
+        interval=wakeup.SAFETY_POLL,
+        first=2.0,
+        name="fan_dash_refresh",
+        job_kwargs={
+            "max_instances": WORKER_INSTANCES,
+            "coalesce": True,
+            "misfire_grace_time": 60,
+        },
+    )
+    print("[NyxFan] fan dash_refresh worker scheduled.")
+
+    print("[NyxFan] scheduling fan consumer…")
+    fan_job = application.job_queue.run_repeating(
+        _worker("fan_consumer", process_fan_jobs),
+        interval=wakeup.SAFETY_POLL,
+        first=1.0,
+        name="fan_consumer",
+        job_kwargs={"max_instances": WORKER_INSTANCES, "coalesce": True, "misfire_grace_time": 60},
+    )
+    print("[NyxFan] fan consumer scheduled.")
+
+    # Event-driven runs on top of the schedule: in-process enqueues + a shared/ watcher
+    wakeup.register(fan_dash_job, types=("dash_refresh",))
+    wakeup.register(fan_job, types=FAN_TYPES)
+    application.job_queue.run_once(wakeup.start, when=0, name="queue_wakeups")
+
+    # Daily / weekly digests: a cheap check per minute, sends only at fans' boundaries
+    application.job_queue.run_repeating(
+        _tick("fan_digest", process_digests),
+        interval=60.0,
+        first=10.0,
+        name="fan_digest",
+        job_kwargs={"max_instances": 1, "coalesce": True, "misfire_grace_time": 60},
+    )
+
+    # Drop log segments every consumer has passed (no-op on the json backend)
+    application.job_queue.run_repeating(
+        _tick("queue_compact", _compact_queue),
+        interval=60.0,
+        first=30.0,
+        name="queue_compact",
+        job_kwargs={"max_instances": 1, "coalesce": True, "misfire_grace_time": 60},
+    )
+
+    # Pool-wait report: a growing wait means NYXFAN_HTTP_POOL_SIZE is the bottleneck
+    application.job_queue.run_repeating(
+        _log_http_pools,
+        interval=300.0,
+        first=300.0,
+        name="http_pool_stats",
+        job_kwargs={"max_instances": 1, "coalesce": True, "misfire_grace_time": 60},
+    )
+
+    # Bounded runtime state (dashboard ids, captions, …) → shared/fan_state.json
+    application.job_queue.run_repeating(
+        _flush_state,
+        interval=state.FLUSH_INTERVAL,
+        first=state.FLUSH_INTERVAL,
+        name="state_snapshot",
+        job_kwargs={"max_instances": 1, "coalesce": True, "misfire_grace_time": 60},
+    )
+
+    if METRICS_FILE:
+        application.job_queue.run_repeating(
+            _write_metrics,
+            interval=METRICS_INTERVAL,
+            first=METRICS_INTERVAL,
+            name="metrics_snapshot",
+            job_kwargs={"max_instances": 1, "coalesce": True, "misfire_grace_time": 60},
+        )
+
+
+# Vercel's Python runtime serves the WSGI callable named `app`
+from api.webhook import server as app  # noqa: E402
 
 if __name__ == "__main__":
+    from api.utils import media, pending, state
+
+    application = get_app()
+    schedule_workers(application)
+    pending.rebuild()   # dashboard counters start from the current queue
+    state.load()        # dashboards / captions known before the restart
     print("🤖  NyxFan is live. (polling)")
-    app.run_polling()
\ No newline at end of file
+    try:
+        application.run_polling()
+    finally:
+        state.flush(force=True)
+        media.flush(force=True)   # file kinds learned just before shutdown
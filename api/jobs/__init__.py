@@ -4,6 +4,14 @@ Background jobs for NyxFan.
 Currently only the fan-side dash refresh consumer.
 """
 
-from .refresh import process_fan_queue
+import importlib
+
+
+def __getattr__(name):
+    # lazy: importing api.jobs.<module> should not drag the refresh worker in
+    if name == "process_fan_queue":
+        return importlib.import_module(".refresh", __name__).process_fan_queue
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 __all__ = ["process_fan_queue"]
@@ -0,0 +1,51 @@
+# NyxFan/api/jobs/delivery.py
+"""
+Delivery scheduler for fan-side jobs.
+
+Jobs are split into lanes by chat: a lane runs its jobs one after another
+(so a fan sees posts in queue order) while different lanes run concurrently.
+The actual send pacing (global ~30 msg/s, ~1 msg/s per chat, RetryAfter
+back-off per chat) is done by the Application's ChatRateLimiter, so lanes
+simply fire and let the limiter spread them over the API budget.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+from typing import Any, Awaitable, Callable, Hashable, List, Sequence
+
+DELIVERY_CONCURRENCY = max(1, int(os.getenv("NYXFAN_DELIVERY_CONCURRENCY", "64")))
+
+
+async def deliver(
+    jobs: Sequence[dict],
+    run: Callable[[dict], Awaitable[Any]],
+    *,
+    key: Callable[[dict], Hashable],
+    concurrency: int = DELIVERY_CONCURRENCY,
+) -> List[Any]:
+    """
+    Run `run(job)` for every job and return the results in input order.
+    A job that raises yields its exception as the result (other jobs go on).
+    """
+    lanes: dict = {}
+    for i, job in enumerate(jobs):
+        lanes.setdefault(key(job), []).append(i)
+
+    results: List[Any] = [None] * len(jobs)
+    gate = asyncio.Semaphore(max(1, concurrency))
+
+    async def _lane(idxs: List[int]) -> None:
+        async with gate:
+            for i in idxs:
+                try:
+                    results[i] = await run(jobs[i])
+                except Exception as e:
+                    results[i] = e
+
+    await asyncio.gather(*(_lane(idxs) for idxs in lanes.values()))
+    return results
+
+
+__all__ = ["deliver", "DELIVERY_CONCURRENCY"]
@@ -0,0 +1,225 @@
+# NyxFan/api/jobs/digest.py
+"""
+Daily / weekly digests for creators a fan switched off "immediate".
+
+- fan_relay / fan_dm for such a creator are not pushed: the handler returns a
+  HELD marker, so the original stays in the queue (like the muted path) and
+  its unlockables are still registered.
+- process_digests() runs every minute. When a fan passes their daily or
+  weekly boundary it sends ONE message per mode counting what arrived per
+  creator since the previous digest (items already counted are remembered by
+  trace id), with the same deep links as the dashboard (/start filter_…), and
+  deletes that mode's previous digest. Tapping a link — or "View All" — delivers
+  and acks everything still held for that creator.
+- release() puts a fan's kept items for a creator (muted or digest-held) back
+  in front of the fan consumer when that creator goes back to immediate and
+  unmuted (settings: Immediate / Unmute), so they are delivered.
+- Boundaries are DIGEST_HOUR (UTC; weekly on DIGEST_WEEKDAY) plus a per-fan
+  offset inside DIGEST_SPREAD minutes, so digests don't all go out at once.
+- The last boundary served per fan and mode is kept in shared/fan_digests.json,
+  so a restart neither repeats nor skips a digest.
+"""
+
+from __future__ import annotations
+
+import os
+import time
+import zlib
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Tuple
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+from api.utils import trace
+from api.utils.io import REPO_ROOT, ack, enqueue, read_data, read_notifs, read_queue, write_data
+from api.utils.env import BOT_USERNAME
+from api.utils.helpers import fan_bot
+from api.utils.pending import ALERT_TYPES
+from api.utils.resolve import resolve_many
+from api.jobs.delivery import deliver
+
+DIGEST_MODES   = ("daily", "weekly")
+HELD           = "digest_hold"   # handler → processor: keep the original for the digest
+HELD_TYPES     = ("fan_relay", "fan_dm")   # what the fan consumer holds back
+DIGEST_HOUR    = int(os.getenv("NYXFAN_DIGEST_HOUR", "18"))       # UTC
+DIGEST_WEEKDAY = int(os.getenv("NYXFAN_DIGEST_WEEKDAY", "6"))     # 0 = Monday … 6 = Sunday
+DIGEST_SPREAD  = int(os.getenv("NYXFAN_DIGEST_SPREAD", "60"))     # minutes fans are spread over
+STATE_PATH     = REPO_ROOT / "shared" / "fan_digests.json"
+
+_STATE: Dict[str, Any] = {"data": None}
+
+
+def held(prefs: dict) -> bool:
+    """True → this alert waits for the digest instead of being pushed now."""
+    return not prefs.get("muted", False) and prefs.get("mode", "immediate") in DIGEST_MODES
+
+
+def _offset(tg: int) -> timedelta:
+    return timedelta(minutes=zlib.crc32(str(tg).encode()) % max(1, DIGEST_SPREAD))
+
+
+def boundary(tg: int, mode: str, now: float) -> float:
+    """The fan's latest daily/weekly boundary at or before `now` (unix seconds)."""
+    t = datetime.fromtimestamp(now, timezone.utc)
+    b = t.replace(hour=DIGEST_HOUR, minute=0, second=0, microsecond=0) + _offset(tg)
+    if mode == "weekly":
+        b -= timedelta(days=(b.weekday() - DIGEST_WEEKDAY) % 7)
+        step = timedelta(days=7)
+    else:
+        step = timedelta(days=1)
+    while b > t:
+        b -= step
+    return b.timestamp()
+
+
+def _state() -> dict:
+    if _STATE["data"] is None:
+        try:
+            data = read_data(STATE_PATH)
+            _STATE["data"] = data if isinstance(data, dict) else {}
+        except Exception:
+            _STATE["data"] = {}
+    return _STATE["data"]
+
+
+def _save() -> None:
+    write_data(STATE_PATH, _state())
+
+
+def _digest_text(mode: str, summary: Dict[str, Dict[str, int]]) -> str:
+    lines = [("🔔 Today’s updates:" if mode == "daily" else "🔔 This week’s updates:"), ""]
+    for creator, cnts in summary.items():
+        parts: List[str] = []
+        if cnts["posts"]:
+            url = f"https://t.me/{BOT_USERNAME}?start=filter_relay_{creator}"
+            parts.append(f"[{cnts['posts']} new post{'s' if cnts['posts'] > 1 else ''}]({url})")
+        if cnts["prices"]:
+            url = f"https://t.me/{BOT_USERNAME}?start=filter_subchg_{creator}"
+            parts.append(f"[{cnts['prices']} price change{'s' if cnts['prices'] > 1 else ''}]({url})")
+        if cnts["dms"]:
+            url = f"https://t.me/{BOT_USERNAME}?start=filter_dm_{creator}"
+            parts.append(f"[{cnts['dms']} message{'s' if cnts['dms'] > 1 else ''}]({url})")
+        if parts:
+            lines.append(f"#{creator}: " + " | ".join(parts))
+    return "\n".join(lines)
+
+
+def _kb() -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton("View All", callback_data="show_alerts")],
+        [InlineKeyboardButton("Settings", callback_data="show_settings")],
+    ])
+
+
+def due(now: float | None = None) -> List[Tuple[int, str, float, List[str]]]:
+    """[(tg, mode, boundary, creators)] whose boundary passed since their last digest."""
+    now = time.time() if now is None else now
+    state = _state()
+    out = []
+    first_seen = False
+    for tg_key, per_creator in read_notifs().items():
+        if not isinstance(per_creator, dict):
+            continue
+        try:
+            tg = int(tg_key)
+        except ValueError:
+            continue
+        by_mode: Dict[str, List[str]] = {}
+        for creator, prefs in per_creator.items():
+            if isinstance(prefs, dict) and held(prefs):
+                by_mode.setdefault(prefs["mode"], []).append(creator)
+        for mode, creators in by_mode.items():
+            b = boundary(tg, mode, now)
+            last = state.get(tg_key, {}).get(mode)
+            if last is None:
+                # new digest fan: start counting from now, first digest at the next boundary
+                state.setdefault(tg_key, {})[mode] = {"at": b, "msg": None}
+                first_seen = True
+            elif last.get("at", 0) < b:
+                out.append((tg, mode, b, creators))
+    if first_seen:
+        _save()
+    return out
+
+
+async def _send(tg: int, mode: str, summary: Dict[str, Dict[str, int]]) -> int | None:
+    last = _state().get(str(tg), {}).get(mode) or {}
+    if not summary:
+        return last.get("msg")
+    msg = await fan_bot.send_message(
+        chat_id=tg, text=_digest_text(mode, summary), parse_mode="Markdown", reply_markup=_kb(),
+    )
+    if last.get("msg"):
+        try:
+            await fan_bot.delete_message(chat_id=tg, message_id=last["msg"])
+        except Exception:
+            pass
+    return msg.message_id
+
+
+async def process_digests(context) -> None:
+    """Send every digest that came due; a fan with nothing waiting gets none."""
+    jobs = due()
+    if not jobs:
+        return
+    wanted = {(tg, c): mode for tg, mode, _b, creators in jobs for c in creators}
+
+    # One queue pass: fan → mode → creator → {posts, prices, dms}, new items only
+    state = _state()
+    queue = read_queue()
+    tg_of = resolve_many(c.get("nyx_id") for c in queue if isinstance(c, dict) and c.get("type") in ALERT_TYPES)
+    summaries: Dict[Tuple[int, str], Dict[str, Dict[str, int]]] = {}
+    waiting: Dict[Tuple[int, str], List[str]] = {}   # trace ids of everything held now
+    counted = {
+        (tg, mode): set((state.get(str(tg), {}).get(mode) or {}).get("ids") or ())
+        for tg, mode, _b, _creators in jobs
+    }
+    for c in queue:
+        if not isinstance(c, dict) or c.get("type") not in ALERT_TYPES:
+            continue
+        tg = tg_of.get(str(c.get("nyx_id")))
+        creator = str(c.get("creator", "?"))
+        mode = wanted.get((tg, creator))
+        if mode is None:
+            continue
+        tid = trace.trace_id(c)
+        waiting.setdefault((tg, mode), []).append(tid)
+        if tid in counted[(tg, mode)]:
+            continue   # already in an earlier digest
+        grp = summaries.setdefault((tg, mode), {}).setdefault(creator, {"posts": 0, "prices": 0, "dms": 0})
+        grp[ALERT_TYPES[c["type"]]] += 1
+
+    results = await deliver(
+        jobs,
+        lambda j: _send(j[0], j[1], summaries.get((j[0], j[1]), {})),
+        key=lambda j: j[0],
+    )
+
+    for (tg, mode, b, _creators), res in zip(jobs, results):
+        if isinstance(res, Exception):
+            print(f"[NyxFan] [digest] {mode} digest for {tg} failed: {res!r}")
+            continue   # retried next tick
+        state.setdefault(str(tg), {})[mode] = {"at": b, "msg": res, "ids": waiting.get((tg, mode), [])}
+    _save()
+
+
+def release(tg: int, creator: str) -> int:
+    """
+    Re-offer the fan's kept (muted or held) fan_relay / fan_dm for `creator`
+    to the fan consumer, which has already passed them. Returns how many
+    were released.
+    """
+    queue = [c for c in read_queue() if isinstance(c, dict) and c.get("type") in HELD_TYPES
+             and str(c.get("creator", "?")) == creator]
+    tg_of = resolve_many(c.get("nyx_id") for c in queue)
+    mine = [c for c in queue if tg_of.get(str(c.get("nyx_id"))) == tg]
+    if not mine:
+        return 0
+    now = time.time()
+    # "released" makes the copy a new command, not one the consumer has seen
+    enqueue(*(dict({k: v for k, v in c.items() if k != "_qid"}, released=now) for c in mine))
+    ack(mine)
+    return len(mine)
+
+
+__all__ = ["DIGEST_MODES", "HELD", "held", "boundary", "due", "process_digests", "release"]
@@ -5,35 +5,16 @@ from __future__ import annotations
 from typing import List, Dict, Any
 
 from api.utils.helpers import fan_bot, alert_admin
+from api.utils.media import remember_kind, remember_items
 
-# Preferences (shared JSON: shared/fan_notifications.json)
-try:
-    from api.jobs.support.prefs import get_prefs as _get_prefs
-except Exception:
-    # Minimal fallback
-    def _get_prefs(tg_id: int, creator: str) -> dict:
-        try:
-            from api.utils.io import read_notifs
-            data = read_notifs()
-            user = data.get(str(tg_id), {}) if isinstance(data, dict) else {}
-            prefs = user.get(creator, {})
-            return {"mode": prefs.get("mode", "immediate"), "muted": bool(prefs.get("muted", False))}
-        except Exception:
-            return {"mode": "immediate", "muted": False}
+# Preferences (shared JSON: shared/fan_notifications.json, cached in io)
+from api.utils.io import get_prefs as _get_prefs
+
+from api.utils import trace
+from api.jobs.digest import HELD, held as _held
 
 # Resolve TG id from nyx_id
-try:
-    from api.jobs.support.resolve import resolve_tg_from_any as _resolve_tg
-except Exception:
-    from shared.fan_registry import get_telegram_id as _get_telegram_id
-    def _resolve_tg(nyx_or_tg):
-        s = str(nyx_or_tg or "").strip()
-        if s.isdigit() and len(s) >= 9:
-            try:
-                return int(s)
-            except Exception:
-                return None
-        return _get_telegram_id(str(nyx_or_tg))
+from api.utils.resolve import resolve_tg as _resolve_tg
 
 # Inline keyboard (Settings + Unlock)
 try:
@@ -51,7 +32,9 @@ async def handle_fan_relay(queue: List[dict], new_q: List[dict], cmd: Dict[str,
     """
     FanBot = consumer/deliverer.
     - If creator is muted for this fan: DO NOT send any chat message. Enqueue dash_refresh.
-    - If not muted: send teaser to chat with Unlock keyboard.
+    - If the fan is on a daily/weekly digest for this creator: DO NOT send; keep
+      the original for the digest (HELD marker).
+    - Otherwise: send teaser to chat with Unlock keyboard.
     - In both cases, emit fan_unlock_register so FanBot can deliver unlockables later.
     """
     out: List[dict] = []
@@ -69,16 +52,24 @@ async def handle_fan_relay(queue: List[dict], new_q: List[dict], cmd: Dict[str,
     teaser = cmd.get("teaser") or {}
     fid = teaser.get("file_id")
     kind = (teaser.get("kind") or "photo").lower()
+    # Memoize kinds so 'View All' / deep-link sends skip the kind cascade
+    remember_kind(fid, teaser.get("kind"))
+    remember_items(cmd.get("items"))
 
     # prefs → muted?
     prefs = _get_prefs(int(tg), creator)
     muted = bool(prefs.get("muted", False))
+    digest = _held(prefs)
 
     caption = f"🔥 New post from #{creator}:\n\n{title}"
     kb = _relay_keyboard(creator, content_id)
 
     m = None
-    if not muted:
+    if digest:
+        # goes out with the fan's next daily/weekly digest
+        trace.span(cmd, "held", chat=tg)
+        out.append({"type": HELD, "nyx_id": nyx})
+    elif not muted:
         try:
             if kind == "photo":
                 m = await fan_bot.send_photo(chat_id=tg, photo=fid, caption=caption, reply_markup=kb)
@@ -88,6 +79,7 @@ async def handle_fan_relay(queue: List[dict], new_q: List[dict], cmd: Dict[str,
                 m = await fan_bot.send_video(chat_id=tg, video=fid, caption=caption, reply_markup=kb, supports_streaming=True)
             else:
                 m = await fan_bot.send_document(chat_id=tg, document=fid, caption=caption, reply_markup=kb)
+            trace.span(cmd, "sent", chat=tg)
         except Exception as e:
             alert_admin(f"[fan_relay] delivery failed: {e!r}")
             out.append({
@@ -103,6 +95,7 @@ async def handle_fan_relay(queue: List[dict], new_q: List[dict], cmd: Dict[str,
             return out
     else:
         # Muted → dashboard refresh only
+        trace.span(cmd, "muted", chat=tg)
         out.append({"type": "dash_refresh", "nyx_id": nyx})
 
     # Register unlockables for later delivery (with or without teaser linkage)
@@ -3,52 +3,14 @@
 from __future__ import annotations
 
 from typing import List, Dict, Any
-from pathlib import Path
-import json
 
-# Minimal store in shared/unlock_index.json so dashboard + later delivery can use it
-try:
-    from api.utils.helpers import PROJECT_ROOT  # if present in your utils.helpers
-    SHARED_DIR = Path(PROJECT_ROOT) / "shared"
-except Exception:
-    # Fallback: walk up from this file to the project root, then /shared
-    SHARED_DIR = Path(__file__).resolve().parents[4] / "shared"
+# Keyed store (shared/unlock_index.sqlite3) so dashboard + later delivery can use it
+from api.utils import unlock_store
 
-UNLOCK_PATH = SHARED_DIR / "unlock_index.json"
-
-
-def _read_unlock() -> Dict[str, Any]:
-    try:
-        if UNLOCK_PATH.exists():
-            return json.loads(UNLOCK_PATH.read_text(encoding="utf-8"))
-    except Exception:
-        pass
-    return {}
-
-
-def _write_unlock(d: Dict[str, Any]) -> None:
-    UNLOCK_PATH.parent.mkdir(parents=True, exist_ok=True)
-    UNLOCK_PATH.write_text(json.dumps(d, ensure_ascii=False, indent=2), encoding="utf-8")
-
-
-async def handle_fan_unlock_register(queue: List[dict], new_q: List[dict], cmd: Dict[str, Any]) -> List[dict]:
-    """
-    FanBot-side register:
-      - Persist unlock metadata/items into shared/unlock_index.json keyed by content_id.
-      - No sending here; delivery happens via fan_unlock_deliver.
-    """
-    out: List[dict] = []
-
-    nyx = cmd.get("nyx_id")
-    cid = cmd.get("content_id")
-    if not nyx or not cid:
-        return out
-
-    idx = _read_unlock()
-    ent: Dict[str, Any] = idx.get(cid, {})
 
+def _merge_register(ent: Dict[str, Any], cmd: Dict[str, Any]) -> Dict[str, Any]:
     # Persist metadata for dashboard + later delivery
-    ent["nyx_id"] = str(nyx)
+    ent["nyx_id"] = str(cmd.get("nyx_id"))
     if isinstance(cmd.get("creator"), str):
         ent["creator"] = cmd["creator"]
     if isinstance(cmd.get("title"), str):
@@ -66,6 +28,55 @@ async def handle_fan_unlock_register(queue: List[dict], new_q: List[dict], cmd:
     elif "content" in cmd:
         ent["content"] = cmd["content"]
 
-    idx[cid] = ent
-    _write_unlock(idx)
+    return ent
+
+
+def _collapse(batch: List[Dict[str, Any]]):
+    """
+    Fold one content_id's registrations (queue order) into the fields they end
+    up setting, then merge that into the stored entry once. Same result as
+    merging them one by one; an entry that would not change is not rewritten.
+    """
+    folded: Dict[str, Any] = {}
+    for cmd in batch:
+        folded = _merge_register(folded, cmd)
+    # the last items-bearing registration came after any content one → content dropped
+    drop_content = "items" in folded and "content" not in folded
+
+    def _apply(ent: Dict[str, Any]) -> Dict[str, Any] | None:
+        new = dict(ent)
+        if drop_content:
+            new.pop("content", None)
+        new.update(folded)
+        return None if new == ent else new
+    return _apply
+
+
+def register_many(cmds: List[Dict[str, Any]]) -> None:
+    """
+    A whole tick's registrations as one store transaction, de-duplicated by
+    the store key (content_id) across the whole batch: each entry is merged
+    and written at most once, with the last registration winning per field.
+    """
+    per_cid: Dict[str, List[Dict[str, Any]]] = {}
+    for cmd in cmds:
+        if cmd.get("nyx_id") and cmd.get("content_id"):
+            per_cid.setdefault(str(cmd["content_id"]), []).append(cmd)
+    unlock_store.update_many({cid: _collapse(batch) for cid, batch in per_cid.items()})
+
+
+async def handle_fan_unlock_register(queue: List[dict], new_q: List[dict], cmd: Dict[str, Any]) -> List[dict]:
+    """
+    FanBot-side register:
+      - Persist unlock metadata/items into the unlock store keyed by content_id.
+      - No sending here; delivery happens via fan_unlock_deliver.
+    """
+    out: List[dict] = []
+
+    nyx = cmd.get("nyx_id")
+    cid = cmd.get("content_id")
+    if not nyx or not cid:
+        return out
+
+    unlock_store.update(cid, lambda ent: _merge_register(ent, cmd))
     return out
@@ -1,17 +1,20 @@
 # NyxFan/api/jobs/processor.py
 
 import json
+import time
 from io import BytesIO
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
 from telegram.error import BadRequest
 
-from api.utils.io import read_queue, write_queue
+from api.utils.io import due, read_queue, write_queue_merged
 from api.utils.helpers import fan_bot, FAN_BOT_USERNAME
-from shared.fan_registry import get_telegram_id
+from api.utils.resolve import get_telegram_id
+from api.utils.state import MAX_FANS, BoundedState
+from api.jobs.retry import defer
 
-# Track last digest message IDs per user
-LAST_DIGEST: dict[str, dict[str, int]] = {}
+# Track last digest message IDs per user (LRU-capped; not persisted)
+LAST_DIGEST = BoundedState("LAST_DIGEST", MAX_FANS, persist=False, key=str)
 
 
 async def process_proxy_commands(context: ContextTypes.DEFAULT_TYPE):
@@ -25,13 +28,20 @@ async def process_proxy_commands(context: ContextTypes.DEFAULT_TYPE):
     """
     queue = read_queue()
     new_q = []
+    now = time.time()
 
     for cmd in queue:
+        if not due(cmd, now):
+            new_q.append(cmd)   # backing off (jobs/retry.py)
+            continue
+
         nyx = cmd.get("nyx_id")
         tg = get_telegram_id(str(nyx))
 
         if not tg:
-            new_q.append(cmd)
+            later = defer(cmd, "unknown nyx_id", now)
+            if later is not None:
+                new_q.append(later)
             continue
 
         t = cmd.get("type")
@@ -125,5 +135,5 @@ async def process_proxy_commands(context: ContextTypes.DEFAULT_TYPE):
         # Default: keep unrecognized jobs
         new_q.append(cmd)
 
-    write_queue(new_q)
+    new_q = write_queue_merged(queue, new_q)
     print(f"[NyxFan] [processor] done. remaining in queue: {len(new_q)}")
@@ -1,56 +1,144 @@
 # NyxFan/api/jobs/processor_fan.py
 from __future__ import annotations
-from typing import Dict, Any, List
+import time
+from typing import Dict, Any, List, Tuple
 
-from api.utils.io import read_queue, write_queue
+from api.utils import trace
+from api.utils.media import PartialSend
+from api.utils.io import claim, ack, commit, enqueue
+from api.utils.resolve import resolve_many
+from api.jobs.delivery import deliver
+from api.jobs.wakeup import wake
+from api.jobs.digest import HELD
+from api.jobs.retry import dead_letter, defer
 from api.jobs.handlers.fan_relay import handle_fan_relay
-from api.jobs.handlers.fan_unlock_register import handle_fan_unlock_register
+from api.jobs.handlers.fan_unlock_register import handle_fan_unlock_register, register_many
 from api.jobs.handlers.fan_unlock_deliver import handle_fan_unlock_deliver
 
 # new file you’ll add next:
 from api.jobs.handlers.fan_dm import handle_fan_dm
 
+FAN_TYPES = ("fan_relay", "fan_unlock_register", "fan_unlock_deliver", "fan_dm")
+BATCH_SIZE = 500   # jobs claimed per tick; a full batch wakes the next one right away
+
+
+def _keeps(more: List[Dict[str, Any]]) -> bool:
+    # A dash_refresh means the muted path ran → original stays for the dashboard;
+    # HELD means it waits in the queue for the fan's digest
+    return any((isinstance(x, dict) and x.get("type") in ("dash_refresh", HELD)) for x in more)
+
+
+async def _run_job(cmd: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], bool]:
+    """Run one fan_* job → (follow-up commands, finished?)."""
+    t = (cmd.get("type") or "").lower()
+
+    if t == "fan_relay":
+        more = await handle_fan_relay([], [], cmd) or []
+        return [x for x in more if x.get("type") != HELD], not _keeps(more)
+
+    if t == "fan_unlock_register":
+        # do NOT keep original; registration is persisted
+        return await handle_fan_unlock_register([], [], cmd) or [], True
+
+    if t == "fan_unlock_deliver":
+        # delivered → drop original
+        return await handle_fan_unlock_deliver([], [], cmd) or [], True
+
+    if t == "fan_dm":
+        more = await handle_fan_dm([], [], cmd) or []
+        return [x for x in more if x.get("type") != HELD], not _keeps(more)   # muted / digest → pending
+
+    return [], False
+
+
 async def process_fan_jobs(context) -> None:
     """
     FanBot queue worker:
       - Consume fan_* jobs (and keep muted ones for Dashboard ‘View All’)
       - Leave everything else alone (Proxy or refresh worker will handle)
+    Only the fan_* jobs not seen yet (and not backing off) are claimed; they
+    are handed to the delivery scheduler (one ordered lane per fan, lanes in
+    parallel), then finished ones are acked and follow-ups appended. Jobs
+    whose fan can't be resolved yet, or whose handler raised, are replaced
+    by a deferred copy (jobs/retry.py) instead of being dropped or retried
+    on the very next tick.
     """
-    q = read_queue()
-    new_q: List[Dict[str, Any]] = []
-
-    for cmd in q:
-        if not isinstance(cmd, dict):
-            new_q.append(cmd); continue
-        t = (cmd.get("type") or "").lower()
-
-        # Only handle fan-side jobs here
-        if t == "fan_relay":
-            more = await handle_fan_relay(q, new_q, cmd) or []
-            new_q.extend(more)
-            # If handler emitted a dash_refresh, keep original so it appears on the dashboard
-            if any((isinstance(x, dict) and x.get("type") == "dash_refresh") for x in more):
-                new_q.append(cmd)   # muted path → pending
-            continue
-
-        if t == "fan_unlock_register":
-            new_q.extend(await handle_fan_unlock_register(q, new_q, cmd) or [])
-            # do NOT keep original; registration is persisted
-            continue
-
-        if t == "fan_unlock_deliver":
-            new_q.extend(await handle_fan_unlock_deliver(q, new_q, cmd) or [])
-            # delivered → drop original
-            continue
-
-        if t == "fan_dm":
-            more = await handle_fan_dm(q, new_q, cmd) or []
-            new_q.extend(more)
-            if any((isinstance(x, dict) and x.get("type") == "dash_refresh") for x in more):
-                new_q.append(cmd)   # muted path → pending
-            continue
-
-        # Everything else: passthrough
-        new_q.append(cmd)
-
-    write_queue(new_q)
+    claimed = claim("fan", FAN_TYPES, limit=BATCH_SIZE)
+    if not claimed:
+        return
+    trace.spans(claimed, "claimed")
+
+    out: List[Dict[str, Any]] = []
+    done: List[Dict[str, Any]] = []
+    retry: List[Dict[str, Any]] = []
+    wait: float | None = None   # seconds until the soonest deferred job is due
+    completed = False
+    try:
+        # Registrations only touch the unlock store → one transaction for the tick,
+        # applied before any delivery that may need them
+        regs = [c for c in claimed if (c.get("type") or "").lower() == "fan_unlock_register"]
+        jobs = [c for c in claimed if (c.get("type") or "").lower() != "fan_unlock_register"]
+        if regs:
+            try:
+                register_many(regs)
+                done.extend(regs)
+            except Exception as e:
+                print(f"[NyxFan] [fan_consumer] fan_unlock_register batch ({len(regs)}) failed: {e!r}")
+                retry.extend(regs)
+
+        # One registry pass for the whole tick; handlers then hit the cache
+        tg_of = resolve_many(c.get("nyx_id") for c in jobs)
+        routable: List[Dict[str, Any]] = []
+        for c in jobs:
+            ok = bool(tg_of.get(str(c.get("nyx_id"))))
+            trace.span(c, "resolved", ok=ok)
+            if ok:
+                routable.append(c)
+            elif not c.get("nyx_id"):
+                dead_letter([c], "no nyx_id")
+                done.append(c)
+            else:
+                # fan not known yet → back off instead of re-resolving every tick
+                later = defer(c, "unknown nyx_id")
+                if later is not None:
+                    out.append(later)
+                    left = later["not_before"] - time.time()
+                    wait = left if wait is None else min(wait, left)
+                done.append(c)
+        jobs = routable
+        results = await deliver(jobs, _run_job, key=lambda c: tg_of.get(str(c.get("nyx_id"))))
+
+        for cmd, res in zip(jobs, results):
+            if isinstance(res, Exception):
+                print(f"[NyxFan] [fan_consumer] {cmd.get('type')} failed: {res!r}")
+                # Back off like an unroutable job (a blocked bot or a bad file_id
+                # would otherwise fail again every tick); after a partial send
+                # only what the fan did not get yet is retried
+                again = dict(cmd, items=res.left) if isinstance(res, PartialSend) else cmd
+                later = defer(again, f"{type(res).__name__}: {res}")
+                if later is not None:
+                    out.append(later)
+                    left = later["not_before"] - time.time()
+                    wait = left if wait is None else min(wait, left)
+                done.append(cmd)
+                continue
+            more, finished = res
+            out.extend(trace.inherit(cmd, m) for m in more)
+            if finished:
+                done.append(cmd)
+
+        enqueue(*out)
+        ack(done)
+        completed = True
+    finally:
+        if not completed:
+            # The tick raised before its ack: nothing of it was removed, so every
+            # claimed job comes back on the next claim instead of staying in flight
+            retry = list(claimed)
+        commit("fan", claimed, retry=retry)
+    trace.spans(done, "acked")
+    trace.flush()
+    if len(claimed) >= BATCH_SIZE:
+        wake(*FAN_TYPES)
+    elif wait is not None:
+        wake(*FAN_TYPES, delay=max(0.0, wait))
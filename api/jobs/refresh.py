@@ -2,70 +2,160 @@
 """
 Fan-side background consumer: processes only 'dash_refresh' pokes.
 Matches original behavior: edit dashboard inline if it exists; never push new.
+Pokes are coalesced per fan per tick, unchanged renders are not re-sent, and
+edits per fan are capped per time window.
 """
 
+import hashlib
+import json
+import time
+
 from telegram.ext import ContextTypes
-from telegram.error import BadRequest
+from telegram.error import BadRequest, Forbidden, NetworkError, RetryAfter, TelegramError
 
-from api.utils.io import read_queue, write_queue
-from api.utils.state import ALL_DASH_MSGS
+from api.utils import trace
+from api.utils.io import claim, ack, commit, enqueue
+from api.utils.state import ALL_DASH_MSGS, DASH_RENDER, DASH_EDITS
 from api.handlers.dashboard import build_dashboard
-from shared.fan_registry import get_telegram_id
+from api.utils.resolve import resolve_tg, resolve_many
+from api.jobs.wakeup import wake
+from api.jobs.retry import dead_letter, defer
+
+BATCH_SIZE = 500   # pokes claimed per tick
+EDIT_WINDOW = 10.0     # seconds
+EDITS_PER_WINDOW = 3   # dashboard edits per fan per window
 
 
 def _resolve_tg_from_any(nyx_or_tg) -> int | None:
-    """
-    Accept either a canonical NYX ID (string) or a raw Telegram user id.
-    1) Try NYX→TG via registry
-    2) Fallback: if it's a numeric string that looks like a TG id, use it directly
-    """
-    tg = get_telegram_id(str(nyx_or_tg))
-    if tg:
-        return tg
-    s = str(nyx_or_tg or "").strip()
-    if s.isdigit() and len(s) >= 9:  # typical TG user-id length
-        try:
-            return int(s)
-        except Exception:
-            return None
-    return None
+    return resolve_tg(nyx_or_tg)
+
+
+def _render_hash(text: str, kb) -> str:
+    payload = json.dumps([text, kb.to_dict() if kb is not None else None], sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
 
+def _edit_allowed(tg: int, now: float) -> bool:
+    """At most EDITS_PER_WINDOW edits per fan per EDIT_WINDOW seconds."""
+    recent = [t for t in DASH_EDITS.get(tg, []) if now - t < EDIT_WINDOW]
+    DASH_EDITS[tg] = recent
+    return len(recent) < EDITS_PER_WINDOW
 
-async def _edit_dashboard_if_exists(context: ContextTypes.DEFAULT_TYPE, tg: int) -> bool:
-    """Background-safe update: edit existing dashboard only (no new message)."""
+
+async def _edit_dashboard_if_exists(context: ContextTypes.DEFAULT_TYPE, tg: int, cmds=()) -> str:
+    """
+    Background-safe update: edit existing dashboard only (no new message).
+    Skips the API call when the rendered (text, keyboard) equals what that
+    dashboard message already shows. `cmds` (the pokes) get the trace span.
+
+    Returns the outcome (also the span name): "sent", "skipped",
+    "no_dashboard", "blocked" (fan blocked the bot; dashboard forgotten),
+    "failed" (other Bot API refusal) or "retry" (flood wait / network error →
+    the caller keeps a poke for a later tick). Never raises TelegramError.
+    """
     mids = ALL_DASH_MSGS.get(tg, [])
     mid = mids[-1] if mids else None
     if not mid:
-        return False
+        trace.spans(cmds, "no_dashboard", chat=tg)
+        return "no_dashboard"
     text, kb = build_dashboard(tg)
+    digest = _render_hash(text, kb)
+    if DASH_RENDER.get(tg) == (mid, digest):
+        trace.spans(cmds, "skipped", chat=tg)   # the fan already sees this render
+        return "skipped"
+    DASH_EDITS.setdefault(tg, []).append(time.monotonic())
     try:
         await context.bot.edit_message_text(
             chat_id=tg, message_id=mid,
             text=text, parse_mode="Markdown", reply_markup=kb
         )
-        return True
-    except BadRequest:
-        return False
+        outcome = "sent"
+    except BadRequest as e:
+        if "not modified" not in str(e).lower():
+            trace.spans(cmds, "failed", chat=tg, error=repr(e))
+            return "failed"
+        outcome = "skipped"
+    except Forbidden:
+        # blocked / deactivated: stop editing until /start gives us a new dashboard
+        ALL_DASH_MSGS.pop(tg, None)
+        DASH_RENDER.pop(tg, None)
+        trace.spans(cmds, "blocked", chat=tg)
+        return "blocked"
+    except (RetryAfter, NetworkError) as e:
+        trace.spans(cmds, "retry", chat=tg, error=repr(e))
+        return "retry"
+    except TelegramError as e:
+        trace.spans(cmds, "failed", chat=tg, error=repr(e))
+        return "failed"
+    DASH_RENDER[tg] = (mid, digest)
+    trace.spans(cmds, outcome, chat=tg)
+    return outcome
 
 
 async def process_fan_queue(context: ContextTypes.DEFAULT_TYPE):
-    queue = read_queue()
-    new_q = []
-    for cmd in queue:
-        t = cmd.get("type")
-        # Only handle dash_refresh here; everything else stays in the queue
-        if t != "dash_refresh":
-            new_q.append(cmd)
-            continue
-
-        tg = _resolve_tg_from_any(cmd.get("nyx_id"))
-        if not tg:
-            # Can't map yet; keep it so it can be retried on a later tick
-            new_q.append(cmd)
-            continue
-
-        # Background-safe: edit existing dashboard only; if none, skip (avoid push).
-        await _edit_dashboard_if_exists(context, tg)
-        # Do not requeue this poke.
-
-    write_queue(new_q)
+    # Only dash_refresh pokes are claimed; everything else stays in the queue untouched
+    pokes = claim("refresh", ("dash_refresh",), limit=BATCH_SIZE)
+    if not pokes:
+        return
+    trace.spans(pokes, "claimed")
+
+    # Coalesce: N pokes for one fan this tick → one rebuild/edit
+    by_tg: dict[int, list] = {}
+    done, retry, deferred = [], [], []
+    throttled = False
+    try:
+        resolve_many(c.get("nyx_id") for c in pokes)
+        for cmd in pokes:
+            tg = _resolve_tg_from_any(cmd.get("nyx_id"))
+            if not tg:
+                # Can't map yet: replace it with a backed-off copy (jobs/retry.py)
+                trace.span(cmd, "resolved", ok=False)
+                if not cmd.get("nyx_id"):
+                    dead_letter([cmd], "no nyx_id")
+                else:
+                    later = defer(cmd, "unknown nyx_id")
+                    if later is not None:
+                        deferred.append(later)
+                done.append(cmd)
+                continue
+            trace.span(cmd, "resolved", ok=True)
+            by_tg.setdefault(tg, []).append(cmd)
+
+        now = time.monotonic()
+        for tg, cmds in by_tg.items():
+            if not _edit_allowed(tg, now):
+                throttled = True
+                # Over the per-fan edit budget: keep one poke for a later tick, drop the dupes
+                retry.append(cmds[0])
+                done.extend(cmds[1:])
+                continue
+            # Background-safe: edit existing dashboard only; if none, skip (avoid push).
+            if await _edit_dashboard_if_exists(context, tg, cmds) == "retry":
+                throttled = True
+                retry.append(cmds[0])
+                done.extend(cmds[1:])
+                continue
+            # Do not requeue these pokes.
+            done.extend(cmds)
+    finally:
+        # Whatever this tick did not get to (it raised) goes back for the next one,
+        # so no poke stays claimed and the consumer offset keeps moving
+        handled = {id(c) for c in done} | {id(c) for c in retry}
+        retry.extend(c for c in pokes if id(c) not in handled)
+        try:
+            enqueue(*deferred)
+            ack(done)
+        except Exception:
+            retry = list(pokes)   # nothing was acked → all of it comes back
+            raise
+        finally:
+            commit("refresh", pokes, retry=retry)
+        trace.spans(done, "acked")
+        trace.flush()
+    if len(pokes) >= BATCH_SIZE:
+        wake("dash_refresh")
+    elif throttled:
+        # the held-back pokes become editable once the window slides
+        wake("dash_refresh", delay=EDIT_WINDOW)
+    elif deferred:
+        wake("dash_refresh", delay=max(0.0, min(c["not_before"] for c in deferred) - time.time()))
@@ -0,0 +1,71 @@
+# NyxFan/api/jobs/retry.py
+"""
+Delayed retries for jobs a worker cannot route yet (no Telegram id for the
+nyx_id — the fan has not opened the bot, or the registry lags the Proxy).
+
+- defer(cmd, reason) → a copy with "attempts" + 1 and "not_before" (unix
+  seconds) RETRY_BASE · 2^(attempts-1) from now, capped at RETRY_MAX_DELAY.
+  The worker enqueues the copy and acks the original; claims skip it until it
+  is due (utils/io.py), so a stuck job is not re-resolved on every tick.
+- After RETRY_MAX_ATTEMPTS (or for a job that can never route, e.g. no
+  nyx_id) the job goes to the dead-letter file instead: one JSON line
+  {"at", "reason", "cmd"} per job in shared/fan_dead_letters.jsonl.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import time
+from typing import Any, Dict, Iterable, Optional
+
+from api.utils import metrics, trace
+from api.utils.io import REPO_ROOT
+
+RETRY_BASE         = float(os.getenv("NYXFAN_RETRY_BASE", "10"))          # seconds before the 1st retry
+RETRY_MAX_DELAY    = float(os.getenv("NYXFAN_RETRY_MAX_DELAY", "3600"))   # backoff cap
+RETRY_MAX_ATTEMPTS = int(os.getenv("NYXFAN_RETRY_MAX_ATTEMPTS", "12"))    # ≈ 4.5 h with the defaults
+DEAD_LETTER_PATH   = REPO_ROOT / "shared" / "fan_dead_letters.jsonl"
+
+
+def backoff(attempts: int) -> float:
+    """Delay before retry number `attempts` (1-based)."""
+    return min(RETRY_MAX_DELAY, RETRY_BASE * 2 ** max(0, attempts - 1))
+
+
+def defer(cmd: Dict[str, Any], reason: str, now: Optional[float] = None) -> Optional[Dict[str, Any]]:
+    """The rescheduled copy of `cmd`, or None once it has been dead-lettered."""
+    now = time.time() if now is None else now
+    attempts = int(cmd.get("attempts") or 0) + 1
+    if attempts > RETRY_MAX_ATTEMPTS:
+        dead_letter([cmd], f"{reason} (after {attempts - 1} attempts)", now)
+        return None
+    delay = backoff(attempts)
+    out = {k: v for k, v in cmd.items() if k != "_qid"}
+    out.update(attempts=attempts, not_before=round(now + delay, 3), retry_reason=reason)
+    trace.span(cmd, "deferred", attempts=attempts, delay=delay, reason=reason)
+    metrics.inc("nyxfan_jobs_deferred_total", type=cmd.get("type"))
+    return out
+
+
+def dead_letter(cmds: Iterable[Dict[str, Any]], reason: str, now: Optional[float] = None) -> None:
+    """Append `cmds` to the dead-letter file (the caller still acks them)."""
+    now = time.time() if now is None else now
+    lines = []
+    for c in cmds:
+        body = {k: v for k, v in c.items() if k != "_qid"}
+        lines.append(json.dumps({"at": now, "reason": reason, "cmd": body}, separators=(",", ":"), default=str))
+        trace.span(c, "dead", reason=reason)
+        metrics.inc("nyxfan_jobs_dead_total", type=c.get("type"))
+        print(f"[NyxFan] dead-lettered {c.get('type')} for {c.get('nyx_id')!r}: {reason}")
+    if not lines:
+        return
+    try:
+        DEAD_LETTER_PATH.parent.mkdir(parents=True, exist_ok=True)
+        with open(DEAD_LETTER_PATH, "a", encoding="utf-8") as fh:
+            fh.write("\n".join(lines) + "\n")
+    except Exception as e:
+        print(f"[NyxFan] dead-letter write failed: {e!r}")
+
+
+__all__ = ["RETRY_BASE", "RETRY_MAX_DELAY", "RETRY_MAX_ATTEMPTS", "backoff", "defer", "dead_letter"]
@@ -0,0 +1,137 @@
+# NyxFan/api/jobs/wakeup.py
+"""
+Wake queue workers when there is work instead of polling on a short timer.
+
+- In-process enqueues (/start, unlock_confirm, handler outputs) arrive through
+  the io change feed and set the asyncio.Event of the workers for those types.
+- Writes by other processes (Proxy) are picked up by a watcher on shared/.
+- The run_repeating schedule stays as a slow safety poll (SAFETY_POLL).
+Each worker has one drain loop, so a burst of signals costs one extra run.
+A drain calls the job's callback directly, past APScheduler's max_instances,
+so worker callbacks are wrapped in limited(): scheduled and woken runs share
+one cap on concurrent ticks.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import functools
+import os
+from typing import Dict, Iterable
+
+from api.utils.io import subscribe, queue_version, queue_watch_targets, _cmd_key
+from api.utils.fswatch import watch
+
+SAFETY_POLL    = float(os.getenv("NYXFAN_SAFETY_POLL", "30"))      # seconds between fallback ticks
+WATCH_INTERVAL = float(os.getenv("NYXFAN_WATCH_INTERVAL", "1.0"))  # stat() fallback only
+
+# job name → {"job": Job, "types": set | None, "event": asyncio.Event | None}
+_WORKERS: Dict[str, dict] = {}
+_STATE = {"loop": None, "version": None}
+
+
+def limited(fn, instances: int):
+    """`fn(context)` with at most `instances` runs in flight, however started;
+    a run over the cap waits for a slot instead of overlapping."""
+    slots: dict = {"sem": None}
+
+    @functools.wraps(fn)
+    async def run(context):
+        if slots["sem"] is None:   # created on the loop that runs the jobs
+            slots["sem"] = asyncio.Semaphore(max(1, instances))
+        async with slots["sem"]:
+            return await fn(context)
+    return run
+
+
+def register(job, types: Iterable[str] | None = None) -> None:
+    """Let wake() run `job` early when commands of `types` show up (None → any)."""
+    _WORKERS[job.name] = {"job": job, "types": set(types) if types is not None else None, "event": None}
+
+
+def _set(types) -> None:
+    for w in _WORKERS.values():
+        if w["event"] is None:
+            continue
+        if not types or w["types"] is None or w["types"] & types:
+            w["event"].set()
+
+
+def wake(*types: str, delay: float = 0.0) -> None:
+    """Signal the workers consuming any of `types` (no types → all). Thread-safe."""
+    loop = _STATE["loop"]
+    if loop is None:
+        return   # not started yet: the first scheduled tick picks the work up
+    types = set(types)
+    try:
+        here = asyncio.get_running_loop() is loop
+    except RuntimeError:
+        here = False
+    if here and not delay:
+        _set(types)
+    elif here:
+        loop.call_later(delay, _set, types)
+    else:
+        loop.call_soon_threadsafe(loop.call_later, max(0.0, delay), _set, types)
+
+
+def _on_change(before, after, added, removed) -> None:
+    # someone else wrote in between ("" = file missing/unreadable → unknown, not a change)
+    foreign = bool(before and _STATE["version"]) and before != _STATE["version"]
+    if after:
+        _STATE["version"] = after
+    if added is None or foreign:
+        wake()
+        return
+    gone: dict[str, int] = {}
+    for c in removed:
+        k = _cmd_key(c)
+        gone[k] = gone.get(k, 0) + 1
+    types = set()
+    for c in added:
+        k = _cmd_key(c)
+        if gone.get(k):
+            gone[k] -= 1   # moved (retry), not new work
+            continue
+        if isinstance(c, dict):
+            types.add(c.get("type"))
+    if types:
+        wake(*types)
+
+
+def _external() -> None:
+    # The watcher also sees our own writes; only wake when the queue moved past them.
+    # "" (file missing / mid-replace / unreadable) is no news: wait for a real version.
+    version = queue_version()
+    if not version or version == _STATE["version"]:
+        return
+    _STATE["version"] = version
+    wake()
+
+
+async def _drain(app, w: dict) -> None:
+    while True:
+        await w["event"].wait()
+        w["event"].clear()
+        try:
+            await w["job"].run(app)
+        except Exception:
+            pass
+
+
+async def start(context) -> None:
+    """run_once() target: start the drain loops and the shared/ watcher."""
+    app = context.application
+    loop = asyncio.get_running_loop()
+    _STATE["loop"] = loop
+    _STATE["version"] = queue_version()
+    for w in _WORKERS.values():
+        w["event"] = asyncio.Event()
+        app.create_task(_drain(app, w))
+    mode = watch(queue_watch_targets(), lambda: loop.call_soon_threadsafe(_external), WATCH_INTERVAL)
+    print(f"[NyxFan] queue wakeups on ({mode} watcher, safety poll every {SAFETY_POLL:g}s)")
+
+
+subscribe(_on_change)
+
+__all__ = ["SAFETY_POLL", "limited", "register", "wake", "start"]
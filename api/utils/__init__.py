@@ -3,20 +3,35 @@
 Utilities for NyxFan:
 - env        → Application + config
 - errors     → minimal error handler
-- io         → shared queue I/O
+- io         → shared queue I/O (json / log / sqlite backends)
 - state      → in-memory runtime dicts
 (We intentionally do NOT import dashboard here to avoid circular imports.)
 """
 
-from .env import app, BOT_USERNAME, INBOX_URL, PROFILE_URL
-from .errors import on_error
-from .io import read_queue, write_queue
-from .state import ALL_DASH_MSGS, USER_DISP
+import importlib
+
+# name → module; resolved on first use so `import api.utils.<x>` stays light
+# (`app` in particular is only built when somebody asks for it)
+_LAZY = {
+    "app": ".env", "BOT_USERNAME": ".env", "INBOX_URL": ".env", "PROFILE_URL": ".env",
+    "on_error": ".errors",
+    "read_queue": ".io", "write_queue": ".io", "update_queue": ".io",
+    "enqueue": ".io", "claim": ".io", "ack": ".io", "commit": ".io",
+    "ALL_DASH_MSGS": ".state", "USER_DISP": ".state",
+}
+
+
+def __getattr__(name):
+    mod = _LAZY.get(name)
+    if mod is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    return getattr(importlib.import_module(mod, __name__), name)
+
 
 __all__ = [
     "app",
     "BOT_USERNAME", "INBOX_URL", "PROFILE_URL",
     "on_error",
-    "read_queue", "write_queue",
+    "read_queue", "write_queue", "update_queue", "enqueue", "claim", "ack", "commit",
     "ALL_DASH_MSGS", "USER_DISP",
 ]
@@ -0,0 +1,52 @@
+# NyxFan/api/utils/completion.py
+"""
+In-process completion signals for queued work a handler waits on.
+
+- expect(content_id, chat_id) before enqueueing the job → a future.
+- The job's handler calls done(content_id, chat_id) once it has finished
+  (sent everything, or found nothing to send); every waiter resolves at once.
+- wait(fut, timeout) → True when signalled, False on timeout.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from typing import Dict, List, Tuple
+
+# (content_id, chat_id) → futures waiting for that delivery
+_WAITERS: Dict[Tuple[str, str], List[asyncio.Future]] = {}
+
+
+def _key(content_id, chat_id) -> Tuple[str, str]:
+    return (str(content_id), str(chat_id))
+
+
+def expect(content_id, chat_id) -> asyncio.Future:
+    fut = asyncio.get_running_loop().create_future()
+    _WAITERS.setdefault(_key(content_id, chat_id), []).append(fut)
+    return fut
+
+
+def done(content_id, chat_id) -> None:
+    for fut in _WAITERS.pop(_key(content_id, chat_id), []):
+        if not fut.done():
+            fut.set_result(True)
+
+
+async def wait(fut: asyncio.Future, timeout: float) -> bool:
+    try:
+        await asyncio.wait_for(asyncio.shield(fut), timeout)
+        return True
+    except asyncio.TimeoutError:
+        return False
+    finally:
+        # timed out / cancelled → stop tracking it
+        for key, futs in list(_WAITERS.items()):
+            if fut in futs:
+                futs.remove(fut)
+                if not futs:
+                    del _WAITERS[key]
+                break
+
+
+__all__ = ["expect", "done", "wait"]
@@ -1,9 +1,15 @@
 # NyxFan/api/utils/env.py
+from __future__ import annotations
+
 from pathlib import Path
 import os
 import sys
+from typing import TYPE_CHECKING, Callable, List
+
 from dotenv import load_dotenv
-from telegram.ext import Application
+
+if TYPE_CHECKING:
+    from telegram.ext import Application
 
 # Ensure both the NyxFan project root (that contains `api/`) AND the
 # repository root (that contains `shared/`) are importable.
@@ -31,11 +37,121 @@ PROFILE_URL = os.getenv("PROFILE_URL", "https://example.com/profile")
 if not BOT_TOKEN or not BOT_USERNAME:
     raise RuntimeError("Missing required .env vars for NyxFan: BOT_TOKEN and BOT_USERNAME")
 
-# Build the Telegram Application (default request; Fan bot is lightweight)
-app = Application.builder().token(BOT_TOKEN).build()
+# Outbound pacing (see utils/ratelimit.py): global and per-chat send budgets
+RATE_GLOBAL      = float(os.getenv("NYXFAN_RATE_GLOBAL", "30"))    # msg/s across all chats
+RATE_PER_CHAT    = float(os.getenv("NYXFAN_RATE_PER_CHAT", "1"))   # msg/s per private chat
+RATE_CHAT_BURST  = float(os.getenv("NYXFAN_RATE_CHAT_BURST", "3"))
+RATE_MAX_RETRIES = int(os.getenv("NYXFAN_RATE_MAX_RETRIES", "3"))  # RetryAfter retries per call
+
+
+def _opt_float(name: str, default: str) -> float | None:
+    v = os.getenv(name, default).strip().lower()
+    return None if v in ("", "none", "0") else float(v)
+
+
+# Outbound HTTP (see utils/http.py): sends and get_updates use separate pools so a
+# long poll never holds a connection a send is waiting for
+HTTP_POOL_SIZE      = int(os.getenv("NYXFAN_HTTP_POOL_SIZE", "64"))     # connections for sends
+HTTP_KEEPALIVE      = int(os.getenv("NYXFAN_HTTP_KEEPALIVE", str(HTTP_POOL_SIZE)))
+HTTP_KEEPALIVE_TTL  = float(os.getenv("NYXFAN_HTTP_KEEPALIVE_TTL", "30"))
+HTTP_CONNECT_TIMEOUT = _opt_float("NYXFAN_HTTP_CONNECT_TIMEOUT", "5")
+HTTP_READ_TIMEOUT    = _opt_float("NYXFAN_HTTP_READ_TIMEOUT", "10")
+HTTP_WRITE_TIMEOUT   = _opt_float("NYXFAN_HTTP_WRITE_TIMEOUT", "20")   # uploads
+HTTP_POOL_TIMEOUT    = _opt_float("NYXFAN_HTTP_POOL_TIMEOUT", "10")    # wait for a free connection
+HTTP_VERSION         = os.getenv("NYXFAN_HTTP_VERSION", "1.1")         # "2" needs the h2 package
+HTTP_UPDATES_POOL    = int(os.getenv("NYXFAN_HTTP_UPDATES_POOL", "2"))
+
+# Bot API server; point at bench/fake_bot_api.py (or a local Bot API server) for load tests
+BOT_API_URL = os.getenv("NYXFAN_BOT_API_URL", "https://api.telegram.org").rstrip("/")
+
+# The Telegram Application is built on first use (get_app() / `env.app`), not at
+# import: telegram.ext + the HTTP client are the bulk of a cold start.
+_APP: dict = {"app": None}
+_ON_BUILD: List[Callable[["Application"], None]] = []
+
+
+def on_build(fn: Callable[["Application"], None]) -> None:
+    """Run fn(app) once the Application exists (right away if it already does)."""
+    _ON_BUILD.append(fn)
+    if _APP["app"] is not None:
+        fn(_APP["app"])
+
+
+_REQUESTS: dict = {}
+
+
+def _build_requests() -> dict:
+    if not _REQUESTS:
+        from api.utils.http import PooledRequest
+
+        _REQUESTS["send"] = PooledRequest(
+            "send",
+            pool_size=HTTP_POOL_SIZE,
+            keepalive=HTTP_KEEPALIVE,
+            keepalive_expiry=HTTP_KEEPALIVE_TTL,
+            connect_timeout=HTTP_CONNECT_TIMEOUT,
+            read_timeout=HTTP_READ_TIMEOUT,
+            write_timeout=HTTP_WRITE_TIMEOUT,
+            pool_timeout=HTTP_POOL_TIMEOUT,
+            http_version=HTTP_VERSION,
+        )
+        # long polls hold their connection for the whole timeout; read_timeout is
+        # set per call by get_updates, so only the pool is sized here
+        _REQUESTS["updates"] = PooledRequest(
+            "updates",
+            pool_size=HTTP_UPDATES_POOL,
+            keepalive_expiry=HTTP_KEEPALIVE_TTL,
+            connect_timeout=HTTP_CONNECT_TIMEOUT,
+            pool_timeout=HTTP_POOL_TIMEOUT,
+            http_version=HTTP_VERSION,
+        )
+    return _REQUESTS
+
+
+def http_stats() -> list:
+    """Pool-wait counters for the send and get_updates clients (empty before the first build)."""
+    return [r.stats() for r in _REQUESTS.values()]
+
+
+def get_app() -> "Application":
+    if _APP["app"] is None:
+        from telegram.ext import Application
+        from api.utils.ratelimit import ChatRateLimiter
+
+        reqs = _build_requests()
+        # every call goes through the rate limiter, then through its own pool
+        _APP["app"] = (
+            Application.builder()
+            .token(BOT_TOKEN)
+            .base_url(f"{BOT_API_URL}/bot")
+            .base_file_url(f"{BOT_API_URL}/file/bot")
+            .request(reqs["send"])
+            .get_updates_request(reqs["updates"])
+            .rate_limiter(ChatRateLimiter(
+                overall_rate=RATE_GLOBAL,
+                chat_rate=RATE_PER_CHAT,
+                chat_burst=RATE_CHAT_BURST,
+                max_retries=RATE_MAX_RETRIES,
+            ))
+            .build()
+        )
+        for fn in _ON_BUILD:
+            fn(_APP["app"])
+    return _APP["app"]
+
+
+def __getattr__(name):
+    # `from api.utils.env import app` keeps working; it just builds on demand
+    if name == "app":
+        return get_app()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
 __all__ = [
     "app",
+    "get_app",
+    "on_build",
+    "http_stats",
     "BOT_TOKEN",
     "BOT_USERNAME",
     "INBOX_URL",
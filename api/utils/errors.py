@@ -1,5 +1,10 @@
 # NyxFan/api/utils/errors.py
-from telegram.ext import ContextTypes
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from telegram.ext import ContextTypes
 
 async def on_error(update: object, context: ContextTypes.DEFAULT_TYPE):
     # Minimal: print to console
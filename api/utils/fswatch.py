@@ -0,0 +1,125 @@
+# NyxFan/api/utils/fswatch.py
+"""
+Tiny file watcher for cross-process queue writes.
+
+- Linux: inotify through ctypes (no extra dependency), one blocking thread.
+- Anywhere inotify is unavailable: a thread that stat()s the matching files.
+The callback runs on the watcher thread; hop to the event loop yourself.
+"""
+
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import os
+import struct
+import threading
+import time
+from fnmatch import fnmatch
+from pathlib import Path
+from typing import Callable, Dict, Iterable
+
+IN_MODIFY      = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO    = 0x00000080
+IN_CREATE      = 0x00000100
+IN_CLOEXEC     = 0o2000000
+
+_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+_EVENT = struct.Struct("iIII")   # wd, mask, cookie, len (+ name)
+
+
+def _matches(name: str, patterns: Iterable[str]) -> bool:
+    return any(fnmatch(name, p) for p in patterns)
+
+
+def _inotify(targets: Dict[Path, tuple]):
+    """(fd, {wd: patterns}) or None when inotify can't be used here."""
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        fd = libc.inotify_init1(IN_CLOEXEC)
+    except Exception:
+        return None
+    if fd < 0:
+        return None
+    wds = {}
+    for d, patterns in targets.items():
+        wd = libc.inotify_add_watch(fd, os.fsencode(str(d)), _MASK)
+        if wd < 0:
+            os.close(fd)
+            return None
+        wds[wd] = patterns
+    return fd, wds
+
+
+def _inotify_loop(fd: int, wds: dict, callback: Callable[[], None]) -> None:
+    while True:
+        try:
+            buf = os.read(fd, 64 * 1024)
+        except OSError:
+            return
+        hit, i = False, 0
+        while i + _EVENT.size <= len(buf):
+            wd, _mask, _cookie, ln = _EVENT.unpack_from(buf, i)
+            name = buf[i + _EVENT.size: i + _EVENT.size + ln].rstrip(b"\0").decode("utf-8", "replace")
+            i += _EVENT.size + ln
+            if _matches(name, wds.get(wd, ())):
+                hit = True
+        if hit:
+            try:
+                callback()
+            except Exception:
+                pass
+
+
+def _stamps(targets: Dict[Path, tuple]) -> dict:
+    out = {}
+    for d, patterns in targets.items():
+        try:
+            names = os.listdir(d)
+        except OSError:
+            continue
+        for n in names:
+            if _matches(n, patterns):
+                try:
+                    st = os.stat(d / n)
+                    out[n, str(d)] = (st.st_ino, st.st_mtime_ns, st.st_size)
+                except OSError:
+                    pass
+    return out
+
+
+def _stat_loop(targets: Dict[Path, tuple], callback: Callable[[], None], interval: float) -> None:
+    last = _stamps(targets)
+    while True:
+        time.sleep(interval)
+        now = _stamps(targets)
+        if now != last:
+            last = now
+            try:
+                callback()
+            except Exception:
+                pass
+
+
+def watch(targets: Dict[Path, tuple], callback: Callable[[], None], interval: float = 1.0) -> str:
+    """
+    Call `callback()` whenever a file matching one of the patterns in a
+    watched directory ({dir: ("name", "*.log", ...)}) is written or replaced.
+    Returns "inotify" or "stat" (the mechanism that ended up in use).
+    """
+    targets = {Path(d): tuple(p) for d, p in targets.items() if p}
+    for d in targets:
+        d.mkdir(parents=True, exist_ok=True)
+    ino = _inotify(targets) if targets else None
+    if ino is not None:
+        fd, wds = ino
+        threading.Thread(target=_inotify_loop, args=(fd, wds, callback), name="nyxfan-fswatch", daemon=True).start()
+        return "inotify"
+    threading.Thread(
+        target=_stat_loop, args=(targets, callback, max(0.05, interval)), name="nyxfan-fswatch", daemon=True
+    ).start()
+    return "stat"
+
+
+__all__ = ["watch"]
@@ -1,50 +1,43 @@
 # NyxFan/api/utils/helpers.py
 
-import json
+import os
 import sys
 from pathlib import Path
-from dotenv import load_dotenv
-from api.utils.env import app
-from telegram import Bot
+from api.utils.env import BOT_USERNAME, get_app
 
 # Make the repository root (that contains `shared/`) importable.
 # This file lives at: <NyxFan>/api/utils/helpers.py
 ROOT = Path(__file__).resolve().parents[2]      # -> NyxFan/
-PROJECT_ROOT = ROOT.parents[0]        
+PROJECT_ROOT = ROOT.parents[0]        # directory that should contain `shared/`
 
-fan_bot: Bot = app.bot           # directory that should contain `shared/`
 
-if str(PROJECT_ROOT) not in sys.path:
-    sys.path.insert(0, str(PROJECT_ROOT))
+class _LazyBot:
+    """Stands in for app.bot; the Application is only built on first use."""
 
-# Load env from <NyxFan>/.env so fan bot can run standalone if needed.
-load_dotenv(dotenv_path=ROOT / ".env")
+    def __getattr__(self, name):
+        return getattr(get_app().bot, name)
 
-# Shared modules (live at <PROJECT_ROOT>/shared)
-from shared.fan_registry import register_user, get_telegram_id  # re-export
 
-# Paths used by NyxFan to read/write the cross-app queue
-QUEUE_PATH = PROJECT_ROOT / "shared" / "command_queue.json"
+fan_bot = _LazyBot()
 
-# In-memory state used by the fan bot
-ALL_DASH_MSGS: dict[int, list[int]] = {}
-USER_DISP: dict[int, str] = {}
+# Username for t.me deep links into the fan bot; this process is that bot unless told otherwise
+FAN_BOT_USERNAME = os.getenv("FAN_BOT_USERNAME") or BOT_USERNAME
 
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+# <NyxFan>/.env is loaded once, by api.utils.env
 
-def _write_text_atomic(path: Path, text: str):
-    tmp = path.with_suffix(path.suffix + ".tmp")
-    tmp.write_text(text)
-    tmp.replace(path)
+# Shared modules (live at <PROJECT_ROOT>/shared)
+from api.utils.resolve import register_user, get_telegram_id  # re-export (cached)
 
+# The cross-app queue: always through utils/io.py (backend, CAS, change feed).
+# No blind write_queue here — use update_queue() / write_queue_merged().
+from api.utils.io import QUEUE_PATH, read_queue, update_queue, write_queue_merged  # re-export
 
-def read_queue() -> list:
-    try:
-        return json.loads(QUEUE_PATH.read_text())
-    except Exception:
-        return []
+# In-memory state used by the fan bot (bounded + persisted, see utils/state.py)
+from api.utils.state import ALL_DASH_MSGS, USER_DISP  # re-export
 
-def write_queue(q: list) -> None:
-    _write_text_atomic(QUEUE_PATH, json.dumps(q, indent=2))
 
 def alert_admin(text: str): 
     print(f"[NyxFan ALERT] {text}")
\ No newline at end of file
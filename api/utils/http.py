@@ -0,0 +1,125 @@
+# NyxFan/api/utils/http.py
+"""
+Bot API HTTP client with a tunable connection pool.
+
+- PooledRequest is PTB's HTTPXRequest (pool size and timeouts through its
+  public arguments) with a semaphore in front of the pool, so we can count how
+  long calls wait for a free connection (stats()) instead of only seeing
+  TimedOut on exhaustion.
+- Keep-alive count / expiry have no public knob in PTB 20.x; they are set on
+  the client kwargs HTTPXRequest builds from, only if those internals look as
+  expected (tests/test_http.py pins them). Otherwise a warning is printed and
+  PTB's defaults stay.
+- HTTP/2 is used when asked for and available (h2 installed); otherwise it
+  falls back to HTTP/1.1 with a warning.
+- Every round trip is timed per Bot API method into utils.metrics.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Any, Dict, Optional
+
+import httpx
+from telegram.error import TimedOut
+from telegram.request import HTTPXRequest
+
+from api.utils import metrics
+
+
+class PooledRequest(HTTPXRequest):
+    __slots__ = ("name", "_size", "_pool_wait", "_sem", "_stats")
+
+    def __init__(
+        self,
+        name: str,
+        pool_size: int = 32,
+        keepalive: Optional[int] = None,
+        keepalive_expiry: float = 30.0,
+        connect_timeout: Optional[float] = 5.0,
+        read_timeout: Optional[float] = 10.0,
+        write_timeout: Optional[float] = 20.0,
+        pool_timeout: Optional[float] = 5.0,
+        http_version: str = "1.1",
+    ):
+        kwargs = dict(
+            connection_pool_size=pool_size,
+            connect_timeout=connect_timeout,
+            read_timeout=read_timeout,
+            write_timeout=write_timeout,
+            pool_timeout=pool_timeout,
+        )
+        try:
+            super().__init__(http_version=http_version, **kwargs)
+        except RuntimeError as e:
+            if http_version == "1.1":
+                raise
+            print(f"[NyxFan] {name}: HTTP/{http_version} unavailable ({e}); using HTTP/1.1")
+            super().__init__(http_version="1.1", **kwargs)
+        self.name = name
+        self._tune_keepalive(pool_size, keepalive, keepalive_expiry)
+        self._size = pool_size
+        self._pool_wait = pool_timeout
+        self._sem: Optional[asyncio.Semaphore] = None
+        self._stats: Dict[str, Any] = {
+            "requests": 0, "waited": 0, "wait_total": 0.0, "wait_max": 0.0,
+            "timeouts": 0, "in_flight": 0, "queued": 0,
+        }
+
+    def _tune_keepalive(self, pool_size: int, keepalive: Optional[int], expiry: float) -> None:
+        kw = getattr(self, "_client_kwargs", None)
+        if not isinstance(kw, dict) or "limits" not in kw or not callable(getattr(self, "_build_client", None)):
+            print(f"[NyxFan] {self.name}: python-telegram-bot internals changed; "
+                  "keep-alive settings ignored (PTB defaults)")
+            return
+        kw["limits"] = httpx.Limits(
+            max_connections=pool_size,
+            max_keepalive_connections=pool_size if keepalive is None else keepalive,
+            keepalive_expiry=expiry,
+        )
+        self._client = self._build_client()   # the default one was never opened
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool usage so far: requests, how many had to wait, wait times, current load."""
+        return {"name": self.name, "pool_size": self._size, **self._stats}
+
+    async def do_request(self, *args, **kwargs):
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(self._size)
+        st = self._stats
+        t0 = time.monotonic()
+        st["queued"] += 1
+        try:
+            await asyncio.wait_for(self._sem.acquire(), self._pool_wait)
+        except asyncio.TimeoutError:
+            st["timeouts"] += 1
+            raise TimedOut("Pool timeout: all connections in the connection pool are occupied") from None
+        finally:
+            st["queued"] -= 1
+        waited = time.monotonic() - t0
+        st["requests"] += 1
+        if waited > 0.001:
+            st["waited"] += 1
+            st["wait_total"] += waited
+            st["wait_max"] = max(st["wait_max"], waited)
+        st["in_flight"] += 1
+        url = kwargs.get("url", args[0] if args else "")
+        method = url.rsplit("/", 1)[-1] or "?"
+        status = "error"
+        t1 = time.monotonic()
+        try:
+            code, payload = await super().do_request(*args, **kwargs)
+            status = str(code)
+            return code, payload
+        except Exception as e:
+            status = type(e).__name__
+            raise
+        finally:
+            st["in_flight"] -= 1
+            self._sem.release()
+            metrics.observe("nyxfan_bot_api_seconds", time.monotonic() - t1, method=method)
+            metrics.inc("nyxfan_bot_api_requests_total", method=method, status=status)
+
+
+__all__ = ["PooledRequest"]
@@ -1,7 +1,17 @@
 # cubbyland-nyxfan/api/utils/io.py
+from __future__ import annotations
 
+import copy
+import fcntl
+import hashlib
 import json
+import os
+import time
+from contextlib import contextmanager
 from pathlib import Path
+from typing import Iterable, List
+
+from api.utils import trace
 
 # Resolve the path to the repo root (which contains `shared/`)
 # This file lives at: <NyxFan>/api/utils/io.py
@@ -12,35 +22,860 @@ REPO_ROOT    = PROJECT_ROOT.parents[0]   # -> repo root that contains `shared/`
 # Paths shared by both bots
 QUEUE_PATH = REPO_ROOT / "shared" / "command_queue.json"
 NOTIF_PATH = REPO_ROOT / "shared" / "fan_notifications.json"  # per-fan, per-creator prefs
+LOG_DIR    = REPO_ROOT / "shared" / "command_log"              # segmented log backend
+QUEUE_DB   = REPO_ROOT / "shared" / "command_queue.sqlite3"    # sqlite backend
 
 
-def _write_text_atomic(path: Path, text: str):
+def _write_bytes_atomic(path: Path, data: bytes):
     # Make sure the directory exists before writing
     path.parent.mkdir(parents=True, exist_ok=True)
     tmp = path.with_suffix(path.suffix + ".tmp")
-    tmp.write_text(text)
+    tmp.write_bytes(data)
     tmp.replace(path)
 
 
-def read_queue():
+def _write_text_atomic(path: Path, text: str):
+    _write_bytes_atomic(path, text.encode("utf-8"))
+
+
+# --- serialization of the shared files (queue, prefs, state snapshots) ---
+# NYXFAN_CODEC=json    compact JSON, via orjson when installed (default; what the Proxy reads)
+# NYXFAN_CODEC=msgpack msgpack behind a header: b"\0NYX msgpack\n" + payload
+# Readers sniff the header, so every format is always readable. A writer
+# answers in the format the other side last wrote to that file: while the
+# Proxy keeps writing plain JSON to command_queue.json, so do we.
+CODEC   = os.getenv("NYXFAN_CODEC", "json").strip().lower()
+_HEADER = b"\0NYX "   # plain JSON never starts with NUL
+
+_CODECS: dict = {}     # name → (dumps → bytes, loads ← bytes), built on first use
+_PEER: dict = {}       # path → codec the last foreign write used
+_OURS: dict = {}       # path → sha1 of the bytes we last wrote there
+
+
+def _json_codec():
+    try:
+        import orjson
+    except ImportError:
+        orjson = None
+
+    def _std_dumps(obj) -> bytes:
+        return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+    if orjson is None:
+        return _std_dumps, json.loads
+
+    def _dumps(obj) -> bytes:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:   # ints past 64 bits, odd key types → stdlib handles them
+            return _std_dumps(obj)
+
+    return _dumps, orjson.loads
+
+
+def _msgpack_codec():
+    import msgpack   # optional: only needed with NYXFAN_CODEC=msgpack or a peer using it
+
+    return (
+        lambda obj: msgpack.packb(obj, use_bin_type=True, strict_types=False),
+        lambda raw: msgpack.unpackb(raw, raw=False, strict_map_key=False),
+    )
+
+
+def _codec(name: str):
+    if name not in _CODECS:
+        _CODECS[name] = {"json": _json_codec, "msgpack": _msgpack_codec}[name]()
+    return _CODECS[name]
+
+
+def _split(raw: bytes) -> tuple[str, bytes]:
+    if raw[:len(_HEADER)] != _HEADER:
+        return "json", raw
+    head, _, body = raw.partition(b"\n")
+    return head[len(_HEADER):].decode("ascii", "replace").strip(), body
+
+
+def decode(raw: bytes, path: Path | None = None, digest: str | None = None):
+    """Parse a shared file's bytes (any codec; raises on garbage). `path` → note the peer's format."""
+    name, body = _split(raw)
+    if path is not None and raw:
+        if (digest or hashlib.sha1(raw).hexdigest()) != _OURS.get(path):
+            _PEER[path] = name
+    return _codec(name)[1](body)
+
+
+_MISSING: set = set()   # codecs we could not load (logged once)
+
+
+def _codec_for(path: Path | None) -> str:
+    want = _PEER.get(path) or CODEC
+    if want == "json" or want in _MISSING:
+        return "json"
+    try:
+        _codec(want)
+    except (ImportError, KeyError):
+        print(f"[NyxFan] codec {want!r} unavailable; writing JSON")
+        _MISSING.add(want)
+        return "json"
+    return want
+
+
+def encode(obj, path: Path | None = None) -> bytes:
+    """Bytes for `obj` in the format negotiated for `path` (compact JSON by default)."""
+    name = _codec_for(path)
+    body = _codec(name)[0](obj)
+    return body if name == "json" else _HEADER + name.encode("ascii") + b"\n" + body
+
+
+def read_data(path: Path):
+    """decode() of the file at `path` (raises if missing or unreadable)."""
+    return decode(path.read_bytes(), path)
+
+
+def write_data(path: Path, obj) -> bytes:
+    """Atomically replace `path` with encode(obj); returns the bytes written."""
+    data = encode(obj, path)
+    _write_bytes_atomic(path, data)
+    _OURS[path] = hashlib.sha1(data).hexdigest()
+    return data
+
+
+CAS_RETRIES = 20
+
+
+class QueueConflict(RuntimeError):
+    """A compare-and-swap write kept losing to concurrent writers."""
+
+
+@contextmanager
+def _flocked(path: Path):
+    # Advisory lock shared by every process that goes through this module
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a") as fh:
+        fcntl.flock(fh, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fh, fcntl.LOCK_UN)
+
+
+def _std_key(c) -> str:
+    return json.dumps(c, sort_keys=True, default=str)
+
+
+def _key_dumps():
     try:
-        data = json.loads(QUEUE_PATH.read_text())
+        import orjson
+    except ImportError:
+        return _std_key
+    opt = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS
+
+    def _dumps(c) -> str:
+        try:
+            return orjson.dumps(c, default=str, option=opt).decode()
+        except TypeError:
+            return _std_key(c)
+
+    return _dumps
+
+
+# Keys are compared in-process, plus saved as digests by _JsonQueue; if the
+# encoding changes across a restart (orjson added/removed) saved ones just
+# stop matching and those commands are handled once more
+_KEY = {"dumps": None}
+
+
+def _cmd_key(c) -> str:
+    """Stable identity for a queued command (content-based; ignores our _qid tag)."""
+    if isinstance(c, dict) and "_qid" in c:
+        c = {k: v for k, v in c.items() if k != "_qid"}
+    dumps = _KEY["dumps"]
+    if dumps is None:
+        dumps = _KEY["dumps"] = _key_dumps()
+    return dumps(c)
+
+
+def _key_digest(k: str) -> str:
+    # _cmd_key() strings are long; this is what gets saved to disk
+    return hashlib.sha1(k.encode("utf-8")).hexdigest()
+
+
+def due(c, now: float | None = None) -> bool:
+    """False while a command's "not_before" (unix seconds; see jobs/retry.py) is ahead."""
+    nb = c.get("not_before") if isinstance(c, dict) else None
+    if not nb:
+        return True
+    try:
+        return float(nb) <= (time.time() if now is None else now)
+    except (TypeError, ValueError):
+        return True
+
+
+class _JsonQueue:
+    """
+    Default backend: the whole queue is one JSON list in command_queue.json.
+    This is the format the Proxy reads/writes, so it stays the default.
+    Every mutation is a compare-and-swap against the file's content hash
+    (retried on conflict) under an advisory flock, so writers that go through
+    this module (worker ticks, other NyxFan processes) never drop each other's
+    items. The Proxy does not take that lock: a Proxy write landing between our
+    hash check and the rename is still lost. The window is one hash plus one
+    atomic replace, not a whole tick, but it is not closed.
+
+    claim() keeps the last parsed queue (and its command keys) keyed by the
+    file's stat(), so ticks that find the file unchanged skip the decode; any
+    write (ours or the Proxy's) replaces the file and forces one fresh parse.
+    Mutations (update/ack/append) still read and rewrite the whole file.
+
+    What each consumer already handled but left in the queue (muted alerts
+    kept for the dashboard) is saved next to it in command_queue.json.seen
+    as {consumer: {sha1 of command key: count}}, so a restart does not run
+    those commands (and their follow-ups) a second time. The file is written
+    by one process; two processes on one json queue would each claim
+    everything anyway (see webhook.py).
+    """
+
+    shared_claims = False   # claim state (_inflight/_seen) is per process
+
+    def __init__(self, path: Path):
+        self.path = path
+        self._lock_path = path.with_suffix(path.suffix + ".lock")
+        self._seen_path = path.with_suffix(path.suffix + ".seen")
+        # consumer → {key: count} it already handled but left in the queue (muted/pending)
+        self._seen: dict[str, dict[str, int]] = {}
+        self._saved_seen = None   # _seen_path as loaded: consumer → {digest: count}
+        # consumer → {key: count} currently being worked on by an in-flight tick
+        self._inflight: dict[str, dict[str, int]] = {}
+        # {key: count} acked while claimed → commit must not mark them seen
+        self._acked: dict[str, int] = {}
+        self._vstamp = None   # stat() of the file whose hash is cached in _vhash
+        self._vhash = ""
+        self._written = ""    # hash of the last text we wrote
+        self._parsed = None   # (stat stamp, queue, keys, key counts) of claim()'s last read
+        # (version before, version after, added, removed) of the last mutation
+        self.last_change = None
+
+    def version(self) -> str:
+        """Content hash of the file, re-hashed only when its stat() changes."""
+        try:
+            st = self.path.stat()
+        except FileNotFoundError:
+            return ""
+        stamp = (st.st_ino, st.st_mtime_ns, st.st_size)
+        if stamp != self._vstamp:
+            try:
+                raw = self.path.read_bytes()
+            except Exception:
+                return ""
+            self._vstamp, self._vhash = stamp, hashlib.sha1(raw).hexdigest()
+        return self._vhash
+
+    def watch_targets(self) -> dict:
+        return {self.path.parent: (self.path.name,)}
+
+    def read_versioned(self) -> tuple[str, list]:
+        try:
+            raw = self.path.read_bytes()
+        except Exception:
+            return "", []
+        version = hashlib.sha1(raw).hexdigest()
+        try:
+            data = decode(raw, self.path, version)
+        except Exception:
+            return version, []
         # queue must be a list; anything else → empty
-        return data if isinstance(data, list) else []
+        return version, data if isinstance(data, list) else []
+
+    def read(self) -> list:
+        return self.read_versioned()[1]
+
+    def write(self, q: list) -> None:
+        self._written = hashlib.sha1(write_data(self.path, q)).hexdigest()
+
+    def _disk_hash(self) -> str:
+        # same value read_versioned() reports, without decoding the queue
+        try:
+            return hashlib.sha1(self.path.read_bytes()).hexdigest()
+        except Exception:
+            return ""
+
+    def write_if(self, version: str, q: list) -> bool:
+        with _flocked(self._lock_path):
+            # raw bytes only: decoding the queue just to compare hashes is wasted work
+            if self._disk_hash() != version:
+                return False
+            self.write(q)
+            return True
+
+    def update(self, fn) -> list:
+        for _ in range(CAS_RETRIES):
+            version, q = self.read_versioned()
+            new_q = fn(list(q))
+            if new_q is None:
+                self.last_change = (version, version, [], [])
+                return q
+            if self.write_if(version, new_q):
+                self.last_change = (version, self._written, None, None)
+                return new_q
+        raise QueueConflict(f"queue changed under us {CAS_RETRIES} times in a row")
+
+    def append(self, cmds: List[dict]) -> None:
+        self.update(lambda q: q + cmds)
+        self.last_change = (*self.last_change[:2], list(cmds), [])
+
+    def _snapshot(self) -> tuple[list, list, dict]:
+        """The queue, each command's key and the key multiset, re-parsed only
+        when the file's stat() changed since the last call."""
+        try:
+            st = self.path.stat()
+            stamp = (st.st_ino, st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            stamp = None
+        if self._parsed is not None and stamp is not None and self._parsed[0] == stamp:
+            return self._parsed[1:]
+        # a write racing the stat only costs one extra parse: its stamp differs next time
+        q = self.read()
+        keys = [_cmd_key(c) for c in q]
+        # Multisets (key → count) so identical duplicates are tracked one by one
+        on_disk: dict[str, int] = {}
+        for k in keys:
+            on_disk[k] = on_disk.get(k, 0) + 1
+        self._parsed = (stamp, q, keys, on_disk)
+        return q, keys, on_disk
+
+    def _restore_seen(self, consumer: str, on_disk: dict) -> dict:
+        """This consumer's seen multiset, picked up from _seen_path on first use."""
+        seen = self._seen.get(consumer)
+        if seen is not None:
+            return seen
+        if self._saved_seen is None:
+            try:
+                data = read_data(self._seen_path)
+            except Exception:
+                data = None
+            self._saved_seen = data if isinstance(data, dict) else {}
+        seen = self._seen[consumer] = {}
+        saved = self._saved_seen.get(consumer)
+        if isinstance(saved, dict) and saved:
+            for k, n in on_disk.items():
+                d = _key_digest(k)
+                if d in saved:
+                    seen[k] = min(int(saved[d]), n)
+        return seen
+
+    def _save_seen(self) -> None:
+        data = dict(self._saved_seen or {})   # consumers that have not claimed since the restart
+        for consumer, seen in self._seen.items():
+            data[consumer] = {_key_digest(k): n for k, n in seen.items()}
+        self._saved_seen = data
+        try:
+            write_data(self._seen_path, data)
+        except Exception as e:
+            print(f"[NyxFan] queue seen-state write failed: {e!r}")
+
+    def claim(self, consumer: str, types, limit: int | None = None) -> List[dict]:
+        q, keys, on_disk = self._snapshot()
+        seen = self._restore_seen(consumer, on_disk)
+        for k in list(seen):   # forget entries that left the queue
+            seen[k] = min(seen[k], on_disk.get(k, 0))
+            if not seen[k]:
+                del seen[k]
+        busy = self._inflight.setdefault(consumer, {})
+        nth: dict[str, int] = {}
+        out = []
+        now = time.time()
+        for c, k in zip(q, keys):
+            if not isinstance(c, dict):
+                continue
+            if types is not None and c.get("type") not in types:
+                continue
+            if "not_before" in c and not due(c, now):
+                continue   # backing off: not claimed, not marked seen
+            nth[k] = nth.get(k, 0) + 1
+            if nth[k] <= seen.get(k, 0) + busy.get(k, 0):
+                continue
+            busy[k] = busy.get(k, 0) + 1
+            out.append(dict(c))   # the cached queue outlives this claim
+            if limit and len(out) >= limit:
+                break
+        return out
+
+    def ack(self, cmds: List[dict]) -> None:
+        gone: list = []
+
+        def _drop(q: list):
+            gone.clear()   # may be re-run on a CAS conflict
+            drop: dict[str, int] = {}
+            for c in cmds:
+                k = _cmd_key(c)
+                drop[k] = drop.get(k, 0) + 1
+            kept = []
+            for c in q:
+                k = _cmd_key(c)
+                if drop.get(k):
+                    drop[k] -= 1
+                    gone.append(c)
+                    continue
+                kept.append(c)
+            return kept if len(kept) != len(q) else None
+        self.update(_drop)
+        self.last_change = (*self.last_change[:2], [], gone)
+        for c in cmds:
+            k = _cmd_key(c)
+            if any(k in busy for busy in self._inflight.values()):
+                self._acked[k] = self._acked.get(k, 0) + 1
+
+    def commit(self, consumer: str, claimed: List[dict], retry: List[dict]) -> None:
+        retry_n: dict[str, int] = {}
+        for c in retry:
+            k = _cmd_key(c)
+            retry_n[k] = retry_n.get(k, 0) + 1
+        seen = self._seen.setdefault(consumer, {})
+        busy = self._inflight.setdefault(consumer, {})
+        marked = False
+        for c in claimed:
+            k = _cmd_key(c)
+            busy[k] = busy.get(k, 0) - 1
+            if busy[k] <= 0:
+                del busy[k]
+            if retry_n.get(k):
+                retry_n[k] -= 1
+            elif self._acked.get(k):
+                self._acked[k] -= 1
+                if not self._acked[k]:
+                    del self._acked[k]
+            else:
+                seen[k] = seen.get(k, 0) + 1
+                marked = True
+        if marked:
+            self._save_seen()
+
+    def compact(self) -> None:
+        return None
+
+
+class _LogQueue:
+    """
+    Segmented-log backend (NYXFAN_QUEUE_BACKEND=log; opt-in, never the default).
+    The Proxy only reads/writes command_queue.json, so with this backend its
+    commands are never seen: usable only where every producer goes through
+    this module (tests, benches, a Proxy that learns the log format).
+    Commands handed out carry a "_qid" (their log offset) so ack is a tombstone append.
+    """
+
+    shared_claims = False   # in-flight offsets are per process
+
+    def __init__(self, root: Path):
+        from api.utils.queue_log import SegmentedLog
+        self.log = SegmentedLog(root, segment_records=int(os.getenv("NYXFAN_LOG_SEGMENT_RECORDS", "1000")))
+        self._cursor: dict[str, int] = {}   # consumer → end offset seen by its last claim
+        self._inflight: dict[str, set[int]] = {}   # consumer → offsets claimed, not yet committed
+        self._read_end = 0   # end offset at the last full read()
+        # consumer → first offset still backing off ("not_before" ahead); the
+        # committed offset stays at or before it so a later claim finds it again
+        self._later: dict[str, int | None] = {}
+        # consumer → offsets past _later it already handled (kept, not acked)
+        self._passed: dict[str, set[int]] = {}
+        self.last_change = None
+
+    def version(self) -> str:
+        return self.log.version()
+
+    def watch_targets(self) -> dict:
+        return {self.log.root: ("*.log",)}
+
+    @staticmethod
+    def _tag(o: int, c: dict) -> dict:
+        d = dict(c)
+        d["_qid"] = o
+        return d
+
+    @staticmethod
+    def _untag(c: dict) -> dict:
+        return {k: v for k, v in c.items() if k != "_qid"}
+
+    def read(self) -> list:
+        out = [self._tag(o, c) for o, c in self.log.entries()]
+        self._read_end = self.log.end_offset()
+        return out
+
+    def write(self, q: list, base: list | None = None) -> None:
+        # Translate a full-list rewrite into tombstones + appends. Only commands
+        # the caller actually saw (`base`, else the last read()) can be dropped;
+        # anything appended since is merged in.
+        if base is not None:
+            seen = {c.get("_qid") for c in base if isinstance(c, dict)}
+            live = {o: c for o, c in self.log.entries() if o in seen}
+        else:
+            live = {o: c for o, c in self.log.entries() if o < self._read_end}
+        keep, add = set(), []
+        for c in q:
+            if not isinstance(c, dict):
+                continue
+            o = c.get("_qid")
+            if o is None:
+                add.append(c)
+            elif o in live:
+                if self._untag(c) == live[o]:
+                    keep.add(o)
+                else:
+                    add.append(self._untag(c))   # edited → replace
+            # else: acked by someone else since our read → don't resurrect
+        self.log.ack([o for o in live if o not in keep])
+        self.log.append(add)
+
+    def append(self, cmds: List[dict]) -> None:
+        cmds = [self._untag(c) for c in cmds]
+        self.log.append(cmds)
+        self.last_change = (*self.log.last_span, cmds, [])
+
+    def claim(self, consumer: str, types, limit: int | None = None) -> List[dict]:
+        start = self.log.committed(consumer)
+        busy = self._inflight.setdefault(consumer, set())
+        passed = self._passed.setdefault(consumer, set())
+        out = []
+        later = None
+        now = time.time()
+        # Everything up to here that is not ours counts as passed
+        end = self.log.end_offset()
+        for o, c in self.log.read_from(start):
+            if types is not None and c.get("type") not in types:
+                continue
+            if o in busy or o in passed:
+                continue
+            if "not_before" in c and not due(c, now):
+                if later is None:
+                    later = o
+                continue
+            busy.add(o)
+            out.append(self._tag(o, c))
+            if limit and len(out) >= limit:
+                end = o + 1
+                break
+        self._later[consumer] = later
+        self._cursor[consumer] = max(end, self._cursor.get(consumer, 0))
+        if later is not None:
+            self._cursor[consumer] = min(self._cursor[consumer], later)
+        if not out and not busy:
+            self.log.commit(consumer, self._cursor[consumer])
+        return out
+
+    def ack(self, cmds: List[dict]) -> None:
+        gone = self.log.ack(c["_qid"] for c in cmds if isinstance(c, dict) and "_qid" in c)
+        self.last_change = (*self.log.last_span, [], gone)
+
+    def commit(self, consumer: str, claimed: List[dict], retry: List[dict]) -> None:
+        # Retries move to the tail so the consumer offset can pass them
+        if retry:
+            self.ack(retry)
+            first = self.last_change
+            self.append(retry)
+            second = self.last_change
+            if first[1] == second[0]:
+                self.last_change = (first[0], second[1], second[2], first[3])
+            else:   # someone appended in between → not one delta; let views re-read
+                self.last_change = (first[0], second[1], None, None)
+        busy = self._inflight.setdefault(consumer, set())
+        busy.difference_update(c["_qid"] for c in claimed if "_qid" in c)
+        upto = max((c["_qid"] + 1 for c in claimed if "_qid" in c), default=0)
+        upto = max(upto, self._cursor.get(consumer, 0))
+        # never move past work another in-flight tick still holds
+        if busy:
+            upto = min(upto, min(busy))
+        passed = self._passed.setdefault(consumer, set())
+        later = self._later.get(consumer)
+        if later is not None:
+            # held at a backing-off job: remember what we finished beyond it
+            upto = min(upto, later)
+            retried = {c["_qid"] for c in retry if "_qid" in c}
+            passed.update(c["_qid"] for c in claimed if "_qid" in c and c["_qid"] not in retried)
+        passed.difference_update([o for o in passed if o < upto])
+        self.log.commit(consumer, upto)
+
+    def compact(self) -> None:
+        self.log.compact()
+
+
+def _sqlite_queue():
+    from api.utils.queue_sqlite import SqliteQueue
+    return SqliteQueue(QUEUE_DB)
+
+
+# name → factory; pick one with NYXFAN_QUEUE_BACKEND (default "json")
+QUEUE_BACKENDS: dict = {
+    "json":   lambda: _JsonQueue(QUEUE_PATH),
+    "log":    lambda: _LogQueue(LOG_DIR),
+    "sqlite": _sqlite_queue,
+}
+
+_QUEUE = None
+
+
+def register_queue_backend(name: str, factory) -> None:
+    """Make a backend selectable by name. `factory()` returns an object with
+    read/write/append/claim/ack/commit/compact like the built-in ones (and
+    shared_claims = True if claims hold across processes)."""
+    QUEUE_BACKENDS[name.strip().lower()] = factory
+
+
+def set_queue_backend(backend) -> None:
+    """Switch the process to a backend (a registered name or an instance)."""
+    global _QUEUE
+    _QUEUE = QUEUE_BACKENDS[backend.strip().lower()]() if isinstance(backend, str) else backend
+
+
+def _queue():
+    if _QUEUE is None:
+        name = os.getenv("NYXFAN_QUEUE_BACKEND", "json").strip().lower()
+        if name not in QUEUE_BACKENDS:
+            raise RuntimeError(f"Unknown NYXFAN_QUEUE_BACKEND: {name!r} (have: {', '.join(QUEUE_BACKENDS)})")
+        set_queue_backend(name)
+    return _QUEUE
+
+
+# ───────────── change feed ─────────────
+# Listeners get fn(before, after, added, removed) after each mutation made
+# through this module: the queue version before/after it, and the commands it
+# added/removed (None → unknown, e.g. a whole-list write; re-read the queue).
+# Changes made by other processes only show up as a new queue_version().
+_LISTENERS: list = []
+
+
+def subscribe(fn) -> None:
+    if fn not in _LISTENERS:
+        _LISTENERS.append(fn)
+
+
+def _notify(b, exact: bool = True) -> None:
+    change = getattr(b, "last_change", None) if exact else None
+    if exact:
+        if change is None:
+            return   # the backend reported nothing (e.g. a claim that changed nothing)
+        b.last_change = None
+    else:
+        change = ("", "", None, None)
+    for fn in list(_LISTENERS):
+        try:
+            fn(*change)
+        except Exception:
+            pass
+
+
+def queue_version() -> str:
+    """Opaque token that changes whenever the queue does ("" → backend can't tell)."""
+    b = _queue()
+    try:
+        return b.version() if hasattr(b, "version") else ""
     except Exception:
-        # If file doesn't exist or is unreadable, treat as empty queue
-        return []
+        return ""
+
+
+def queue_claims_shared() -> bool:
+    """True → a claim is visible to other processes on the same queue, so
+    several of them can consume it without handing out the same command twice."""
+    return bool(getattr(_queue(), "shared_claims", False))
+
+
+def queue_watch_targets() -> dict:
+    """{directory: (file name patterns,)} whose writes mean the queue changed."""
+    b = _queue()
+    return b.watch_targets() if hasattr(b, "watch_targets") else {}
+
+
+def read_queue():
+    return _queue().read()
 
 
 def write_queue(q):
+    """Blind overwrite. Prefer update_queue()/write_queue_merged() when other
+    writers (Proxy, callbacks, other workers) may have touched the queue."""
     # force list on disk
     if not isinstance(q, list):
         q = []
-    _write_text_atomic(QUEUE_PATH, json.dumps(q, indent=2))
+    b = _queue()
+    b.write(q)
+    _notify(b, exact=False)
+
+
+def read_queue_versioned() -> tuple[str, list]:
+    """
+    (version, queue) for a compare-and-swap via write_queue_if().
+    Only the json backend versions the whole file; others return "".
+    """
+    b = _queue()
+    if hasattr(b, "read_versioned"):
+        return b.read_versioned()
+    return "", b.read()
+
+
+def write_queue_if(version: str, q: list) -> bool:
+    """Write `q` only if the queue is still at `version`. False → re-read and retry."""
+    b = _queue()
+    if hasattr(b, "write_if"):
+        ok = b.write_if(version, q if isinstance(q, list) else [])
+    else:
+        b.write(q if isinstance(q, list) else [])   # log/sqlite writes already merge
+        ok = True
+    if ok:
+        _notify(b, exact=False)
+    return ok
+
+
+def update_queue(fn) -> list:
+    """
+    Atomic read-modify-write: fn(queue) → new queue (or None for "no change").
+    Re-run on conflict, so fn must not have side effects (no awaits/sends).
+    """
+    b = _queue()
+    if hasattr(b, "update"):
+        out = b.update(fn)
+    else:
+        q = b.read()
+        out = fn(list(q))
+        if out is None:
+            return q
+        b.write(out)
+    _notify(b, exact=False)
+    return out
+
+
+def _merge(base: list, new_q: list, current: list) -> list:
+    """3-way merge: our edits (base → new_q) replayed on top of `current`."""
+    def _counts(items) -> dict:
+        out: dict[str, int] = {}
+        for c in items:
+            k = _cmd_key(c)
+            out[k] = out.get(k, 0) + 1
+        return out
+
+    base_n, cur_n = _counts(base), _counts(current)
+    # items others appended since `base` was read
+    extra = {k: n - base_n.get(k, 0) for k, n in cur_n.items() if n > base_n.get(k, 0)}
+    # items others removed since `base` was read
+    gone = {k: n - cur_n.get(k, 0) for k, n in base_n.items() if n > cur_n.get(k, 0)}
+    out = []
+    for c in new_q:
+        k = _cmd_key(c)
+        if gone.get(k):
+            gone[k] -= 1
+            continue
+        out.append(c)
+    for c in current:
+        k = _cmd_key(c)
+        if extra.get(k):
+            extra[k] -= 1
+            out.append(c)
+    return out
+
+
+def write_queue_merged(base: list, new_q: list) -> list:
+    """
+    Write a queue edited from snapshot `base` without losing what others
+    appended/removed in the meantime (for read → await … → write loops).
+    """
+    b = _queue()
+    if hasattr(b, "update"):
+        snapshot = list(base)
+        out = b.update(lambda cur: _merge(snapshot, new_q, cur))
+    else:
+        b.write(new_q, base=base)
+        out = b.read()
+    _notify(b, exact=False)
+    return out
+
+
+def enqueue(*cmds: dict) -> None:
+    """Append commands to the queue without rewriting what is already there.
+    Each one gets a trace id and enqueue time (utils/trace.py) unless it has them."""
+    cmds = [trace.stamp(c) for c in cmds if isinstance(c, dict)]
+    if cmds:
+        b = _queue()
+        b.append(cmds)
+        _notify(b)
+        trace.spans(cmds, "enqueued")
+
+
+def claim(consumer: str, types: Iterable[str] | None = None, limit: int | None = None) -> List[dict]:
+    """
+    Commands this consumer has not handled yet (optionally only these types,
+    at most `limit` of them). Follow with ack() for finished ones and
+    commit() once the batch is done.
+    """
+    b = _queue()
+    out = b.claim(consumer, set(types) if types is not None else None, limit)
+    _notify(b)
+    return out
+
+
+def ack(cmds: Iterable[dict]) -> None:
+    """Remove finished commands from the queue."""
+    cmds = list(cmds)
+    if cmds:
+        b = _queue()
+        b.ack(cmds)
+        _notify(b)
+
+
+def commit(consumer: str, claimed: Iterable[dict], retry: Iterable[dict] = ()) -> None:
+    """
+    Mark a claimed batch as handled by `consumer`. Anything not acked stays
+    visible in the queue (dashboard) but is not handed to this consumer again,
+    except the `retry` ones, which come back on a later claim. The log and
+    sqlite backends store a retried command as passed; json knows commands by
+    content, so to change one (attempts, not_before) enqueue the edited copy
+    and ack the original, as jobs/retry.py callers do.
+    """
+    b = _queue()
+    b.commit(consumer, list(claimed), list(retry))
+    _notify(b)
+
+
+def compact_queue() -> None:
+    """Drop storage every consumer has moved past (log segments / sqlite WAL)."""
+    _queue().compact()
 
 
 # --- per-fan, per-creator notification prefs ---
-def read_notifs() -> dict:
+NOTIF_STAT_INTERVAL = 0.5   # seconds between stat() checks for outside edits
+
+# Parsed fan_notifications.json, reloaded only when the file's mtime/size changes
+_NOTIFS: dict = {"data": {}, "stamp": None, "checked": 0.0}
+
+
+def _notif_stamp():
+    try:
+        st = NOTIF_PATH.stat()
+        return (st.st_mtime_ns, st.st_size)
+    except FileNotFoundError:
+        return "missing"
+
+
+def _load_notifs() -> dict:
+    try:
+        data = read_data(NOTIF_PATH)
+        return data if isinstance(data, dict) else {}
+    except Exception:
+        return {}
+
+
+def _notifs(fresh: bool = False) -> dict:
+    """The cached prefs dict (do not mutate; use read_notifs() for a copy)."""
+    now = time.monotonic()
+    if fresh:
+        # write paths: straight from disk, no stat throttle, no stamp shortcut
+        _NOTIFS["checked"] = now
+        _NOTIFS["stamp"] = _notif_stamp()
+        _NOTIFS["data"] = _load_notifs()
+    elif _NOTIFS["stamp"] is None or now - _NOTIFS["checked"] >= NOTIF_STAT_INTERVAL:
+        _NOTIFS["checked"] = now
+        stamp = _notif_stamp()
+        if stamp != _NOTIFS["stamp"]:
+            _NOTIFS["data"] = _load_notifs()
+            _NOTIFS["stamp"] = stamp
+    return _NOTIFS["data"]
+
+
+def read_notifs(fresh: bool = False) -> dict:
     """
     Returns a dict mapping:
       {
@@ -49,15 +884,35 @@ def read_notifs() -> dict:
         }
       }
     Any non-dict on disk (e.g., legacy [], "", null) is treated as {}.
+    The result is a private copy; callers may edit it and pass it to write_notifs().
+    Reads are served from a cache re-validated every NOTIF_STAT_INTERVAL; a
+    read-modify-write must pass fresh=True so it starts from what is on disk
+    now (a Proxy write inside that interval would otherwise be overwritten).
     """
-    try:
-        data = json.loads(NOTIF_PATH.read_text())
-        return data if isinstance(data, dict) else {}
-    except Exception:
-        return {}
+    return copy.deepcopy(_notifs(fresh))
 
 
 def write_notifs(data: dict) -> None:
     if not isinstance(data, dict):
         data = {}
-    _write_text_atomic(NOTIF_PATH, json.dumps(data, indent=2))
+    write_data(NOTIF_PATH, data)
+    _NOTIFS["data"] = copy.deepcopy(data)
+    _NOTIFS["stamp"] = _notif_stamp()
+    _NOTIFS["checked"] = time.monotonic()
+
+
+def get_prefs(tg_id, creator: str) -> dict:
+    """{"mode": ..., "muted": ...} for one fan/creator, with defaults filled in."""
+    user = _notifs().get(str(tg_id))
+    prefs = user.get(creator) if isinstance(user, dict) else None
+    if not isinstance(prefs, dict):
+        prefs = {}
+    return {"mode": prefs.get("mode", "immediate"), "muted": bool(prefs.get("muted", False))}
+
+
+def is_muted(tg_id, creator: str) -> bool:
+    return get_prefs(tg_id, creator)["muted"]
+
+
+def get_mode(tg_id, creator: str) -> str:
+    return get_prefs(tg_id, creator)["mode"]
@@ -0,0 +1,222 @@
+# NyxFan/api/utils/media.py
+"""
+file_id → media kind memo (photo / animation / video / document).
+
+Telegram won't tell us what a bare file_id is, so the 'View All' senders used
+to try reply_photo → reply_animation → reply_video → reply_document until one
+stuck. Kinds we learn (from teaser.kind / items[].kind, or from a send that
+succeeded) are kept here and persisted to shared/file_kinds.json, so later
+sends go straight to the right method; the cascade is only the cache-miss path.
+
+send_items() delivers an items list with as few calls as Telegram allows:
+runs of photos/videos (or of documents) go out as media groups of up to 10.
+When a call fails after earlier ones went out it raises PartialSend with the
+items still to send, so a retry does not repeat what the fan already has.
+"""
+
+from __future__ import annotations
+
+import time
+from typing import Any, Dict, List, Optional
+
+from telegram import InputMediaDocument, InputMediaPhoto, InputMediaVideo
+
+from api.utils.io import REPO_ROOT, read_data, write_data
+
+KINDS_PATH = REPO_ROOT / "shared" / "file_kinds.json"
+KINDS = ("photo", "animation", "video", "document")
+MAX_ENTRIES = 50_000      # oldest learned kinds are dropped past this
+FLUSH_INTERVAL = 5.0      # seconds between disk writes of new kinds
+GROUP_MAX = 10            # Telegram's media group limit
+
+# kinds that may share one media group (animations can't be grouped at all)
+_GROUP_OF = {"photo": "visual", "video": "visual", "document": "document"}
+
+_KIND: Dict[str, str] = {}
+_STATE = {"loaded": False, "dirty": 0, "flushed": 0.0}
+
+
+def _load() -> None:
+    if _STATE["loaded"]:
+        return
+    _STATE["loaded"] = True
+    try:
+        data = read_data(KINDS_PATH)
+        if isinstance(data, dict):
+            _KIND.update({k: v for k, v in data.items() if v in KINDS})
+    except Exception:
+        pass
+
+
+def flush(force: bool = False) -> None:
+    if not _STATE["dirty"]:
+        return
+    now = time.monotonic()
+    if not force and now - _STATE["flushed"] < FLUSH_INTERVAL and _STATE["dirty"] < 100:
+        return
+    try:
+        write_data(KINDS_PATH, _KIND)
+        _STATE["dirty"] = 0
+        _STATE["flushed"] = now
+    except Exception:
+        pass
+
+
+def kind_of(file_id: str) -> Optional[str]:
+    _load()
+    return _KIND.get(file_id)
+
+
+def remember_kind(file_id, kind) -> None:
+    if not isinstance(file_id, str) or not file_id:
+        return
+    kind = (kind or "").lower()
+    if kind not in KINDS:
+        return
+    _load()
+    if _KIND.get(file_id) == kind:
+        return
+    _KIND.pop(file_id, None)
+    _KIND[file_id] = kind
+    while len(_KIND) > MAX_ENTRIES:
+        _KIND.pop(next(iter(_KIND)))
+    _STATE["dirty"] += 1
+    flush()
+
+
+def remember_items(items) -> None:
+    """Learn kinds from an items list like [{"kind": "video", "file_id": "..."}]."""
+    for it in items or []:
+        if isinstance(it, dict):
+            remember_kind(it.get("file_id"), it.get("kind"))
+
+
+async def reply_media(msg, file_id: str, **kwargs) -> bool:
+    """
+    Reply to `msg` with `file_id` using the memoized kind; on a miss (or if
+    the memo turns out wrong) fall back to photo → animation → video → document.
+    Returns True once something was sent. Exceptions are swallowed.
+    """
+    senders = {
+        "photo":     lambda: msg.reply_photo(photo=file_id, **kwargs),
+        "animation": lambda: msg.reply_animation(animation=file_id, **kwargs),
+        "video":     lambda: msg.reply_video(video=file_id, **kwargs),
+        "document":  lambda: msg.reply_document(document=file_id, **kwargs),
+    }
+    known = kind_of(file_id)
+    order = ([known] if known else []) + [k for k in KINDS if k != known]
+    for kind in order:
+        try:
+            await senders[kind]()
+        except Exception:
+            continue
+        remember_kind(file_id, kind)
+        return True
+    return False
+
+
+def _item_kind(it: dict) -> str:
+    kind = (it.get("kind") or "").lower() or (kind_of(it.get("file_id")) or "")
+    return kind if kind in KINDS else "document"
+
+
+def _batches(items) -> List[List[tuple]]:
+    """Consecutive compatible items, chunked to GROUP_MAX; order is kept."""
+    out: List[List[tuple]] = []
+    for it in items or []:
+        if not isinstance(it, dict):
+            continue
+        fid = it.get("file_id")
+        if not isinstance(fid, str) or len(fid) < 10:
+            continue
+        kind = _item_kind(it)
+        group = _GROUP_OF.get(kind)
+        last = out[-1] if out else None
+        if (
+            group is not None and last
+            and _GROUP_OF.get(last[0][0]) == group
+            and len(last) < GROUP_MAX
+        ):
+            last.append((kind, fid))
+        else:
+            out.append([(kind, fid)])
+    return out
+
+
+class PartialSend(Exception):
+    """send_items() stopped part-way: `left` are the items not sent yet (in
+    order), `error` is the exception that stopped it."""
+
+    def __init__(self, left: List[dict], error: BaseException):
+        super().__init__(f"{len(left)} item(s) left after {error!r}")
+        self.left = left
+        self.error = error
+
+
+async def _send_one(bot, chat_id, kind: str, fid: str, **kw) -> None:
+    if kind == "photo":
+        await bot.send_photo(chat_id=chat_id, photo=fid, **kw)
+    elif kind == "animation":
+        await bot.send_animation(chat_id=chat_id, animation=fid, **kw)
+    elif kind == "video":
+        await bot.send_video(chat_id=chat_id, video=fid, supports_streaming=True, **kw)
+    else:
+        await bot.send_document(chat_id=chat_id, document=fid, **kw)
+
+
+def _input_media(kind: str, fid: str, caption: Optional[str], parse_mode: Optional[str]):
+    if kind == "photo":
+        return InputMediaPhoto(fid, caption=caption, parse_mode=parse_mode)
+    if kind == "video":
+        return InputMediaVideo(fid, caption=caption, parse_mode=parse_mode, supports_streaming=True)
+    return InputMediaDocument(fid, caption=caption, parse_mode=parse_mode)
+
+
+async def send_items(
+    bot,
+    chat_id,
+    items,
+    *,
+    caption: Optional[str] = None,
+    parse_mode: Optional[str] = None,
+    reply_to_message_id: Optional[int] = None,
+    ignore_errors: bool = False,
+) -> int:
+    """
+    Send [{"kind", "file_id"}, ...] to one chat. Photos+videos and documents
+    are grouped (≤ GROUP_MAX per call, caption on the group); animations,
+    lone items and anything else go out one by one with the caption.
+    Returns the number of API calls made. With ignore_errors, a failed call
+    doesn't stop the rest; without, the first failure is re-raised, or raised
+    as PartialSend if some items already went out.
+    """
+    remember_items(items)
+    calls = 0
+    sent: set = set()   # file_ids delivered so far
+    kw: Dict[str, Any] = {"caption": caption, "parse_mode": parse_mode}
+    if reply_to_message_id is not None:
+        kw["reply_to_message_id"] = reply_to_message_id
+    for batch in _batches(items):
+        try:
+            if len(batch) == 1:
+                await _send_one(bot, chat_id, batch[0][0], batch[0][1], **kw)
+            else:
+                media = [
+                    _input_media(kind, fid, caption if i == 0 else None, parse_mode)
+                    for i, (kind, fid) in enumerate(batch)
+                ]
+                await bot.send_media_group(chat_id=chat_id, media=media, reply_to_message_id=reply_to_message_id)
+            sent.update(fid for _kind, fid in batch)
+        except Exception as e:
+            if ignore_errors:
+                continue
+            if not sent:
+                raise
+            left = [it for it in items if not (isinstance(it, dict) and it.get("file_id") in sent)]
+            raise PartialSend(left, e) from e
+        finally:
+            calls += 1
+    return calls
+
+
+__all__ = ["PartialSend", "kind_of", "remember_kind", "remember_items", "reply_media", "send_items", "flush"]
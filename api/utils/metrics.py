@@ -0,0 +1,250 @@
+# NyxFan/api/utils/metrics.py
+"""
+In-process metrics, rendered as Prometheus text.
+
+- inc() counters and observe() histograms, keyed by name + labels.
+- Collectors (add_collector) are read at render time: queue depth per job
+  type and HTTP pool usage are computed when somebody looks, not on every write.
+- render() → text for GET /api/metrics (webhook mode); write_snapshot() puts
+  the same text in a file for polling mode (node_exporter textfile style).
+
+What is recorded where:
+  nyxfan_job_tick_seconds{job}             worker ticks (index.py jobs, webhook drains)
+  nyxfan_handler_seconds{handler}          /start + every callback query handler
+  nyxfan_handler_errors_total{handler}
+  nyxfan_bot_api_seconds{method}           one HTTP round trip (utils/http.py)
+  nyxfan_bot_api_requests_total{method,status}
+  nyxfan_queue_depth{type}                 commands currently in the queue
+  nyxfan_job_latency_seconds{type}         enqueue → delivered (utils/trace.py)
+  nyxfan_jobs_deferred_total{type}         unroutable jobs put on backoff (jobs/retry.py)
+  nyxfan_jobs_dead_total{type}             jobs moved to the dead-letter file
+"""
+
+from __future__ import annotations
+
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Tuple
+
+# seconds; covers a dashboard render (ms) up to a job that waited out a few safety polls
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0)
+
+HELP = {
+    "nyxfan_job_tick_seconds": ("histogram", "Duration of one queue worker tick"),
+    "nyxfan_handler_seconds": ("histogram", "Duration of one update handler call"),
+    "nyxfan_handler_errors_total": ("counter", "Update handler calls that raised"),
+    "nyxfan_bot_api_seconds": ("histogram", "Bot API HTTP round trip, after the pool wait"),
+    "nyxfan_bot_api_requests_total": ("counter", "Bot API calls by HTTP status (or exception name)"),
+    "nyxfan_queue_depth": ("gauge", "Commands in the shared queue by type"),
+    "nyxfan_job_latency_seconds": ("histogram", "Enqueue (or origin) to delivery of a job (utils/trace.py)"),
+    "nyxfan_jobs_deferred_total": ("counter", "Unroutable jobs rescheduled with backoff"),
+    "nyxfan_jobs_dead_total": ("counter", "Jobs moved to the dead-letter file"),
+    "nyxfan_http_pool_in_flight": ("gauge", "Bot API requests currently holding a connection"),
+    "nyxfan_http_pool_queued": ("gauge", "Bot API requests waiting for a connection"),
+    "nyxfan_http_pool_wait_seconds_total": ("counter", "Time spent waiting for a free connection"),
+    "nyxfan_http_pool_timeouts_total": ("counter", "Requests that gave up waiting for a connection"),
+}
+
+Labels = Tuple[Tuple[str, str], ...]
+
+_LOCK = threading.Lock()
+_COUNTERS: Dict[str, Dict[Labels, float]] = {}
+# name → labels → [bucket counts..., +Inf count, sum]
+_HISTS: Dict[str, Dict[Labels, List[float]]] = {}
+_COLLECTORS: List[Callable[[], Iterable[Tuple[str, dict, float]]]] = []
+
+
+def _key(labels: dict) -> Labels:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def inc(name: str, value: float = 1.0, **labels) -> None:
+    k = _key(labels)
+    with _LOCK:
+        series = _COUNTERS.setdefault(name, {})
+        series[k] = series.get(k, 0.0) + value
+
+
+def observe(name: str, seconds: float, **labels) -> None:
+    k = _key(labels)
+    with _LOCK:
+        h = _HISTS.setdefault(name, {}).get(k)
+        if h is None:
+            h = _HISTS[name][k] = [0.0] * (len(BUCKETS) + 2)
+        for i, le in enumerate(BUCKETS):
+            if seconds <= le:
+                h[i] += 1
+                break
+        else:
+            h[len(BUCKETS)] += 1
+        h[-1] += seconds
+
+
+@contextmanager
+def timer(name: str, errors: str | None = None, **labels):
+    """Observe the block's duration in `name`; count exceptions in `errors` (if given)."""
+    t0 = time.monotonic()
+    try:
+        yield
+    except BaseException:
+        if errors:
+            inc(errors, **labels)
+        raise
+    finally:
+        observe(name, time.monotonic() - t0, **labels)
+
+
+def timed(name: str, errors: str | None = None, **labels):
+    """Decorator form of timer() for coroutine functions."""
+    def wrap(fn):
+        @functools.wraps(fn)
+        async def inner(*args, **kwargs):
+            with timer(name, errors, **labels):
+                return await fn(*args, **kwargs)
+        return inner
+    return wrap
+
+
+def add_collector(fn: Callable[[], Iterable[Tuple[str, dict, float]]]) -> None:
+    """fn() → [(metric name, labels, value)], called on every render/snapshot."""
+    if fn not in _COLLECTORS:
+        _COLLECTORS.append(fn)
+
+
+# ───────────────────────────── built-in collectors ─────────────────────────────
+
+_DEPTH: dict = {"version": None, "counts": {}}
+
+
+def _queue_depth():
+    from api.utils.io import queue_version, read_queue
+
+    version = queue_version()
+    if not version or version != _DEPTH["version"]:
+        counts: Dict[str, int] = {}
+        for c in read_queue():
+            t = c.get("type") if isinstance(c, dict) else None
+            counts[str(t)] = counts.get(str(t), 0) + 1
+        _DEPTH.update(version=version, counts=counts)
+    return [("nyxfan_queue_depth", {"type": t}, n) for t, n in _DEPTH["counts"].items()]
+
+
+def _http_pools():
+    from api.utils.env import http_stats
+
+    out = []
+    for st in http_stats():
+        pool = {"pool": st["name"]}
+        out += [
+            ("nyxfan_http_pool_in_flight", pool, st["in_flight"]),
+            ("nyxfan_http_pool_queued", pool, st["queued"]),
+            ("nyxfan_http_pool_wait_seconds_total", pool, st["wait_total"]),
+            ("nyxfan_http_pool_timeouts_total", pool, st["timeouts"]),
+        ]
+    return out
+
+
+add_collector(_queue_depth)
+add_collector(_http_pools)
+
+
+# ───────────────────────────── output ─────────────────────────────
+
+def _fmt_labels(labels, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    esc = lambda v: str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in pairs) + "}"
+
+
+def _fmt_value(v: float) -> str:
+    return str(int(v)) if float(v).is_integer() else repr(float(v))
+
+
+def snapshot() -> dict:
+    """{"counters": {...}, "histograms": {...}, "gauges": {...}} with "k=v,…" label keys."""
+    def _lk(k: Labels) -> str:
+        return ",".join(f"{a}={b}" for a, b in k)
+
+    with _LOCK:
+        counters = {n: {_lk(k): v for k, v in s.items()} for n, s in _COUNTERS.items()}
+        hists = {
+            n: {_lk(k): {"count": sum(h[:-1]), "sum": h[-1],
+                         "buckets": dict(zip([*map(str, BUCKETS), "+Inf"], h[:-1]))}
+                for k, h in s.items()}
+            for n, s in _HISTS.items()
+        }
+    gauges: Dict[str, dict] = {}
+    for name, labels, value in _collect():
+        gauges.setdefault(name, {})[_lk(_key(labels))] = value
+    return {"counters": counters, "histograms": hists, "gauges": gauges}
+
+
+def _collect():
+    out = []
+    for fn in list(_COLLECTORS):
+        try:
+            out.extend(fn())
+        except Exception:
+            continue
+    return out
+
+
+def render() -> str:
+    """Prometheus text exposition format (0.0.4)."""
+    lines: List[str] = []
+
+    def _head(name: str, default_kind: str) -> None:
+        kind, text = HELP.get(name, (default_kind, name))
+        lines.append(f"# HELP {name} {text}")
+        lines.append(f"# TYPE {name} {kind}")
+
+    with _LOCK:
+        counters = {n: dict(s) for n, s in _COUNTERS.items()}
+        hists = {n: {k: list(h) for k, h in s.items()} for n, s in _HISTS.items()}
+
+    for name in sorted(counters):
+        _head(name, "counter")
+        for k, v in sorted(counters[name].items()):
+            lines.append(f"{name}{_fmt_labels(k)} {_fmt_value(v)}")
+
+    for name in sorted(hists):
+        _head(name, "histogram")
+        for k, h in sorted(hists[name].items()):
+            acc = 0.0
+            for le, n in zip([*map(str, BUCKETS), "+Inf"], h[:-1]):
+                acc += n
+                lines.append(f"{name}_bucket{_fmt_labels(k, (('le', le),))} {_fmt_value(acc)}")
+            lines.append(f"{name}_sum{_fmt_labels(k)} {_fmt_value(h[-1])}")
+            lines.append(f"{name}_count{_fmt_labels(k)} {_fmt_value(acc)}")
+
+    gauges: Dict[str, List[Tuple[Labels, float]]] = {}
+    for name, labels, value in _collect():
+        gauges.setdefault(name, []).append((_key(labels), value))
+    for name in sorted(gauges):
+        _head(name, "gauge")
+        for k, v in sorted(gauges[name]):
+            lines.append(f"{name}{_fmt_labels(k)} {_fmt_value(v)}")
+
+    return "\n".join(lines) + "\n"
+
+
+def write_snapshot(path: Path) -> None:
+    from api.utils.io import _write_text_atomic
+    _write_text_atomic(Path(path), render())
+
+
+def reset() -> None:
+    with _LOCK:
+        _COUNTERS.clear()
+        _HISTS.clear()
+
+
+__all__ = [
+    "BUCKETS", "inc", "observe", "timer", "timed", "add_collector",
+    "snapshot", "render", "write_snapshot", "reset",
+]
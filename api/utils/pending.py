@@ -0,0 +1,136 @@
+# NyxFan/api/utils/pending.py
+"""
+Per-fan pending-alert counters for the dashboard.
+
+- {creator: {posts, prices, dms}} per NYX id, kept current from the queue's
+  change feed (io.subscribe) instead of rescanning the queue on every render.
+- Changes made by other processes (Proxy, other workers) show up as a new
+  queue_version() → the index rebuilds from the queue once, then goes on
+  incrementally.
+- Mute is applied when summarizing (is_muted is a cached lookup), so muting or
+  unmuting a creator shows on the next render without touching the counters.
+"""
+
+from __future__ import annotations
+
+import time
+from typing import Dict, Set
+
+from api.utils.io import read_queue, queue_version, subscribe, is_muted
+from api.utils.resolve import get_telegram_id, generation, NEGATIVE_TTL
+
+# queue type → dashboard counter
+ALERT_TYPES = {
+    "relay": "posts", "fan_relay": "posts",
+    "subchg": "prices",
+    "dm": "dms", "fan_dm": "dms",
+}
+
+_COUNTS: Dict[str, Dict[str, Dict[str, int]]] = {}   # nyx → creator → counts
+_TG: Dict[str, int | None] = {}                      # nyx → tg (None = not registered yet)
+_BY_TG: Dict[int, Set[str]] = {}                     # tg → nyx ids
+_STATE = {"version": None, "stale": True, "gen": -1, "linked": 0.0}
+
+
+def _link(nyx: str) -> None:
+    tg = get_telegram_id(nyx)
+    _TG[nyx] = tg
+    if tg:
+        _BY_TG.setdefault(tg, set()).add(nyx)
+
+
+def _relink(only_missing: bool = False) -> None:
+    if not only_missing:
+        _TG.clear()
+        _BY_TG.clear()
+    for nyx in _COUNTS:
+        if not only_missing or _TG.get(nyx) is None:
+            _link(nyx)
+    _STATE["gen"] = generation()
+    _STATE["linked"] = time.monotonic()
+
+
+def _bump(c, sign: int) -> None:
+    if not isinstance(c, dict):
+        return
+    field = ALERT_TYPES.get(c.get("type"))
+    if field is None:
+        return
+    nyx = str(c.get("nyx_id"))
+    creator = str(c.get("creator", "?"))
+    per_fan = _COUNTS.get(nyx)
+    if per_fan is None:
+        if sign < 0:
+            return
+        per_fan = _COUNTS[nyx] = {}
+        _link(nyx)
+    grp = per_fan.setdefault(creator, {"posts": 0, "prices": 0, "dms": 0})
+    grp[field] = max(0, grp[field] + sign)
+    if not any(grp.values()):
+        del per_fan[creator]
+        if not per_fan:
+            del _COUNTS[nyx]
+            tg = _TG.pop(nyx, None)
+            if tg and tg in _BY_TG:
+                _BY_TG[tg].discard(nyx)
+                if not _BY_TG[tg]:
+                    del _BY_TG[tg]
+
+
+def rebuild() -> None:
+    """Recount everything from the queue (startup / after outside changes)."""
+    # version first: if the queue moves while we read, the next check rebuilds again
+    version = queue_version()
+    queue = read_queue()
+    _COUNTS.clear()
+    _TG.clear()
+    _BY_TG.clear()
+    for c in queue:
+        try:
+            _bump(c, +1)
+        except Exception:
+            continue
+    _STATE.update(version=version, stale=False, gen=generation(), linked=time.monotonic())
+
+
+def _on_change(before, after, added, removed) -> None:
+    if _STATE["stale"] or added is None or removed is None or before != _STATE["version"]:
+        # not a delta on top of what we have → recount on the next read
+        _STATE["stale"] = True
+        return
+    for c in added:
+        _bump(c, +1)
+    for c in removed:
+        _bump(c, -1)
+    _STATE["version"] = after
+
+
+subscribe(_on_change)
+
+
+def summary(tg_id: int) -> Dict[str, Dict[str, int]]:
+    """
+    creator → {posts, prices, dms} of alerts waiting for this fan, muted
+    creators only (un-muted alerts were pushed and never show on the dashboard).
+    """
+    version = queue_version()
+    if _STATE["stale"] or not version or version != _STATE["version"]:
+        rebuild()
+    elif _STATE["gen"] != generation():
+        _relink()
+    elif time.monotonic() - _STATE["linked"] >= NEGATIVE_TTL and None in _TG.values():
+        # fans the Proxy registered since we last looked
+        _relink(only_missing=True)
+
+    out: Dict[str, Dict[str, int]] = {}
+    for nyx in _BY_TG.get(tg_id, ()):
+        for creator, cnts in _COUNTS.get(nyx, {}).items():
+            if not is_muted(tg_id, creator):
+                continue
+            grp = out.setdefault(creator, {"posts": 0, "prices": 0, "dms": 0})
+            for k, n in cnts.items():
+                grp[k] += n
+    return out
+
+
+__all__ = ["ALERT_TYPES", "rebuild", "summary"]
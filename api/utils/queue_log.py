@@ -0,0 +1,261 @@
+# NyxFan/api/utils/queue_log.py
+"""
+Append-only, segmented command log.
+
+Layout (under shared/command_log/):
+  00000000000000000000.log   ← segment files, one JSON record per line,
+  00000000000000001000.log     named by the first offset they contain
+  offsets.json               ← {"generation": n, "consumers": {name: next_offset}}
+  .lock                      ← flock() guard for writers
+
+Records:
+  {"o": <offset>, "c": {...command...}}   → a queued command
+  {"o": <offset>, "ack": <offset>}        → tombstone: that command is done
+
+Each process keeps a materialized view of the live commands and only reads
+the bytes appended since its last look, so a tick costs O(new records).
+Segments that every consumer has moved past are compacted (rewritten with
+their still-live commands only, or deleted when nothing is left).
+"""
+
+from __future__ import annotations
+
+import bisect
+import fcntl
+import json
+import os
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple
+
+_SEG_SUFFIX = ".log"
+
+
+def _seg_name(base: int) -> str:
+    return f"{base:020d}{_SEG_SUFFIX}"
+
+
+class SegmentedLog:
+    def __init__(self, root: Path, segment_records: int = 1000):
+        self.root = Path(root)
+        self.segment_records = max(1, int(segment_records))
+        self._offsets_path = self.root / "offsets.json"
+        self._lock_path = self.root / ".lock"
+        self._reset(generation=None)
+        self.last_span = ("", "")
+
+    # ───────────── in-memory view ─────────────
+
+    def _reset(self, generation) -> None:
+        self._generation = generation
+        self._live: Dict[int, dict] = {}     # offset → command
+        self._order: List[int] = []          # every command offset seen, ascending
+        self._seg_counts: Dict[int, int] = {}  # segment base → records in file
+        self._tail_base = -1                 # segment we are reading
+        self._tail_pos = 0                   # byte position within it
+        self._next = 0                       # next offset to assign
+
+    def _segments(self) -> List[int]:
+        try:
+            names = os.listdir(self.root)
+        except FileNotFoundError:
+            return []
+        out = []
+        for n in names:
+            if n.endswith(_SEG_SUFFIX):
+                try:
+                    out.append(int(n[: -len(_SEG_SUFFIX)]))
+                except ValueError:
+                    pass
+        return sorted(out)
+
+    def _read_meta(self) -> dict:
+        try:
+            data = json.loads(self._offsets_path.read_text())
+            if isinstance(data, dict):
+                data.setdefault("generation", 0)
+                data.setdefault("consumers", {})
+                return data
+        except Exception:
+            pass
+        return {"generation": 0, "consumers": {}}
+
+    def _write_meta(self, meta: dict) -> None:
+        tmp = self._offsets_path.with_suffix(".json.tmp")
+        tmp.write_text(json.dumps(meta, separators=(",", ":")))
+        tmp.replace(self._offsets_path)
+
+    def _apply(self, base: int, line: bytes) -> None:
+        try:
+            rec = json.loads(line)
+            off = int(rec["o"])
+        except Exception:
+            return
+        self._seg_counts[base] = self._seg_counts.get(base, 0) + 1
+        self._next = max(self._next, off + 1)
+        if "ack" in rec:
+            self._live.pop(rec["ack"], None)
+            return
+        cmd = rec.get("c")
+        if isinstance(cmd, dict):
+            self._live[off] = cmd
+            self._order.append(off)
+
+    def refresh(self) -> None:
+        """Pull in whatever was appended since the last call (any process)."""
+        meta = self._read_meta()
+        if meta["generation"] != self._generation:
+            # Compaction rewrote history → rebuild the view from scratch
+            self._reset(meta["generation"])
+        for base in self._segments():
+            if base < self._tail_base:
+                continue
+            if base != self._tail_base:
+                self._tail_base, self._tail_pos = base, 0
+            path = self.root / _seg_name(base)
+            try:
+                with open(path, "rb") as fh:
+                    fh.seek(self._tail_pos)
+                    chunk = fh.read()
+            except FileNotFoundError:
+                continue
+            # Only consume complete lines; a writer may be mid-append
+            end = chunk.rfind(b"\n")
+            if end < 0:
+                continue
+            for line in chunk[: end + 1].splitlines():
+                if line.strip():
+                    self._apply(base, line)
+            self._tail_pos += end + 1
+
+    # ───────────── writers ─────────────
+
+    @contextmanager
+    def _locked(self):
+        self.root.mkdir(parents=True, exist_ok=True)
+        with open(self._lock_path, "a") as fh:
+            fcntl.flock(fh, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(fh, fcntl.LOCK_UN)
+
+    def version(self) -> str:
+        """Changes whenever anything is appended or compacted (any process)."""
+        self.refresh()
+        return f"{self._generation}:{self._next}"
+
+    def _append_records(self, make: Iterable) -> List[int]:
+        """
+        Assign offsets under the lock and append one line per record.
+        self.last_span = (version before, version after) of this append.
+        """
+        with self._locked():
+            self.refresh()
+            before = f"{self._generation}:{self._next}"
+            bases = self._segments()
+            base = bases[-1] if bases else 0
+            if self._seg_counts.get(base, 0) >= self.segment_records:
+                base = self._next
+            offsets, lines = [], []
+            for rec in make:
+                rec["o"] = self._next + len(offsets)
+                offsets.append(rec["o"])
+                lines.append(json.dumps(rec, separators=(",", ":"), ensure_ascii=False))
+            if not lines:
+                self.last_span = (before, before)
+                return []
+            data = ("\n".join(lines) + "\n").encode("utf-8")
+            fd = os.open(self.root / _seg_name(base), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, data)
+            finally:
+                os.close(fd)
+            self.refresh()
+            self.last_span = (before, f"{self._generation}:{self._next}")
+            return offsets
+
+    def append(self, cmds: Iterable[dict]) -> List[int]:
+        return self._append_records({"c": c} for c in cmds if isinstance(c, dict))
+
+    def ack(self, offsets: Iterable[int]) -> List[dict]:
+        """Tombstone these offsets; returns the commands that were still live."""
+        wanted, gone = sorted(set(offsets)), []
+
+        def _records():
+            # runs under the lock, after refresh → exact even with other writers
+            for o in wanted:
+                if o in self._live:
+                    gone.append(self._live[o])
+                    yield {"ack": o}
+
+        self._append_records(_records())
+        return gone
+
+    # ───────────── readers ─────────────
+
+    def entries(self) -> List[Tuple[int, dict]]:
+        """All live commands, oldest first."""
+        self.refresh()
+        return [(o, self._live[o]) for o in self._order if o in self._live]
+
+    def read_from(self, offset: int) -> List[Tuple[int, dict]]:
+        """Live commands at or after `offset` (O(new) thanks to bisect)."""
+        self.refresh()
+        i = bisect.bisect_left(self._order, offset)
+        return [(o, self._live[o]) for o in self._order[i:] if o in self._live]
+
+    def end_offset(self) -> int:
+        return self._next
+
+    def committed(self, consumer: str) -> int:
+        return int(self._read_meta()["consumers"].get(consumer, 0))
+
+    def commit(self, consumer: str, offset: int) -> None:
+        with self._locked():
+            meta = self._read_meta()
+            cur = int(meta["consumers"].get(consumer, 0))
+            if offset > cur:
+                meta["consumers"][consumer] = offset
+                self._write_meta(meta)
+
+    # ───────────── compaction ─────────────
+
+    def compact(self) -> int:
+        """
+        Rewrite/delete closed segments that all consumers have passed.
+        Returns the number of segments touched.
+        """
+        with self._locked():
+            self.refresh()
+            meta = self._read_meta()
+            if not meta["consumers"]:
+                return 0
+            floor = min(int(v) for v in meta["consumers"].values())
+            bases = self._segments()
+            touched = 0
+            for i, base in enumerate(bases[:-1]):   # never the active segment
+                upper = bases[i + 1]
+                if upper > floor:
+                    break
+                keep = [o for o in self._order if base <= o < upper and o in self._live]
+                path = self.root / _seg_name(base)
+                if not keep:
+                    path.unlink(missing_ok=True)
+                    touched += 1
+                elif len(keep) < self._seg_counts.get(base, 0):
+                    lines = [
+                        json.dumps({"o": o, "c": self._live[o]}, separators=(",", ":"), ensure_ascii=False)
+                        for o in keep
+                    ]
+                    tmp = path.with_suffix(".tmp")
+                    tmp.write_text("\n".join(lines) + "\n", encoding="utf-8")
+                    tmp.replace(path)
+                    touched += 1
+            if touched:
+                meta["generation"] = int(meta["generation"]) + 1
+                self._write_meta(meta)
+            return touched
+
+
+__all__ = ["SegmentedLog"]
@@ -0,0 +1,219 @@
+# NyxFan/api/utils/queue_sqlite.py
+"""
+SQLite (WAL) queue backend.
+
+Every command is a row; the columns workers filter on (type, nyx_id, creator,
+status) are indexed, so a worker claims a batch of *its own* job types with one
+indexed UPDATE instead of scanning and re-serializing everybody's jobs.
+
+status:
+  pending  → waiting for its consumer
+  claimed  → handed to a worker (re-offered after CLAIM_TTL if the worker died)
+  held     → handled but kept visible (muted relays/DMs for the dashboard)
+
+not_before mirrors the command's "not_before" (jobs/retry.py backoff): such a
+row is not claimed before then.
+
+Claims live in the database, so several processes (webhook instances) can
+consume one queue file without handing out a command twice, as long as they
+all open the same file on a local or shared volume that supports SQLite locking.
+"""
+
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from contextlib import contextmanager
+from typing import List
+
+CLAIM_TTL = 300.0  # seconds before an un-committed claim is offered again
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS queue (
+    id          INTEGER PRIMARY KEY AUTOINCREMENT,
+    type        TEXT,
+    nyx_id      TEXT,
+    creator     TEXT,
+    status      TEXT NOT NULL DEFAULT 'pending',
+    claimed_by  TEXT,
+    claimed_at  REAL,
+    body        TEXT NOT NULL,
+    not_before  REAL
+);
+CREATE INDEX IF NOT EXISTS ix_queue_claim   ON queue(status, type, id);
+CREATE INDEX IF NOT EXISTS ix_queue_nyx     ON queue(nyx_id);
+CREATE INDEX IF NOT EXISTS ix_queue_creator ON queue(creator);
+"""
+
+
+def _row(cmd: dict) -> tuple:
+    body = {k: v for k, v in cmd.items() if k != "_qid"}
+    nyx = body.get("nyx_id")
+    creator = body.get("creator")
+    return (
+        body.get("type"),
+        None if nyx is None else str(nyx),
+        None if creator is None else str(creator),
+        json.dumps(body, separators=(",", ":"), ensure_ascii=False),
+        _not_before(body),
+    )
+
+
+def _not_before(body: dict) -> float | None:
+    try:
+        return float(body["not_before"]) if body.get("not_before") else None
+    except (TypeError, ValueError):
+        return None
+
+
+def _load(qid: int, body: str) -> dict:
+    d = json.loads(body)
+    d["_qid"] = qid
+    return d
+
+
+class SqliteQueue:
+    shared_claims = True   # status='claimed' is in the database, seen by every connection
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(str(self.path), timeout=30.0, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        cols = {r[1] for r in self._db.execute("PRAGMA table_info(queue)")}
+        if "not_before" not in cols:   # queue db from before delayed retries
+            self._db.execute("ALTER TABLE queue ADD COLUMN not_before REAL")
+        self._read_max = 0   # highest row id seen by the last full read()
+        self._span = ("", "")
+        # (version before, version after, added, removed) of the last mutation;
+        # added/removed None → "unknown, re-read the queue"
+        self.last_change = None
+
+    def _version(self) -> str:
+        # data_version moves on other connections' commits, total_changes on ours
+        dv = self._db.execute("PRAGMA data_version").fetchone()[0]
+        return f"{dv}:{self._db.total_changes}"
+
+    def version(self) -> str:
+        with self._lock:
+            return self._version()
+
+    def watch_targets(self) -> dict:
+        return {self.path.parent: (self.path.name, self.path.name + "-wal")}
+
+    @contextmanager
+    def _tx(self):
+        # BEGIN IMMEDIATE takes the write lock up-front so claims never interleave
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            before = self._version()
+            try:
+                yield self._db
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+            self._span = (before, self._version())
+
+    # ───────────── full-list compatibility ─────────────
+
+    def read(self) -> list:
+        with self._lock:
+            rows = self._db.execute("SELECT id, body FROM queue ORDER BY id").fetchall()
+        self._read_max = rows[-1][0] if rows else self._read_max
+        return [_load(i, b) for i, b in rows]
+
+    def write(self, q: list, base: list | None = None) -> None:
+        # Only rows the caller saw (`base`, else the last read()) can be dropped;
+        # rows inserted since are merged in.
+        with self._tx() as db:
+            live = {i: b for i, b in db.execute("SELECT id, body FROM queue WHERE id <= ?", (self._read_max,))}
+            if base is not None:
+                seen = {c.get("_qid") for c in base if isinstance(c, dict)}
+                live = {i: b for i, b in live.items() if i in seen}
+            keep, add = set(), []
+            for c in q:
+                if not isinstance(c, dict):
+                    continue
+                qid = c.get("_qid")
+                if qid is None:
+                    add.append(_row(c))
+                elif qid in live:
+                    if _row(c)[3] == live[qid]:
+                        keep.add(qid)
+                    else:
+                        add.append(_row(c))   # edited → replace
+                # else: acked by someone else since our read → don't resurrect
+            db.executemany("DELETE FROM queue WHERE id=?", [(i,) for i in live if i not in keep])
+            db.executemany("INSERT INTO queue(type, nyx_id, creator, body, not_before) VALUES (?,?,?,?,?)", add)
+
+    # ───────────── incremental API ─────────────
+
+    def append(self, cmds: List[dict]) -> None:
+        with self._tx() as db:
+            db.executemany(
+                "INSERT INTO queue(type, nyx_id, creator, body, not_before) VALUES (?,?,?,?,?)",
+                [_row(c) for c in cmds],
+            )
+        self.last_change = (*self._span, list(cmds), [])
+
+    def claim(self, consumer: str, types, limit: int | None = None) -> List[dict]:
+        now = time.time()
+        where = "(status='pending' OR (status='claimed' AND claimed_at < ?)) AND (not_before IS NULL OR not_before <= ?)"
+        args: list = [now - CLAIM_TTL, now]
+        if types is not None:
+            types = list(types)
+            if not types:
+                return []
+            where += f" AND type IN ({','.join('?' * len(types))})"
+            args.extend(types)
+        sql = f"SELECT id, body FROM queue WHERE {where} ORDER BY id"
+        if limit:
+            sql += " LIMIT ?"
+            args.append(int(limit))
+        with self._tx() as db:
+            rows = db.execute(sql, args).fetchall()
+            db.executemany(
+                "UPDATE queue SET status='claimed', claimed_by=?, claimed_at=? WHERE id=?",
+                [(consumer, now, i) for i, _ in rows],
+            )
+        self.last_change = (*self._span, [], [])
+        return [_load(i, b) for i, b in rows]
+
+    def ack(self, cmds: List[dict]) -> None:
+        ids = [c["_qid"] for c in cmds if isinstance(c, dict) and "_qid" in c]
+        if ids:
+            with self._tx() as db:
+                gone = []
+                for i in ids:
+                    row = db.execute("DELETE FROM queue WHERE id=? RETURNING body", (i,)).fetchone()
+                    if row:
+                        gone.append(json.loads(row[0]))
+            self.last_change = (*self._span, [], gone)
+
+    def commit(self, consumer: str, claimed: List[dict], retry: List[dict]) -> None:
+        retry_ids = {c["_qid"] for c in retry if "_qid" in c}
+        held = [(c["_qid"],) for c in claimed if "_qid" in c and c["_qid"] not in retry_ids]
+        with self._tx() as db:
+            # acked rows are already gone; UPDATE on them is a no-op
+            db.executemany("UPDATE queue SET status='held', claimed_at=NULL WHERE id=? AND status='claimed'", held)
+            # the retried command as passed in (attempts / not_before edits stick)
+            db.executemany(
+                "UPDATE queue SET status='pending', claimed_by=NULL, claimed_at=NULL,"
+                " type=?, nyx_id=?, creator=?, body=?, not_before=? WHERE id=?",
+                [(*_row(c), c["_qid"]) for c in retry if "_qid" in c],
+            )
+        self.last_change = (*self._span, [], [])
+
+    def compact(self) -> None:
+        with self._lock:
+            self._db.execute("PRAGMA wal_checkpoint(PASSIVE)")
+
+
+__all__ = ["SqliteQueue"]
@@ -0,0 +1,152 @@
+# NyxFan/api/utils/ratelimit.py
+"""
+Telegram-aware rate limiter for every Bot API call the Application makes.
+
+- One global token bucket (~30 msg/s, Telegram's broadcast limit).
+- One small bucket per chat (~1 msg/s, bursts of a few), FIFO per chat so
+  messages to one fan keep their order while other chats proceed.
+- RetryAfter pauses only the chat that triggered it, then retries.
+Calls without a chat_id (answerCallbackQuery, getMe, …) are not throttled.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+from datetime import timedelta
+from typing import Any, Callable, Coroutine, Dict, List, Optional, Union
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+JSONDict = Dict[str, Any]
+
+
+class _Bucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = float(rate)
+        self.capacity = max(1.0, float(burst))
+        self.tokens = self.capacity
+        self.stamp = time.monotonic()
+
+    def delay(self) -> float:
+        """Seconds until one token is available (0 → take it now)."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return 0.0
+        return (1.0 - self.tokens) / self.rate
+
+
+class _Chat:
+    __slots__ = ("lock", "bucket", "paused_until", "last_used")
+
+    def __init__(self, rate: float, burst: float):
+        self.lock = asyncio.Lock()
+        self.bucket = _Bucket(rate, burst)
+        self.paused_until = 0.0
+        self.last_used = time.monotonic()
+
+
+def _retry_seconds(exc: RetryAfter) -> float:
+    ra = exc.retry_after
+    return ra.total_seconds() if isinstance(ra, timedelta) else float(ra)
+
+
+class ChatRateLimiter(BaseRateLimiter[int]):
+    def __init__(
+        self,
+        overall_rate: float = 30.0,
+        chat_rate: float = 1.0,
+        chat_burst: float = 3.0,
+        group_rate: float = 20 / 60,
+        max_retries: int = 3,
+    ):
+        self.overall_rate = overall_rate
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate = group_rate
+        self.max_retries = max_retries
+        self._global = _Bucket(overall_rate, overall_rate)
+        self._global_lock: asyncio.Lock | None = None
+        self._chats: Dict[Any, _Chat] = {}
+
+    async def initialize(self) -> None:
+        self._global_lock = asyncio.Lock()
+
+    async def shutdown(self) -> None:
+        self._chats.clear()
+
+    def _chat(self, chat_id) -> _Chat:
+        lane = self._chats.get(chat_id)
+        if lane is None:
+            if len(self._chats) > 10_000:
+                self._prune()
+            is_group = isinstance(chat_id, int) and chat_id < 0
+            lane = _Chat(self.group_rate if is_group else self.chat_rate, 1 if is_group else self.chat_burst)
+            self._chats[chat_id] = lane
+        lane.last_used = time.monotonic()
+        return lane
+
+    def _prune(self) -> None:
+        idle = time.monotonic() - 60.0
+        for cid, lane in list(self._chats.items()):
+            if lane.last_used < idle and not lane.lock.locked():
+                del self._chats[cid]
+
+    async def _take_global(self) -> None:
+        if self._global_lock is None:
+            self._global_lock = asyncio.Lock()
+        async with self._global_lock:
+            while True:
+                wait = self._global.delay()
+                if not wait:
+                    return
+                await asyncio.sleep(wait)
+
+    async def process_request(
+        self,
+        callback: Callable[..., Coroutine[Any, Any, Union[bool, JSONDict, List[JSONDict]]]],
+        args: Any,
+        kwargs: Dict[str, Any],
+        endpoint: str,
+        data: Dict[str, Any],
+        rate_limit_args: Optional[int],
+    ) -> Union[bool, JSONDict, List[JSONDict]]:
+        retries = max(0, self.max_retries if rate_limit_args is None else int(rate_limit_args))
+        chat_id = data.get("chat_id")
+
+        if chat_id is None:
+            for attempt in range(retries + 1):
+                try:
+                    return await callback(*args, **kwargs)
+                except RetryAfter as exc:
+                    if attempt >= retries:
+                        raise
+                    await asyncio.sleep(_retry_seconds(exc) + 0.1)
+
+        lane = self._chat(chat_id)
+        async with lane.lock:   # FIFO → per-chat order is preserved
+            for attempt in range(retries + 1):
+                while True:
+                    pause = lane.paused_until - time.monotonic()
+                    if pause > 0:
+                        await asyncio.sleep(pause)
+                        continue
+                    wait = lane.bucket.delay()
+                    if not wait:
+                        break
+                    await asyncio.sleep(wait)
+                await self._take_global()
+                try:
+                    return await callback(*args, **kwargs)
+                except RetryAfter as exc:
+                    if attempt >= retries:
+                        raise
+                    # Only this chat waits; other lanes keep sending
+                    lane.paused_until = time.monotonic() + _retry_seconds(exc) + 0.1
+
+
+__all__ = ["ChatRateLimiter"]
@@ -0,0 +1,94 @@
+# NyxFan/api/utils/resolve.py
+"""
+NYX → Telegram id resolution with an in-process cache.
+
+- Hits are kept for POSITIVE_TTL seconds, misses ("not registered yet")
+  for NEGATIVE_TTL so unroutable jobs don't hammer the registry every tick.
+- register_user() goes through here so a new fan is routable immediately.
+- resolve_many() resolves a whole tick's worth of ids in one pass.
+"""
+
+from __future__ import annotations
+
+import time
+from typing import Dict, Iterable
+
+from shared import fan_registry as _registry
+
+POSITIVE_TTL = 300.0
+NEGATIVE_TTL = 30.0
+
+# str(nyx_id) → (telegram id or None, expires_at)
+_CACHE: Dict[str, tuple] = {}
+# bumped whenever a mapping may have changed (views keyed by tg id re-resolve)
+_GEN = {"n": 0}
+
+
+def generation() -> int:
+    return _GEN["n"]
+
+
+def invalidate(nyx_id=None) -> None:
+    """Forget one id, or everything when called without arguments."""
+    if nyx_id is None:
+        _CACHE.clear()
+    else:
+        _CACHE.pop(str(nyx_id), None)
+    _GEN["n"] += 1
+
+
+def register_user(tg_id: int, display: str):
+    """shared.fan_registry.register_user + drop any cached miss for this fan."""
+    res = _registry.register_user(tg_id, display)
+    # We can't tell which NYX ids now map to this fan → drop all misses
+    for k, (tg, _exp) in list(_CACHE.items()):
+        if tg is None:
+            del _CACHE[k]
+    invalidate(tg_id)
+    return res
+
+
+def get_telegram_id(nyx_id) -> int | None:
+    """Cached shared.fan_registry.get_telegram_id (registry only, no fallback)."""
+    key = str(nyx_id)
+    now = time.monotonic()
+    hit = _CACHE.get(key)
+    if hit is not None and hit[1] > now:
+        return hit[0]
+    try:
+        tg = _registry.get_telegram_id(key)
+    except Exception:
+        tg = None
+    _CACHE[key] = (tg, now + (POSITIVE_TTL if tg else NEGATIVE_TTL))
+    return tg
+
+
+def resolve_tg(nyx_or_tg) -> int | None:
+    """
+    Accept either a canonical NYX ID (string) or a raw Telegram user id.
+    1) Try NYX→TG via registry (cached)
+    2) Fallback: if it's a numeric string that looks like a TG id, use it directly
+    """
+    tg = get_telegram_id(nyx_or_tg)
+    if tg:
+        return tg
+    s = str(nyx_or_tg or "").strip()
+    if s.isdigit() and len(s) >= 9:  # typical TG user-id length
+        try:
+            return int(s)
+        except Exception:
+            return None
+    return None
+
+
+def resolve_many(ids: Iterable) -> Dict[str, int | None]:
+    """resolve_tg() for a batch; each distinct id hits the registry at most once."""
+    out: Dict[str, int | None] = {}
+    for nyx in ids:
+        key = str(nyx)
+        if key not in out:
+            out[key] = resolve_tg(nyx)
+    return out
+
+
+__all__ = ["register_user", "get_telegram_id", "resolve_tg", "resolve_many", "invalidate", "generation"]
@@ -1,19 +1,196 @@
 # NyxFan/api/utils/state.py
 """
-In-memory runtime state for NyxFan.
-These are simple module-level dicts that live for the life of the process.
+Runtime state for NyxFan.
+
+Each table is a BoundedState: a dict-like store with LRU eviction past
+`max_entries` and optional expiry `ttl` seconds after the last write. The
+persistent ones are saved as one compact snapshot (shared/fan_state.json)
+by flush() and loaded back on first use, so after a restart the refresh
+worker can still edit the dashboards it knows about.
 """
 
+from __future__ import annotations
+
+import os
+import time
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from api.utils.io import REPO_ROOT, read_data, write_data
+
+STATE_PATH     = REPO_ROOT / "shared" / "fan_state.json"
+MAX_FANS       = int(os.getenv("NYXFAN_STATE_MAX_FANS", "100000"))
+MAX_CAPTIONS   = int(os.getenv("NYXFAN_STATE_MAX_CAPTIONS", "20000"))
+CAPTION_TTL    = float(os.getenv("NYXFAN_STATE_CAPTION_TTL", str(7 * 24 * 3600)))
+FLUSH_INTERVAL = float(os.getenv("NYXFAN_STATE_FLUSH_INTERVAL", "30"))   # seconds between snapshots
+
+_STORES: Dict[str, "BoundedState"] = {}
+_DISK: Dict[str, Any] = {"loaded": False, "flushed": 0.0}
+
+
+class BoundedState(MutableMapping):
+    """
+    dict-like; entries are (value, written_at). Reads refresh LRU order but not
+    the TTL. `setdefault` counts as a write (callers often mutate the value).
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_entries: int,
+        ttl: Optional[float] = None,
+        persist: bool = True,
+        key: Callable[[str], Any] = int,
+        value: Callable[[Any], Any] = lambda v: v,
+    ):
+        self.name = name
+        self.max_entries = max(1, max_entries)
+        self.ttl = ttl
+        self.persist = persist
+        self._key = key        # JSON object key → real key
+        self._value = value    # JSON value → real value
+        self._data: "OrderedDict[Any, list]" = OrderedDict()
+        self.dirty = False
+        _STORES[name] = self
+
+    def _live(self, k) -> Optional[list]:
+        if self.persist and not _DISK["loaded"]:
+            load()
+        ent = self._data.get(k)
+        if ent is None:
+            return None
+        if self.ttl is not None and time.time() - ent[1] > self.ttl:
+            del self._data[k]
+            self.dirty = True
+            return None
+        self._data.move_to_end(k)
+        return ent
+
+    def __getitem__(self, k):
+        ent = self._live(k)
+        if ent is None:
+            raise KeyError(k)
+        return ent[0]
+
+    def __setitem__(self, k, v) -> None:
+        self._live(k)
+        self._data[k] = [v, time.time()]
+        self._data.move_to_end(k)
+        self.dirty = True
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def __delitem__(self, k) -> None:
+        if self._live(k) is None:
+            raise KeyError(k)
+        del self._data[k]
+        self.dirty = True
+
+    def __contains__(self, k) -> bool:
+        return self._live(k) is not None
+
+    def __iter__(self) -> Iterator:
+        self.expire()
+        return iter(list(self._data))
+
+    def __len__(self) -> int:
+        self.expire()
+        return len(self._data)
+
+    def setdefault(self, k, default=None):
+        ent = self._live(k)
+        if ent is None:
+            self[k] = default
+            return default
+        self.dirty = True
+        return ent[0]
+
+    def expire(self) -> None:
+        if self.persist and not _DISK["loaded"]:
+            load()
+        if self.ttl is None:
+            return
+        cutoff = time.time() - self.ttl
+        for k in [k for k, (_v, t) in self._data.items() if t < cutoff]:
+            del self._data[k]
+            self.dirty = True
+
+    def dump(self) -> list:
+        self.expire()
+        return [[k, v, round(t, 3)] for k, (v, t) in self._data.items()]
+
+    def restore(self, rows) -> None:
+        for row in rows or ():
+            try:
+                k, v, t = row
+                self._data[self._key(k)] = [self._value(v), float(t)]
+            except Exception:
+                continue
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+        self.expire()
+
+
+def load() -> None:
+    """Read the snapshot into the persistent tables (once; also done on first use)."""
+    if _DISK["loaded"]:
+        return
+    _DISK["loaded"] = True
+    try:
+        data = read_data(STATE_PATH)
+    except Exception:
+        data = {}
+    if not isinstance(data, dict):
+        return
+    for name, store in _STORES.items():
+        if store.persist:
+            store.restore(data.get(name))
+            store.dirty = False
+
+
+def flush(force: bool = False) -> None:
+    """Write the snapshot if anything persistent changed (at most every FLUSH_INTERVAL s)."""
+    if not _DISK["loaded"]:
+        return   # never read → nothing of ours to write (and don't clobber the file)
+    stores = [s for s in _STORES.values() if s.persist]
+    if not any(s.dirty for s in stores):
+        return
+    now = time.monotonic()
+    if not force and now - _DISK["flushed"] < FLUSH_INTERVAL:
+        return
+    snap = {s.name: s.dump() for s in stores}
+    try:
+        write_data(STATE_PATH, snap)
+    except Exception as e:
+        print(f"[NyxFan] state snapshot failed: {e!r}")
+        return
+    for s in stores:
+        s.dirty = False
+    _DISK["flushed"] = now
+
+
 # Track the latest dashboard message(s) we sent per Telegram user so we can delete/replace.
 # chat_id -> [message_id, ...]
-ALL_DASH_MSGS: dict[int, list[int]] = {}
+ALL_DASH_MSGS = BoundedState("ALL_DASH_MSGS", MAX_FANS)
 
 # Human-readable display name we last saw for each Telegram user.
 # chat_id -> username/full_name/str(chat_id)
-USER_DISP: dict[int, str] = {}
+USER_DISP = BoundedState("USER_DISP", MAX_FANS)
 
 # Remember original captions for per-post settings edits so "Back" can restore.
 # key "chat_id:message_id" -> caption text
-ORIG_CAPTION: dict[str, str] = {}
+ORIG_CAPTION = BoundedState("ORIG_CAPTION", MAX_CAPTIONS, ttl=CAPTION_TTL, key=str)
+
+# Last dashboard render we pushed per user, so identical refreshes are skipped.
+# chat_id -> (message_id, sha1 of (text, keyboard))
+DASH_RENDER = BoundedState("DASH_RENDER", MAX_FANS, value=tuple)
+
+# Recent background dashboard edit times per user (edit rate cap; monotonic, so not saved).
+# chat_id -> [monotonic seconds, ...]
+DASH_EDITS = BoundedState("DASH_EDITS", MAX_FANS, ttl=600.0, persist=False)
 
-__all__ = ["ALL_DASH_MSGS", "USER_DISP", "ORIG_CAPTION"]
+__all__ = [
+    "ALL_DASH_MSGS", "USER_DISP", "ORIG_CAPTION", "DASH_RENDER", "DASH_EDITS",
+    "BoundedState", "load", "flush",
+]
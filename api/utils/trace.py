@@ -0,0 +1,173 @@
+# NyxFan/api/utils/trace.py
+"""
+Job lifecycle tracing: enqueue → claimed → resolved → sent → acked.
+
+- Commands enqueued through utils.io carry "_tid" (trace id) and "_ts" (wall
+  clock at enqueue; wall clock, not monotonic, because the Proxy and this bot
+  are different processes). A Proxy that sets the same two fields gets
+  end-to-end numbers; for its commands without them the trace id is a hash of
+  the command and latency counts from our first claim.
+- Follow-ups (dash_refresh, fan_unlock_register, …) inherit the parent's
+  "_tid" and "_ts", so "post enqueued → dashboard edited" is one trace.
+- span() buffers records; flush() (once per worker tick) appends them as JSON
+  lines to TRACE_FILE. report() turns such a file into p50/p95/p99 per type.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from api.utils import metrics
+
+_REPO_ROOT = Path(__file__).resolve().parents[3]
+TRACE_FILE = os.getenv("NYXFAN_TRACE_FILE", str(_REPO_ROOT / "shared" / "nyxfan_traces.jsonl"))   # "" → off
+TRACE_MAX_BYTES = int(os.getenv("NYXFAN_TRACE_MAX_BYTES", str(64 * 1024 * 1024)))   # then rotated to .1
+
+# spans whose first occurrence ends a trace for latency purposes (per job type)
+DELIVERED = ("sent", "skipped")
+
+_BUF: List[dict] = []
+# id(cmd) → (cmd, trace id) for unstamped commands, so a tick hashes each once
+_IDS: Dict[int, tuple] = {}
+
+
+def stamp(cmd: dict) -> dict:
+    """cmd with a trace id and enqueue time (a copy; unchanged if it has both)."""
+    if "_tid" in cmd and "_ts" in cmd:
+        return cmd
+    out = dict(cmd)
+    out.setdefault("_tid", uuid.uuid4().hex[:16])
+    out.setdefault("_ts", time.time())
+    return out
+
+
+def trace_id(cmd: dict) -> str:
+    tid = cmd.get("_tid")
+    if tid:
+        return str(tid)
+    # not stamped (written straight to the queue): stable id from the content
+    hit = _IDS.get(id(cmd))
+    if hit is not None and hit[0] is cmd:
+        return hit[1]
+    body = {k: v for k, v in cmd.items() if k != "_qid"}
+    tid = hashlib.sha1(json.dumps(body, sort_keys=True, default=str).encode()).hexdigest()[:16]
+    _IDS[id(cmd)] = (cmd, tid)
+    return tid
+
+
+def inherit(parent: dict, child: dict) -> dict:
+    """Put `child` (a follow-up command, edited in place) on `parent`'s trace."""
+    if isinstance(child, dict) and isinstance(parent, dict):
+        child.setdefault("_tid", trace_id(parent))
+        if parent.get("_ts") is not None:
+            child.setdefault("_ts", parent["_ts"])
+    return child
+
+
+def span(cmd: dict, name: str, **attrs: Any) -> None:
+    """Record that `cmd` reached lifecycle step `name` now."""
+    if not isinstance(cmd, dict) or not (TRACE_FILE or cmd.get("_ts") is not None):
+        return
+    now = time.time()
+    rec = {"tid": trace_id(cmd), "type": cmd.get("type"), "span": name, "t": now}
+    if cmd.get("_ts") is not None:
+        rec["enq"] = cmd["_ts"]
+        if name in DELIVERED:
+            metrics.observe("nyxfan_job_latency_seconds", max(0.0, now - float(cmd["_ts"])), type=cmd.get("type"))
+    if attrs:
+        rec.update(attrs)
+    if TRACE_FILE:
+        _BUF.append(rec)
+
+
+def spans(cmds: Iterable[dict], name: str, **attrs: Any) -> None:
+    for c in cmds:
+        span(c, name, **attrs)
+
+
+def flush() -> None:
+    """Append buffered spans to TRACE_FILE (rotating it past TRACE_MAX_BYTES)."""
+    _IDS.clear()
+    if not _BUF or not TRACE_FILE:
+        _BUF.clear()
+        return
+    recs = list(_BUF)
+    _BUF.clear()
+    path = Path(TRACE_FILE)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if path.exists() and path.stat().st_size > TRACE_MAX_BYTES:
+            path.replace(path.with_suffix(path.suffix + ".1"))
+        with open(path, "a", encoding="utf-8") as fh:
+            fh.write("".join(json.dumps(r, separators=(",", ":"), default=str) + "\n" for r in recs))
+    except Exception as e:
+        print(f"[NyxFan] trace flush failed: {e!r}")
+
+
+# ───────────────────────────── reporting ─────────────────────────────
+
+def _pct(xs: List[float], p: float) -> float:
+    if not xs:
+        return 0.0
+    i = min(len(xs) - 1, max(0, int(round(p / 100.0 * len(xs) + 0.5)) - 1))
+    return xs[i]
+
+
+def report(records: Iterable[dict]) -> Dict[str, Dict[str, Any]]:
+    """
+    type → {"n", "untimed", "p50", "p95", "p99", "max"} in seconds, from the
+    start of the trace ("_ts", else first claim) to the job's first sent/skipped
+    span, else its ack. "untimed" → traces that never got that far.
+    """
+    start: Dict[tuple, float] = {}
+    end: Dict[tuple, float] = {}
+    acked: Dict[tuple, float] = {}
+    for r in records:
+        k = (r.get("tid"), r.get("type"))
+        t = float(r.get("t", 0.0))
+        if r.get("enq") is not None:
+            start[k] = min(start.get(k, float("inf")), float(r["enq"]))
+        elif r.get("span") in ("enqueued", "claimed"):
+            start[k] = min(start.get(k, float("inf")), t)
+        if r.get("span") in DELIVERED:
+            end[k] = min(end.get(k, float("inf")), t)
+        elif r.get("span") == "acked":
+            acked[k] = min(acked.get(k, float("inf")), t)
+
+    per_type: Dict[str, List[float]] = {}
+    untimed: Dict[str, int] = {}
+    for k, t0 in start.items():
+        t1: Optional[float] = end.get(k, acked.get(k))
+        typ = str(k[1])
+        if t1 is None:
+            untimed[typ] = untimed.get(typ, 0) + 1
+            continue
+        per_type.setdefault(typ, []).append(max(0.0, t1 - t0))
+
+    out: Dict[str, Dict[str, Any]] = {}
+    for typ in sorted(set(per_type) | set(untimed)):
+        xs = sorted(per_type.get(typ, []))
+        out[typ] = {
+            "n": len(xs), "untimed": untimed.get(typ, 0),
+            "p50": _pct(xs, 50), "p95": _pct(xs, 95), "p99": _pct(xs, 99),
+            "max": xs[-1] if xs else 0.0,
+        }
+    return out
+
+
+def read_file(path) -> Iterable[dict]:
+    with open(path, encoding="utf-8") as fh:
+        for line in fh:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+__all__ = ["stamp", "trace_id", "inherit", "span", "spans", "flush", "report", "read_file", "TRACE_FILE"]
@@ -0,0 +1,156 @@
+# NyxFan/api/utils/unlock_store.py
+"""
+Keyed unlock store (content_id → metadata/items), shared by
+fan_unlock_register and fan_unlock_deliver.
+
+- SQLite (WAL) at shared/unlock_index.sqlite3, one row per content_id, so a
+  registration or a "delivered" mark is one atomic row write no matter how
+  many posts were ever registered.
+- The legacy shared/unlock_index.json is imported once on first open (left
+  in place, never written again).
+"""
+
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+from typing import Any, Callable, Dict, Optional
+
+from api.utils.io import REPO_ROOT, read_data
+
+UNLOCK_DB   = REPO_ROOT / "shared" / "unlock_index.sqlite3"
+LEGACY_JSON = REPO_ROOT / "shared" / "unlock_index.json"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS unlocks (
+    content_id  TEXT PRIMARY KEY,
+    delivered   INTEGER NOT NULL DEFAULT 0,
+    body        TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key    TEXT PRIMARY KEY,
+    value  TEXT
+);
+"""
+
+_LOCK = threading.Lock()
+_DB: Dict[str, Any] = {"conn": None, "path": None}
+
+
+def _dump(ent: dict) -> str:
+    return json.dumps(ent, separators=(",", ":"), ensure_ascii=False)
+
+
+def _migrate(db: sqlite3.Connection) -> None:
+    if db.execute("SELECT 1 FROM meta WHERE key='migrated_json'").fetchone():
+        return
+    try:
+        data = read_data(LEGACY_JSON)
+    except Exception:
+        data = {}
+    rows = [
+        (str(cid), 1 if ent.get("delivered") else 0, _dump(ent))
+        for cid, ent in (data.items() if isinstance(data, dict) else [])
+        if isinstance(ent, dict)
+    ]
+    # existing rows win: they are newer than anything in the legacy file
+    db.executemany("INSERT OR IGNORE INTO unlocks(content_id, delivered, body) VALUES (?,?,?)", rows)
+    db.execute("INSERT OR REPLACE INTO meta(key, value) VALUES ('migrated_json', ?)", (str(len(rows)),))
+
+
+def _conn() -> sqlite3.Connection:
+    if _DB["conn"] is None or _DB["path"] != UNLOCK_DB:
+        UNLOCK_DB.parent.mkdir(parents=True, exist_ok=True)
+        db = sqlite3.connect(str(UNLOCK_DB), timeout=30.0, isolation_level=None, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        db.executescript(_SCHEMA)
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            _migrate(db)
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+        _DB["conn"], _DB["path"] = db, UNLOCK_DB
+    return _DB["conn"]
+
+
+def get(content_id) -> Optional[Dict[str, Any]]:
+    """The stored entry for one content_id (a private copy), or None."""
+    if not content_id:
+        return None
+    with _LOCK:
+        row = _conn().execute("SELECT body FROM unlocks WHERE content_id=?", (str(content_id),)).fetchone()
+    return json.loads(row[0]) if row else None
+
+
+def update(content_id, fn: Callable[[Dict[str, Any]], Optional[Dict[str, Any]]]) -> Dict[str, Any]:
+    """
+    Atomic read-modify-write of one entry: fn(entry or {}) → new entry
+    (None → leave it as is). Returns the stored entry.
+    """
+    cid = str(content_id)
+    with _LOCK:
+        db = _conn()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            row = db.execute("SELECT body FROM unlocks WHERE content_id=?", (cid,)).fetchone()
+            ent = json.loads(row[0]) if row else {}
+            new = fn(dict(ent))
+            if new is not None:
+                ent = new
+                db.execute(
+                    "INSERT OR REPLACE INTO unlocks(content_id, delivered, body) VALUES (?,?,?)",
+                    (cid, 1 if ent.get("delivered") else 0, _dump(ent)),
+                )
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+    return ent
+
+
+def update_many(fns: Dict[Any, Callable[[Dict[str, Any]], Optional[Dict[str, Any]]]]) -> None:
+    """update() for many content_ids in a single transaction (one fsync)."""
+    if not fns:
+        return
+    with _LOCK:
+        db = _conn()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            cids = [str(c) for c in fns]
+            old: Dict[str, dict] = {}
+            for i in range(0, len(cids), 500):   # stay under SQLite's variable limit
+                chunk = cids[i:i + 500]
+                rows = db.execute(
+                    f"SELECT content_id, body FROM unlocks WHERE content_id IN ({','.join('?' * len(chunk))})", chunk
+                ).fetchall()
+                old.update((cid, json.loads(body)) for cid, body in rows)
+            out = []
+            for cid, fn in fns.items():
+                new = fn(dict(old.get(str(cid), {})))
+                if new is not None:
+                    out.append((str(cid), 1 if new.get("delivered") else 0, _dump(new)))
+            db.executemany("INSERT OR REPLACE INTO unlocks(content_id, delivered, body) VALUES (?,?,?)", out)
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+
+def put(content_id, ent: Dict[str, Any]) -> None:
+    update(content_id, lambda _old: dict(ent))
+
+
+def mark_delivered(content_id) -> None:
+    def _mark(ent: dict):
+        if ent.get("delivered"):
+            return None
+        ent["delivered"] = True
+        return ent
+    update(content_id, _mark)
+
+
+__all__ = ["UNLOCK_DB", "get", "put", "update", "update_many", "mark_delivered"]
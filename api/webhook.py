@@ -0,0 +1,227 @@
+# NyxFan/api/webhook.py
+"""
+Webhook serving mode (any WSGI host; see "Instances" below before scaling out).
+
+- POST /api/webhook   ← Telegram updates (setWebhook with secret_token=NYXFAN_WEBHOOK_SECRET)
+- GET|POST /api/drain ← run queued work only (cron / Proxy nudge)
+- GET /api            ← health check
+- GET /api/metrics    ← Prometheus text (utils/metrics.py; same auth as the rest)
+
+Every route but the health check needs NYXFAN_WEBHOOK_SECRET (Telegram's
+secret-token header, or "Authorization: Bearer <secret>"); with no secret
+configured they answer 503 unless NYXFAN_WEBHOOK_INSECURE=1 (local dev only).
+
+Instances: every instance drains the queue, so two of them at once must not
+claim the same command. Only a backend whose claims are shared across
+processes allows that (NYXFAN_QUEUE_BACKEND=sqlite, with shared/ on one
+volume all instances mount; the json and log backends keep claim state in
+memory). With any other backend the routes answer 503, unless
+NYXFAN_WEBHOOK_SINGLE_INSTANCE=1 says the host never runs more than one
+instance (a single gunicorn worker, not a serverless platform). Serverless
+hosts such as Vercel scale out on their own and give each instance its own
+read-only or throwaway filesystem, so shared/ is neither shared nor durable
+there: run webhook mode on such a host only against storage all instances
+really share.
+
+Each invocation feeds the update to Application.process_update and, while
+that runs and afterwards, drains queue work (due digests, fan jobs, dash refreshes) until
+the queue is idle or DRAIN_BUDGET seconds have passed. The budget is checked
+between worker passes, so one pass is never cut off halfway.
+
+The Application lives on one event loop in a background thread for the life
+of the instance, so warm invocations skip initialize(). Runtime state
+(utils/state.py) is loaded on the cold start and saved after each invocation
+that changed it.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hmac
+import os
+import threading
+
+from flask import Flask, Response, request
+
+from api.utils.env import get_app
+from api.utils.io import queue_claims_shared, queue_version, subscribe
+
+DRAIN_BUDGET   = float(os.getenv("NYXFAN_DRAIN_BUDGET", "8"))     # seconds of queue work per invocation
+WEBHOOK_SECRET = os.getenv("NYXFAN_WEBHOOK_SECRET", "")
+# local development only: serve without a secret (never set this on a public URL)
+WEBHOOK_INSECURE = os.getenv("NYXFAN_WEBHOOK_INSECURE", "") == "1"
+# the host runs exactly one instance: per-process claims (json/log backend) are safe
+WEBHOOK_SINGLE_INSTANCE = os.getenv("NYXFAN_WEBHOOK_SINGLE_INSTANCE", "") == "1"
+REQUEST_TIMEOUT = DRAIN_BUDGET + 20.0   # update handlers may wait on their own timeouts
+
+server = Flask(__name__)
+
+_LOOP: dict = {"loop": None, "kick": None}
+_LOCK = threading.Lock()
+
+
+# ───────────────────────────── event loop ─────────────────────────────
+
+def _loop() -> asyncio.AbstractEventLoop:
+    with _LOCK:
+        if _LOOP["loop"] is None:
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="nyxfan-webhook", daemon=True).start()
+            asyncio.run_coroutine_threadsafe(_init(), loop).result(timeout=30)
+            _LOOP["loop"] = loop
+    return _LOOP["loop"]
+
+
+async def _init() -> None:
+    from api.utils import state
+
+    _LOOP["kick"] = asyncio.Event()
+    state.load()   # dashboards / captions this bot knew before a cold start
+    await get_app().initialize()
+
+
+def _run(coro, timeout: float):
+    return asyncio.run_coroutine_threadsafe(coro, _loop()).result(timeout=timeout)
+
+
+def _on_change(before, after, added, removed) -> None:
+    # enqueues made by the update handler → let the drain loop look again
+    kick = _LOOP["kick"]
+    if kick is not None and (added is None or added):
+        kick.set()
+
+
+subscribe(_on_change)
+
+
+# ───────────────────────────── queue drain ─────────────────────────────
+
+async def _drain(deadline: float) -> None:
+    from telegram.ext import CallbackContext
+    from api.jobs.refresh import process_fan_queue
+    from api.jobs.processor_fan import process_fan_jobs
+    from api.jobs.digest import process_digests
+    from api.utils.metrics import timer
+
+    loop = asyncio.get_running_loop()
+    context = CallbackContext(get_app())
+    try:
+        with timer("nyxfan_job_tick_seconds", job="fan_digest"):
+            await process_digests(context)   # no-op unless a fan's boundary passed
+    except Exception as e:
+        print(f"[NyxFan] [webhook] digest pass failed: {e!r}")
+    while loop.time() < deadline:
+        before = queue_version()
+        try:
+            with timer("nyxfan_job_tick_seconds", job="fan_consumer"):
+                await process_fan_jobs(context)
+            with timer("nyxfan_job_tick_seconds", job="fan_dash_refresh"):
+                await process_fan_queue(context)
+        except Exception as e:
+            print(f"[NyxFan] [webhook] drain pass failed: {e!r}")
+            return
+        if queue_version() == before:
+            return   # idle (or the backend can't tell → one pass)
+
+
+async def _serve(update, budget: float) -> None:
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + budget
+    kick = _LOOP["kick"]
+    task = asyncio.ensure_future(get_app().process_update(update)) if update is not None else None
+    # Drain while the handler runs: it may be waiting on work it just enqueued
+    # (unlock_confirm waits for its delivery)
+    while True:
+        kick.clear()
+        await _drain(deadline)
+        if task is None or task.done() or loop.time() >= deadline:
+            break
+        waiter = asyncio.ensure_future(kick.wait())
+        await asyncio.wait({task, waiter}, timeout=deadline - loop.time(), return_when=asyncio.FIRST_COMPLETED)
+        waiter.cancel()
+    if task is not None:
+        await task
+        await _drain(deadline)   # what the handler enqueued on its way out
+    _flush_state()
+
+
+def _flush_state() -> None:
+    from api.utils import media, state
+
+    # the instance may be frozen or recycled after this response → save now
+    state.flush(force=True)
+    media.flush(force=True)
+
+
+# ───────────────────────────── routes ─────────────────────────────
+
+def _refused() -> Response | None:
+    """None → the request may proceed; otherwise the response to send instead."""
+    if not WEBHOOK_SECRET:
+        if WEBHOOK_INSECURE:
+            return None
+        # fail closed: without a secret anyone could forge updates as any user
+        return Response("NYXFAN_WEBHOOK_SECRET is not set", status=503)
+    got = request.headers.get("X-Telegram-Bot-Api-Secret-Token") or ""
+    auth = request.headers.get("Authorization") or ""
+    if auth.startswith("Bearer "):
+        got = got or auth[len("Bearer "):]
+    if not hmac.compare_digest(got.encode(), WEBHOOK_SECRET.encode()):
+        return Response("forbidden", status=403)
+    if not (WEBHOOK_SINGLE_INSTANCE or queue_claims_shared()):
+        # concurrent instances would each claim (and send) the same commands
+        print("[NyxFan] [webhook] refusing to serve: the queue backend keeps claims per process")
+        return Response(
+            "NYXFAN_QUEUE_BACKEND keeps claims per process; use sqlite on a shared volume "
+            "or set NYXFAN_WEBHOOK_SINGLE_INSTANCE=1 for a single-instance host",
+            status=503,
+        )
+    return None
+
+
+@server.post("/api/webhook")
+def webhook() -> Response:
+    refused = _refused()
+    if refused is not None:
+        return refused
+    data = request.get_json(silent=True, force=True)
+    if not isinstance(data, dict):
+        return Response("bad request", status=400)
+    from telegram import Update
+
+    _loop()
+    update = Update.de_json(data, get_app().bot)
+    try:
+        _run(_serve(update, DRAIN_BUDGET), timeout=REQUEST_TIMEOUT)
+    except Exception as e:
+        # still 200: a redelivered update would repeat whatever already ran
+        print(f"[NyxFan] [webhook] update failed: {e!r}")
+    return Response("ok")
+
+
+@server.route("/api/drain", methods=["GET", "POST"])
+def drain() -> Response:
+    refused = _refused()
+    if refused is not None:
+        return refused
+    _loop()
+    _run(_serve(None, DRAIN_BUDGET), timeout=REQUEST_TIMEOUT)
+    return Response("ok")
+
+
+@server.get("/api")
+def health() -> Response:
+    return Response("NyxFan up")
+
+
+@server.get("/api/metrics")
+def metrics() -> Response:
+    refused = _refused()
+    if refused is not None:
+        return refused
+    from api.utils.metrics import render
+
+    return Response(render(), mimetype="text/plain; version=0.0.4")
+
+
+__all__ = ["server", "DRAIN_BUDGET"]
@@ -0,0 +1,144 @@
+# NyxFan/bench/codec.py
+"""
+Size and speed of the shared-file codecs (utils/io.py encode/decode).
+
+  python bench/codec.py                       # queue of 1k / 10k / 100k commands + prefs
+  python bench/codec.py --sizes 10000 --repeat 10
+
+For each synthetic queue (same generator as queue_hot_paths.py) and the
+matching fan_notifications.json it reports file size and median encode /
+decode time for:
+  legacy    json.dumps(indent=2) / json.loads (what write_queue used to do)
+  compact   stdlib json, separators=(",", ":")
+  orjson    compact JSON via orjson (the default when installed)
+  msgpack   header + msgpack (NYXFAN_CODEC=msgpack)
+plus "io" — the full write_data()/read_data() round trip through a temp file
+with the codec this process would negotiate — and the cost of _cmd_key() over
+the whole queue (stdlib vs the one io picked). Codecs that are not installed
+are skipped.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from queue_hot_paths import DEFAULT_SIZES, DEFAULT_TYPES, make_notifs, make_queue  # noqa: E402
+from api.utils import io  # noqa: E402
+
+Codec = Tuple[Callable[[object], bytes], Callable[[bytes], object]]
+
+
+def codecs() -> Dict[str, Codec]:
+    out: Dict[str, Codec] = {
+        "legacy": (lambda o: json.dumps(o, indent=2).encode(), json.loads),
+        "compact": (lambda o: json.dumps(o, separators=(",", ":"), ensure_ascii=False).encode("utf-8"), json.loads),
+    }
+    try:
+        import orjson
+        out["orjson"] = (lambda o: orjson.dumps(o, option=orjson.OPT_NON_STR_KEYS), orjson.loads)
+    except ImportError:
+        pass
+    try:
+        import msgpack
+        out["msgpack"] = (
+            lambda o: msgpack.packb(o, use_bin_type=True),
+            lambda b: msgpack.unpackb(b, raw=False, strict_map_key=False),
+        )
+    except ImportError:
+        pass
+    return out
+
+
+def _median_ms(fn: Callable[[], object], repeat: int) -> float:
+    fn()   # warm
+    xs = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        xs.append(time.perf_counter() - t0)
+    return statistics.median(xs) * 1000.0
+
+
+def bench_obj(label: str, obj, repeat: int, tmp: Path) -> List[dict]:
+    rows = []
+    for name, (dumps, loads) in codecs().items():
+        data = dumps(obj)
+        rows.append({
+            "file": label, "codec": name, "bytes": len(data),
+            "encode_ms": _median_ms(lambda: dumps(obj), repeat),
+            "decode_ms": _median_ms(lambda: loads(data), repeat),
+        })
+    path = tmp / f"{label}.json"
+    data = io.write_data(path, obj)
+    rows.append({
+        "file": label, "codec": f"io:{io._codec_for(path)}", "bytes": len(data),
+        "encode_ms": _median_ms(lambda: io.write_data(path, obj), repeat),
+        "decode_ms": _median_ms(lambda: io.read_data(path), repeat),
+    })
+    return rows
+
+
+def bench_keys(q: list, repeat: int) -> Tuple[float, float]:
+    std = _median_ms(lambda: [io._std_key(c) for c in q], repeat)
+    fast = _median_ms(lambda: [io._cmd_key(c) for c in q], repeat)
+    return std, fast
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    ap.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)), help="queue sizes, comma-separated")
+    ap.add_argument("--fans", type=int, default=2000)
+    ap.add_argument("--creators", type=int, default=50)
+    ap.add_argument("--muted", type=float, default=0.2)
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--json", dest="out", help="also write the rows as JSON here")
+    args = ap.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    rows: List[dict] = []
+    with tempfile.TemporaryDirectory(prefix="nyxfan-codec-") as tmp:
+        tmp_path = Path(tmp)
+        notifs = make_notifs(args.fans, args.creators, args.muted, rng)
+        rows += bench_obj(f"notifs/{args.fans}", notifs, args.repeat, tmp_path)
+        for n in (int(s) for s in args.sizes.split(",") if s.strip()):
+            q = make_queue(n, args.fans, args.creators, DEFAULT_TYPES, rng)
+            rows += bench_obj(f"queue/{n}", q, args.repeat, tmp_path)
+            std, fast = bench_keys(q, args.repeat)
+            rows.append({"file": f"queue/{n}", "codec": "cmd_key", "bytes": 0, "encode_ms": fast, "decode_ms": std})
+
+    legacy = {r["file"]: r for r in rows if r["codec"] == "legacy"}
+    print(f"{'file':<14} {'codec':<12} {'size':>10} {'encode':>11} {'decode':>11}   vs legacy")
+    for r in rows:
+        if r["codec"] == "cmd_key":
+            print(f"{r['file']:<14} {'cmd_key':<12} {'':>10} {r['encode_ms']:9.2f}ms "
+                  f"{'':>11}   stdlib {r['decode_ms']:.2f}ms ({r['decode_ms'] / max(r['encode_ms'], 1e-9):.1f}x)")
+            continue
+        base = legacy.get(r["file"])
+        rel = ""
+        if base and r["codec"] != "legacy":
+            rel = (f"{r['bytes'] / base['bytes']:.0%} size, "
+                   f"{base['encode_ms'] / max(r['encode_ms'], 1e-9):.1f}x enc, "
+                   f"{base['decode_ms'] / max(r['decode_ms'], 1e-9):.1f}x dec")
+        print(f"{r['file']:<14} {r['codec']:<12} {r['bytes'] / 1024:8.1f}Ki "
+              f"{r['encode_ms']:9.2f}ms {r['decode_ms']:9.2f}ms   {rel}")
+
+    if args.out:
+        Path(args.out).write_text(json.dumps(rows, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
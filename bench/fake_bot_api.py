@@ -0,0 +1,419 @@
+# NyxFan/bench/fake_bot_api.py
+"""
+Local stand-in for the Telegram Bot API, for load and soak tests.
+
+  python bench/fake_bot_api.py --port 8081 --latency 40 --jitter 20
+  python bench/fake_bot_api.py --chat-rate 1 --chat-burst 3 --global-rate 30 --error-rate 0.01
+  NYXFAN_BOT_API_URL=http://127.0.0.1:8081 python api/index.py     # the bot, pointed at it
+
+Serves /bot<token>/<method> for the methods NyxFan calls (getMe, getUpdates,
+deleteWebhook/setWebhook, sendMessage, sendPhoto, sendVideo, sendAnimation,
+sendDocument, sendMediaGroup, editMessageText, editMessageCaption,
+deleteMessage, answerCallbackQuery) and answers with well-formed objects, so
+the Application runs end to end without Telegram.
+
+- --latency/--jitter: milliseconds added to every call.
+- --error-rate: share of send/edit calls answered 429 with retry_after.
+- --chat-rate/--chat-burst and --global-rate: token buckets like Telegram's
+  flood control; a call over budget gets 429 with the wait it needs.
+
+Control endpoints (plain JSON):
+  POST /_fake/updates   an update, or {"chat_id", "text"} / {"chat_id", "data"[, "message_id"]}
+                        shortcuts for a message / callback press; queued for getUpdates
+  GET  /_fake/stats     calls per method, 429s sent, messages per chat, latency
+  POST /_fake/reset     forget stats and messages
+
+In-process: `with FakeBotAPI(latency=0.02) as api: ... api.url ...`.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sys
+import threading
+import time
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+from urllib.parse import parse_qsl, urlsplit
+
+BOT_ID = 777_000_001
+SEND_METHODS = {
+    "sendMessage", "sendPhoto", "sendVideo", "sendAnimation", "sendDocument",
+    "sendMediaGroup", "editMessageText", "editMessageCaption",
+}
+JSON_FIELDS = {"reply_markup", "media", "entities", "caption_entities", "allowed_updates"}
+
+
+class _Bucket:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.capacity = max(1.0, burst)
+        self.tokens = self.capacity
+        self.stamp = time.monotonic()
+
+    def take(self) -> float:
+        """0 → allowed; otherwise seconds until a token is free (nothing taken)."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.rate)
+        self.stamp = now
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return 0.0
+        return (1.0 - self.tokens) / self.rate
+
+
+class FakeBotAPI:
+    """The server state; start()/stop() run it on a background thread."""
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        error_rate: float = 0.0,
+        retry_after: int = 1,
+        chat_rate: float = 0.0,
+        chat_burst: float = 3.0,
+        global_rate: float = 0.0,
+        seed: Optional[int] = None,
+    ):
+        self.latency, self.jitter = latency, jitter
+        self.error_rate, self.retry_after = error_rate, retry_after
+        self.chat_rate, self.chat_burst, self.global_rate = chat_rate, chat_burst, global_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._updates_cv = threading.Condition(self._lock)
+        self._updates: List[dict] = []
+        self._next_update = 1
+        self._next_msg: Dict[int, int] = {}
+        self._chats: Dict[int, _Bucket] = {}
+        self._global = _Bucket(global_rate, global_rate) if global_rate else None
+        self.reset()
+        self.httpd = ThreadingHTTPServer((host, port), _handler(self))
+        self.httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeBotAPI":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="fake-bot-api", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        with self._updates_cv:
+            self._updates_cv.notify_all()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self) -> "FakeBotAPI":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    # ───────────────────────────── state ─────────────────────────────
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats: Dict[str, Any] = {
+                "calls": {}, "throttled": 0, "injected": 0,
+                "per_chat": {}, "latency_total": 0.0, "started": time.time(),
+            }
+            self.messages: Dict[tuple, dict] = {}   # (chat_id, message_id) → last Message sent/edited
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            st = json.loads(json.dumps(self._stats))
+        n = sum(st["calls"].values())
+        st["latency_avg_ms"] = round(st.pop("latency_total") / n * 1000.0, 3) if n else 0.0
+        st["elapsed_s"] = round(time.time() - st.pop("started"), 3)
+        return st
+
+    def push_update(self, data: dict) -> dict:
+        """Queue an update for getUpdates (shortcut forms: see module doc)."""
+        if "update_id" not in data and not any(k in data for k in ("message", "callback_query")):
+            chat_id = int(data["chat_id"])
+            user = {"id": chat_id, "is_bot": False, "first_name": f"fan{chat_id}", "username": f"fan{chat_id}"}
+            if "data" in data:
+                msg = self._message(chat_id, BOT_ID, {"text": "…"}, message_id=data.get("message_id"))
+                data = {"callback_query": {
+                    "id": str(self._rng.getrandbits(48)), "from": user, "chat_instance": str(chat_id),
+                    "data": data["data"], "message": msg,
+                }}
+            else:
+                text = str(data.get("text", ""))
+                msg = self._message(chat_id, chat_id, {"text": text}, sender=user)
+                if text.startswith("/"):
+                    msg["entities"] = [{"type": "bot_command", "offset": 0, "length": len(text.split()[0])}]
+                data = {"message": msg}
+        with self._updates_cv:
+            upd = dict(data)
+            upd["update_id"] = self._next_update
+            self._next_update += 1
+            self._updates.append(upd)
+            self._updates_cv.notify_all()
+        return upd
+
+    def _get_updates(self, params: dict) -> List[dict]:
+        offset = int(params.get("offset") or 0)
+        limit = int(params.get("limit") or 100)
+        timeout = float(params.get("timeout") or 0)
+        deadline = time.monotonic() + timeout
+        with self._updates_cv:
+            if offset:
+                self._updates = [u for u in self._updates if u["update_id"] >= offset]
+            while not self._updates and time.monotonic() < deadline:
+                self._updates_cv.wait(deadline - time.monotonic())
+            return list(self._updates[:limit])
+
+    def _message(self, chat_id: int, sender_id: int, body: dict, message_id=None, sender=None) -> dict:
+        with self._lock:
+            if message_id is None:
+                message_id = self._next_msg.get(chat_id, 0) + 1
+                self._next_msg[chat_id] = message_id
+        msg = {
+            "message_id": int(message_id),
+            "date": int(time.time()),
+            "chat": {"id": chat_id, "type": "private" if chat_id > 0 else "supergroup"},
+            "from": sender or {"id": sender_id, "is_bot": True, "first_name": "NyxFan", "username": "nyxfan_fake_bot"},
+        }
+        msg.update(body)
+        return msg
+
+    # ───────────────────────────── methods ─────────────────────────────
+
+    def _throttle(self, method: str, params: dict) -> Optional[float]:
+        """Seconds to tell the caller to wait (429), or None to serve the call."""
+        if method not in SEND_METHODS:
+            return None
+        chat = params.get("chat_id")
+        with self._lock:
+            if self.error_rate and self._rng.random() < self.error_rate:
+                self._stats["injected"] += 1
+                return float(self.retry_after)
+            if self._global is not None:
+                wait = self._global.take()
+                if wait:
+                    return wait
+            if self.chat_rate and chat is not None:
+                b = self._chats.get(chat)
+                if b is None:
+                    b = self._chats[chat] = _Bucket(self.chat_rate, self.chat_burst)
+                wait = b.take()
+                if wait:
+                    return wait
+        return None
+
+    def _media(self, kind: str, fid: Any) -> Any:
+        fid = fid if isinstance(fid, str) else f"upload{self._rng.getrandbits(32)}"
+        base = {"file_id": fid, "file_unique_id": fid[-16:]}
+        if kind == "photo":
+            return [{**base, "width": 1280, "height": 720}]
+        if kind in ("video", "animation"):
+            return {**base, "width": 1280, "height": 720, "duration": 5}
+        return base
+
+    def call(self, method: str, params: dict) -> tuple[int, dict]:
+        """(HTTP status, Bot API response body)."""
+        with self._lock:
+            calls = self._stats["calls"]
+            calls[method] = calls.get(method, 0) + 1
+        if method == "getUpdates":
+            return 200, {"ok": True, "result": self._get_updates(params)}
+        wait = self._throttle(method, params)
+        if wait is not None:
+            with self._lock:
+                self._stats["throttled"] += 1
+            secs = max(1, int(wait + 0.999))
+            return 429, {"ok": False, "error_code": 429,
+                         "description": f"Too Many Requests: retry after {secs}",
+                         "parameters": {"retry_after": secs}}
+        chat = params.get("chat_id")
+        try:
+            chat = int(chat) if chat is not None else None
+        except (TypeError, ValueError):
+            return 400, {"ok": False, "error_code": 400, "description": "Bad Request: chat not found"}
+        if chat is not None:
+            with self._lock:
+                per = self._stats["per_chat"]
+                per[str(chat)] = per.get(str(chat), 0) + 1
+
+        if method == "getMe":
+            return 200, {"ok": True, "result": {
+                "id": BOT_ID, "is_bot": True, "first_name": "NyxFan", "username": "nyxfan_fake_bot",
+                "can_join_groups": False, "can_read_all_group_messages": False, "supports_inline_queries": False,
+            }}
+        if method in ("deleteWebhook", "setWebhook", "answerCallbackQuery", "deleteMessage",
+                      "setMyCommands", "close", "logOut"):
+            if method == "deleteMessage":
+                with self._lock:
+                    self.messages.pop((chat, int(params.get("message_id") or 0)), None)
+            return 200, {"ok": True, "result": True}
+        if method == "getWebhookInfo":
+            return 200, {"ok": True, "result": {"url": "", "has_custom_certificate": False, "pending_update_count": 0}}
+
+        if chat is None and method.startswith("send"):
+            return 400, {"ok": False, "error_code": 400, "description": "Bad Request: chat_id is empty"}
+        extra = {}
+        if params.get("reply_markup"):
+            extra["reply_markup"] = params["reply_markup"]
+        if method == "sendMessage":
+            msg = self._message(chat, BOT_ID, {"text": params.get("text", ""), **extra})
+        elif method in ("sendPhoto", "sendVideo", "sendAnimation", "sendDocument"):
+            kind = method[len("send"):].lower()
+            body = {kind: self._media(kind, params.get(kind)), **extra}
+            if params.get("caption"):
+                body["caption"] = params["caption"]
+            msg = self._message(chat, BOT_ID, body)
+        elif method == "sendMediaGroup":
+            media = params.get("media") or []
+            group = str(self._rng.getrandbits(48))
+            out = []
+            for m in media:
+                body = {m.get("type", "photo"): self._media(m.get("type", "photo"), m.get("media")),
+                        "media_group_id": group}
+                if m.get("caption"):
+                    body["caption"] = m["caption"]
+                out.append(self._message(chat, BOT_ID, body))
+            with self._lock:
+                for m in out:
+                    self.messages[(chat, m["message_id"])] = m
+            return 200, {"ok": True, "result": out}
+        elif method in ("editMessageText", "editMessageCaption"):
+            if chat is None:   # inline message
+                return 200, {"ok": True, "result": True}
+            mid = int(params.get("message_id") or 0)
+            with self._lock:
+                prev = self.messages.get((chat, mid))
+            if prev is None:
+                return 400, {"ok": False, "error_code": 400, "description": "Bad Request: message to edit not found"}
+            field = "text" if method == "editMessageText" else "caption"
+            new = params.get(field, "")
+            if prev.get(field) == new and prev.get("reply_markup") == params.get("reply_markup"):
+                return 400, {"ok": False, "error_code": 400, "description":
+                             "Bad Request: message is not modified: specified new message content and reply markup "
+                             "are exactly the same as a current content and reply markup of the message"}
+            msg = {**prev, field: new, "edit_date": int(time.time())}
+            msg.pop("reply_markup", None)
+            msg.update(extra)
+        else:
+            return 404, {"ok": False, "error_code": 404, "description": "Not Found: method not found"}
+        with self._lock:
+            self.messages[(chat, msg["message_id"])] = msg
+        return 200, {"ok": True, "result": msg}
+
+
+def _parse_body(headers, raw: bytes) -> dict:
+    ctype = headers.get("Content-Type", "")
+    params: Dict[str, Any] = {}
+    if ctype.startswith("application/json"):
+        params = json.loads(raw or b"{}")
+    elif ctype.startswith("multipart/form-data"):
+        msg = BytesParser(policy=HTTP).parsebytes(b"Content-Type: " + ctype.encode() + b"\r\n\r\n" + raw)
+        for part in msg.iter_parts():
+            name = part.get_param("name", header="content-disposition")
+            if part.get_filename():
+                params[name] = {"upload": part.get_filename()}
+            else:
+                params[name] = part.get_content()
+    elif raw:
+        params = dict(parse_qsl(raw.decode("utf-8"), keep_blank_values=True))
+    for k in JSON_FIELDS & params.keys():
+        if isinstance(params[k], str):
+            try:
+                params[k] = json.loads(params[k])
+            except ValueError:
+                pass
+    return params
+
+
+def _handler(api: FakeBotAPI):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"   # keep-alive, like api.telegram.org
+
+        def log_message(self, fmt, *args):
+            pass
+
+        def _reply(self, status: int, body: dict) -> None:
+            raw = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(raw)))
+            self.end_headers()
+            self.wfile.write(raw)
+
+        def _serve(self) -> None:
+            path = urlsplit(self.path)
+            raw = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            if path.path.startswith("/_fake/"):
+                what = path.path[len("/_fake/"):]
+                if what == "stats":
+                    return self._reply(200, api.stats())
+                if what == "reset":
+                    api.reset()
+                    return self._reply(200, {"ok": True})
+                if what == "updates" and self.command == "POST":
+                    return self._reply(200, {"ok": True, "result": api.push_update(json.loads(raw or b"{}"))})
+                return self._reply(404, {"ok": False, "description": "unknown control endpoint"})
+
+            parts = path.path.strip("/").split("/")
+            if len(parts) != 2 or not parts[0].startswith("bot"):
+                return self._reply(404, {"ok": False, "error_code": 404, "description": "Not Found"})
+            method = parts[1]
+            params = dict(parse_qsl(path.query))
+            params.update(_parse_body(self.headers, raw))
+            t0 = time.monotonic()
+            if method != "getUpdates" and (api.latency or api.jitter):
+                time.sleep(max(0.0, api.latency + api._rng.uniform(-api.jitter, api.jitter)))
+            status, body = api.call(method, params)
+            with api._lock:
+                api._stats["latency_total"] += time.monotonic() - t0
+            self._reply(status, body)
+
+        do_GET = do_POST = _serve
+
+    return Handler
+
+
+def main(argv: list[str]) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8081)
+    ap.add_argument("--latency", type=float, default=0.0, help="ms added to each call")
+    ap.add_argument("--jitter", type=float, default=0.0, help="± ms around --latency")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="share of sends answered 429")
+    ap.add_argument("--retry-after", type=int, default=1, help="seconds in injected 429s")
+    ap.add_argument("--chat-rate", type=float, default=0.0, help="msg/s per chat (0 → unlimited)")
+    ap.add_argument("--chat-burst", type=float, default=3.0)
+    ap.add_argument("--global-rate", type=float, default=0.0, help="msg/s across chats (0 → unlimited)")
+    ap.add_argument("--seed", type=int, default=None)
+    args = ap.parse_args(argv)
+
+    api = FakeBotAPI(
+        host=args.host, port=args.port,
+        latency=args.latency / 1000.0, jitter=args.jitter / 1000.0,
+        error_rate=args.error_rate, retry_after=args.retry_after,
+        chat_rate=args.chat_rate, chat_burst=args.chat_burst, global_rate=args.global_rate,
+        seed=args.seed,
+    )
+    print(f"fake Bot API on {api.url}  (NYXFAN_BOT_API_URL={api.url})")
+    try:
+        api.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(json.dumps(api.stats(), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,76 @@
+# NyxFan/bench/importtime.py
+"""
+Cold-start import budget.
+
+  python bench/importtime.py                  # check every module in BUDGETS_MS
+  python bench/importtime.py api.index        # just one
+  NYXFAN_IMPORT_BUDGET_SCALE=2 python ...     # slower box / CI
+
+Each module is imported in a fresh interpreter under `python -X importtime`;
+the cumulative time of the top-level import is compared with its budget and
+the script exits 1 when anything is over (prints the slowest children).
+tests/test_importtime.py enforces the same budgets under pytest.
+"""
+
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+
+# module → budget in milliseconds (cumulative, including everything it imports)
+BUDGETS_MS = {
+    "api": 25,             # package only; subpackages are lazy
+    "api.utils.io": 60,    # queue/prefs I/O, no telegram
+    "api.index": 400,      # WSGI entry: flask + config, Application not built
+}
+
+
+def measure(module: str) -> tuple[float, list[tuple[float, str]]]:
+    """(cumulative ms of `module`, [(cumulative ms, name)] of its heaviest imports)."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=PROJECT_ROOT, capture_output=True, text=True,
+        env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr[-2000:]}")
+    total, rows = None, []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|", 2)
+        try:
+            us = int(cumulative)
+        except ValueError:
+            continue   # header line
+        rows.append((us / 1000.0, name.rstrip()))
+        if name.strip() == module:
+            total = us / 1000.0
+    if total is None:
+        raise RuntimeError(f"no importtime line for {module}")
+    top = sorted((r for r in rows if r[1].strip() != module), reverse=True)[:8]
+    return total, top
+
+
+def main(argv: list[str]) -> int:
+    scale = float(os.getenv("NYXFAN_IMPORT_BUDGET_SCALE", "1"))
+    modules = argv or list(BUDGETS_MS)
+    failed = False
+    for module in modules:
+        budget = BUDGETS_MS.get(module, 100) * scale
+        took, top = measure(module)
+        ok = took <= budget
+        failed |= not ok
+        print(f"{'ok  ' if ok else 'OVER'} {module:<24} {took:8.1f} ms  (budget {budget:.0f} ms)")
+        if not ok:
+            for ms, name in top:
+                print(f"       {ms:8.1f} ms {name}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
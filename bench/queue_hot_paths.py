@@ -0,0 +1,394 @@
+# NyxFan/bench/queue_hot_paths.py
+"""
+Micro-benchmarks for the queue hot paths.
+
+  python bench/queue_hot_paths.py                          # 1k / 10k / 100k items, json backend
+  python bench/queue_hot_paths.py --sizes 1000 --repeat 20
+  python bench/queue_hot_paths.py --backend sqlite --fans 5000 --muted 0.5
+  python bench/queue_hot_paths.py --save                   # rewrite the baseline
+  python bench/queue_hot_paths.py --check                  # exit 1 on a regression
+
+Each run builds a synthetic shared/ dir in a temp directory (queue, notification
+prefs, a fan registry that maps nyx<i> → a Telegram id) and points the api
+modules at it. Bot calls go to a fake Bot that answers instantly, so the numbers
+are our own CPU/disk cost per call, not Telegram's. For every queue size it
+reports per-call latency (median / p95) and, in a separate tracemalloc pass,
+peak and retained memory of one call.
+
+Benchmarks:
+  process_fan_jobs      one fan_consumer tick (claim ≤ BATCH_SIZE, deliver, ack)
+  process_fan_queue     one dash_refresh tick
+  build_dashboard       warm render (pending counters already built)
+  build_dashboard_cold  render right after an outside queue change (full recount)
+  show_alerts           "View All" for one fan
+  start_filter          /start filter_relay_<creator> deep link for one fan
+
+The baseline (bench/queue_hot_paths.baseline.json) is keyed by backend and
+size; --check compares medians against it with --tolerance.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+BASELINE_PATH = Path(__file__).resolve().with_name("queue_hot_paths.baseline.json")
+
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+DEFAULT_TYPES = ("fan_relay", "fan_dm", "fan_unlock_register", "dash_refresh", "relay", "subchg", "dm")
+TG_BASE = 100_000_000   # nyx<i> ↔ TG_BASE + i (9 digits, like a real user id)
+
+# Registry stand-in written into the temp shared/ dir (in memory, no disk)
+_FAKE_REGISTRY = '''
+_MAP = {}
+
+def seed(n):
+    _MAP.update({f"nyx{i}": %d + i for i in range(n)})
+
+def get_telegram_id(nyx_id):
+    return _MAP.get(str(nyx_id))
+
+def register_user(tg_id, display):
+    return _MAP.setdefault(f"nyx{int(tg_id) - %d}", int(tg_id))
+''' % (TG_BASE, TG_BASE)
+
+
+# ───────────────────────────── synthetic data ─────────────────────────────
+
+def _file_id(rng: random.Random) -> str:
+    return "AgAC" + "".join(rng.choices("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789_-", k=60))
+
+
+def make_queue(n: int, fans: int, creators: int, types, rng: random.Random) -> List[dict]:
+    out = []
+    for i in range(n):
+        nyx = f"nyx{rng.randrange(fans)}"
+        creator = f"creator{rng.randrange(creators)}"
+        t = types[i % len(types)]
+        cid = f"c{i}"
+        if t in ("fan_relay", "relay"):
+            items = [{"file_id": _file_id(rng), "kind": "photo"} for _ in range(rng.randint(1, 3))]
+            out.append({
+                "type": t, "nyx_id": nyx, "creator": creator, "title": f"post {i}",
+                "content_id": cid, "teaser": {"file_id": _file_id(rng), "kind": "photo"}, "items": items,
+            })
+        elif t in ("fan_dm", "dm"):
+            out.append({"type": t, "nyx_id": nyx, "creator": creator, "message": f"hello {i}"})
+        elif t == "subchg":
+            out.append({"type": t, "nyx_id": nyx, "creator": creator, "old_price": "5", "new_price": "7"})
+        elif t == "fan_unlock_register":
+            out.append({
+                "type": t, "nyx_id": nyx, "content_id": cid,
+                "items": [{"file_id": _file_id(rng), "kind": "video"}],
+            })
+        elif t == "dash_refresh":
+            out.append({"type": t, "nyx_id": nyx})
+        else:
+            out.append({"type": t, "nyx_id": nyx, "creator": creator})
+    return out
+
+
+def make_notifs(fans: int, creators: int, muted: float, rng: random.Random) -> dict:
+    out: Dict[str, dict] = {}
+    for f in range(fans):
+        prefs = {
+            f"creator{c}": {"mode": "immediate", "muted": True}
+            for c in range(creators) if rng.random() < muted
+        }
+        if prefs:
+            out[str(TG_BASE + f)] = prefs
+    return out
+
+
+# ───────────────────────────── fake Bot / Update ─────────────────────────────
+
+class FakeBot:
+    """Any bot.<method>(...) / message.reply_<x>(...) returns a new FakeBot as the 'Message'."""
+
+    _next = [1]
+
+    def __init__(self):
+        self.message_id = FakeBot._next[0]
+        FakeBot._next[0] += 1
+        self.calls = 0
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        async def _call(*args, **kwargs):
+            self.calls += 1
+            return FakeBot()
+        return _call
+
+
+def _update(tg: int) -> SimpleNamespace:
+    msg = FakeBot()
+    user = SimpleNamespace(id=tg, username=f"fan{tg}", full_name=f"Fan {tg}")
+
+    async def _answer(*a, **kw):
+        return True
+    query = SimpleNamespace(answer=_answer, from_user=user, message=msg, data="show_alerts")
+    return SimpleNamespace(effective_user=user, message=msg, callback_query=query)
+
+
+# ───────────────────────────── harness ─────────────────────────────
+
+class Env:
+    """The temp shared/ dir + the api modules pointed at it."""
+
+    def __init__(self, root: Path, args):
+        self.root = root
+        self.args = args
+        shared = root / "shared"
+        shared.mkdir()
+        (shared / "__init__.py").write_text("")
+        (shared / "fan_registry.py").write_text(_FAKE_REGISTRY)
+        sys.path.insert(0, str(root))
+        sys.path.insert(1, str(PROJECT_ROOT))
+        os.environ.setdefault("BOT_TOKEN", "0:bench")
+        os.environ.setdefault("BOT_USERNAME", "nyxfan_bench_bot")
+        import shared.fan_registry as registry   # before api.utils.env puts the real repo root first
+        registry.seed(args.fans)
+
+        from api.utils import env, io, media, state, trace, unlock_store
+        from api.jobs import retry
+        io.QUEUE_PATH = shared / "command_queue.json"
+        io.NOTIF_PATH = shared / "fan_notifications.json"
+        io.LOG_DIR = shared / "command_log"
+        io.QUEUE_DB = shared / "command_queue.sqlite3"
+        unlock_store.UNLOCK_DB = shared / "unlock_index.sqlite3"
+        unlock_store.LEGACY_JSON = shared / "unlock_index.json"
+        media.KINDS_PATH = shared / "file_kinds.json"
+        trace.TRACE_FILE = str(shared / "nyxfan_traces.jsonl")
+        state.STATE_PATH = shared / "fan_state.json"
+        retry.DEAD_LETTER_PATH = shared / "fan_dead_letters.jsonl"
+        state.load()
+        self.bot = FakeBot()
+        env._APP["app"] = SimpleNamespace(bot=self.bot)   # fan_bot / context.bot → fake
+        self.io = io
+        self.shared = shared
+        self.rng = random.Random(args.seed)
+        io.write_notifs(make_notifs(args.fans, args.creators, args.muted, self.rng))
+
+    def seed_queue(self, n: int) -> None:
+        """Fresh backend instance (no claim state) holding a fresh synthetic queue."""
+        from api.utils import pending, resolve, state
+        io = self.io
+        for p in self.shared.glob("command_*"):
+            if p.is_dir():
+                for f in p.iterdir():
+                    f.unlink()
+                p.rmdir()
+            else:
+                p.unlink()
+        io.set_queue_backend(self.args.backend)
+        q = make_queue(n, self.args.fans, self.args.creators, self.args.types, random.Random(self.args.seed + n))
+        if self.args.backend == "json":
+            io.write_queue(q)
+        else:
+            io.enqueue(*q)
+        resolve.invalidate()
+        pending._STATE["stale"] = True
+        state.DASH_RENDER.clear()
+        state.DASH_EDITS.clear()
+        state.ALL_DASH_MSGS.clear()
+        for f in range(self.args.fans):   # every fan has a dashboard to edit
+            state.ALL_DASH_MSGS[TG_BASE + f] = [f + 1]
+
+    def busiest_fan(self) -> tuple[int, str]:
+        """(tg id, creator) with the most queued alerts, so the per-fan paths have work."""
+        counts: Dict[tuple, int] = {}
+        for c in self.io.read_queue():
+            if c.get("creator") is not None:
+                k = (c["nyx_id"], c["creator"])
+                counts[k] = counts.get(k, 0) + 1
+        (nyx, creator), _ = max(counts.items(), key=lambda kv: kv[1]) if counts else (("nyx0", "creator0"), 0)
+        return TG_BASE + int(nyx[3:]), creator
+
+
+def _benchmarks(env: Env) -> Dict[str, Callable[[int], tuple]]:
+    """name → setup(n) returning (call, fresh): `call()` is a coroutine factory or a
+    plain callable; `fresh` → re-run setup before every measured call."""
+    from api.jobs.processor_fan import process_fan_jobs
+    from api.jobs.refresh import process_fan_queue
+    from api.handlers.dashboard import build_dashboard
+    from api.handlers.callbacks import show_alerts
+    from api.commands.start import start
+    from api.utils import pending
+
+    ctx = SimpleNamespace(bot=env.bot, args=None, job=None)
+
+    def _fan_jobs(n):
+        env.seed_queue(n)
+        return (lambda: process_fan_jobs(ctx)), True
+
+    def _fan_queue(n):
+        env.seed_queue(n)
+        return (lambda: process_fan_queue(ctx)), True
+
+    def _dash(n):
+        env.seed_queue(n)
+        tg, _ = env.busiest_fan()
+        build_dashboard(tg)   # builds the counters once
+        return (lambda: build_dashboard(tg)), False
+
+    def _dash_cold(n):
+        env.seed_queue(n)
+        tg, _ = env.busiest_fan()
+
+        def _call():
+            pending._STATE["stale"] = True
+            return build_dashboard(tg)
+        return _call, False
+
+    def _alerts(n):
+        env.seed_queue(n)
+        tg, _ = env.busiest_fan()
+        return (lambda: show_alerts(_update(tg), ctx)), True
+
+    def _start(n):
+        env.seed_queue(n)
+        tg, creator = env.busiest_fan()
+        sctx = SimpleNamespace(bot=env.bot, args=[f"filter_relay_{creator}"])
+        return (lambda: start(_update(tg), sctx)), True
+
+    return {
+        "process_fan_jobs": _fan_jobs,
+        "process_fan_queue": _fan_queue,
+        "build_dashboard": _dash,
+        "build_dashboard_cold": _dash_cold,
+        "show_alerts": _alerts,
+        "start_filter": _start,
+    }
+
+
+def _once(loop, call) -> None:
+    res = call()
+    if asyncio.iscoroutine(res):
+        loop.run_until_complete(res)
+
+
+def run_one(loop, setup, n: int, repeat: int) -> dict:
+    call, fresh = setup(n)
+    _once(loop, call)   # warm-up (imports, caches)
+    times = []
+    for _ in range(repeat):
+        if fresh:
+            call, _ = setup(n)
+        t0 = time.perf_counter()
+        _once(loop, call)
+        times.append((time.perf_counter() - t0) * 1000.0)
+
+    if fresh:
+        call, _ = setup(n)
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        _once(loop, call)
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    times.sort()
+    return {
+        "median_ms": round(statistics.median(times), 3),
+        "p95_ms": round(times[min(len(times) - 1, int(len(times) * 0.95))], 3),
+        "min_ms": round(times[0], 3),
+        "peak_kib": round((peak - before) / 1024.0, 1),
+        "retained_kib": round((current - before) / 1024.0, 1),
+    }
+
+
+def _check(results: dict, baseline: dict, tolerance: float) -> bool:
+    failed = False
+    for key, rows in results.items():
+        for name, r in rows.items():
+            base = baseline.get(key, {}).get(name)
+            if not base:
+                print(f"new  {key:<14} {name:<22} {r['median_ms']:9.3f} ms (no baseline)")
+                continue
+            limit = base["median_ms"] * (1.0 + tolerance)
+            ok = r["median_ms"] <= limit
+            failed |= not ok
+            print(f"{'ok  ' if ok else 'SLOW'} {key:<14} {name:<22} {r['median_ms']:9.3f} ms  (baseline {base['median_ms']:.3f} ms)")
+    return not failed
+
+
+def main(argv: list[str]) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)), help="queue sizes, comma-separated")
+    ap.add_argument("--fans", type=int, default=1_000)
+    ap.add_argument("--creators", type=int, default=50)
+    ap.add_argument("--types", default=",".join(DEFAULT_TYPES), help="job types, round-robin")
+    ap.add_argument("--muted", type=float, default=0.3, help="share of (fan, creator) pairs that are muted")
+    ap.add_argument("--backend", default="json", help="queue backend (json / log / sqlite)")
+    ap.add_argument("--repeat", type=int, default=5, help="measured calls per benchmark and size")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--only", default="", help="comma-separated benchmark names")
+    ap.add_argument("--json", dest="out", default="", help="also write the results here")
+    ap.add_argument("--save", action="store_true", help="merge the results into the baseline")
+    ap.add_argument("--check", action="store_true", help="exit 1 when a median is over baseline × (1 + tolerance)")
+    ap.add_argument("--tolerance", type=float, default=float(os.getenv("NYXFAN_BENCH_TOLERANCE", "0.25")))
+    args = ap.parse_args(argv)
+    args.types = tuple(t for t in args.types.split(",") if t)
+    sizes = [int(s) for s in args.sizes.split(",") if s]
+
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+    results: Dict[str, Dict[str, dict]] = {}
+    with tempfile.TemporaryDirectory(prefix="nyxfan-bench-") as tmp:
+        env = Env(Path(tmp), args)
+        benches = _benchmarks(env)
+        only = {b for b in args.only.split(",") if b}
+        print(f"{'':4} {'backend/size':<14} {'benchmark':<22} {'median':>12} {'p95':>10} {'peak':>11} {'retained':>11}")
+        for n in sizes:
+            key = f"{args.backend}/{n}"
+            for name, setup in benches.items():
+                if only and name not in only:
+                    continue
+                r = run_one(loop, setup, n, max(1, args.repeat))
+                results.setdefault(key, {})[name] = r
+                print(f"{'':4} {key:<14} {name:<22} {r['median_ms']:9.3f} ms {r['p95_ms']:7.3f} ms "
+                      f"{r['peak_kib']:8.1f} KiB {r['retained_kib']:8.1f} KiB")
+    loop.close()
+
+    meta = {"fans": args.fans, "creators": args.creators, "muted": args.muted,
+            "types": list(args.types), "repeat": args.repeat, "python": sys.version.split()[0]}
+    if args.out:
+        Path(args.out).write_text(json.dumps({"meta": meta, "results": results}, indent=2) + "\n")
+
+    ok = True
+    if args.check:
+        try:
+            baseline = json.loads(BASELINE_PATH.read_text()).get("results", {})
+        except FileNotFoundError:
+            print(f"no baseline at {BASELINE_PATH}; run with --save first")
+            return 1
+        ok = _check(results, baseline, args.tolerance)
+    if args.save:
+        try:
+            saved = json.loads(BASELINE_PATH.read_text())
+        except FileNotFoundError:
+            saved = {"results": {}}
+        for key, rows in results.items():
+            saved["results"].setdefault(key, {}).update(rows)
+        saved["meta"] = meta
+        BASELINE_PATH.write_text(json.dumps(saved, indent=2, sort_keys=True) + "\n")
+        print(f"baseline → {BASELINE_PATH}")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,53 @@
+# NyxFan/bench/trace_report.py
+"""
+Enqueue → delivery latency per job type, from the span log utils/trace.py writes.
+
+  python bench/trace_report.py                        # NYXFAN_TRACE_FILE / shared/nyxfan_traces.jsonl
+  python bench/trace_report.py traces.jsonl traces.jsonl.1 --since 3600
+  python bench/trace_report.py --json                 # machine-readable
+
+"untimed" counts traces that never reached a sent/skipped (or acked) span:
+still queued, muted (parked for the dashboard), or lost.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from api.utils.trace import TRACE_FILE, read_file, report  # noqa: E402
+
+
+def main(argv: list[str]) -> int:
+    ap = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    ap.add_argument("files", nargs="*", default=[TRACE_FILE])
+    ap.add_argument("--since", type=float, default=0.0, help="only traces started in the last N seconds")
+    ap.add_argument("--json", action="store_true")
+    args = ap.parse_args(argv)
+
+    cutoff = time.time() - args.since if args.since else 0.0
+    recs = []
+    for f in args.files:
+        if not Path(f).exists():
+            print(f"no trace file at {f}", file=sys.stderr)
+            continue
+        recs.extend(r for r in read_file(f) if float(r.get("enq") or r.get("t") or 0) >= cutoff)
+    rows = report(recs)
+
+    if args.json:
+        print(json.dumps(rows, indent=2))
+        return 0
+    print(f"{'type':<22} {'n':>7} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9} {'untimed':>8}")
+    for typ, r in rows.items():
+        print(f"{typ:<22} {r['n']:>7} {r['p50']:8.3f}s {r['p95']:8.3f}s {r['p99']:8.3f}s {r['max']:8.3f}s {r['untimed']:>8}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,143 @@
+# NyxFan/tests/conftest.py
+"""
+Fixtures for the NyxFan tests.
+
+`nyx` points every shared file the api modules touch (queue, prefs, unlock
+store, state snapshot, dead letters, …) at a fresh temp shared/ dir, installs
+an in-memory fan registry (nyx<i> ↔ TG_BASE + i) and a fake Bot that records
+every call instead of talking to Telegram. Tests that take `nyx` run once per
+queue backend (json, log, sqlite) unless they pin `backend`.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import sys
+import types
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT))
+
+os.environ.setdefault("BOT_TOKEN", "0:test")
+os.environ.setdefault("BOT_USERNAME", "nyxfan_test_bot")
+
+TG_BASE = 100_000_000
+FANS = 5
+BACKENDS = ("json", "log", "sqlite")
+
+# The real registry lives in the Proxy's shared/ package, outside this repo
+_registry = types.ModuleType("shared.fan_registry")
+_registry._MAP = {}
+_registry.get_telegram_id = lambda nyx_id: _registry._MAP.get(str(nyx_id))
+_registry.register_user = lambda tg_id, display: _registry._MAP.setdefault(f"nyx{int(tg_id) - TG_BASE}", int(tg_id))
+_shared = types.ModuleType("shared")
+_shared.__path__ = []
+_shared.fan_registry = _registry
+sys.modules["shared"] = _shared
+sys.modules["shared.fan_registry"] = _registry
+
+
+class FakeBot:
+    """bot.<method>(**kw) → records (method, kw) in `calls` and returns a fake Message."""
+
+    def __init__(self):
+        self.calls: list = []
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+
+        async def _call(*args, **kwargs):
+            self.calls.append((name, kwargs))
+            msg = SimpleNamespace(message_id=len(self.calls), chat_id=kwargs.get("chat_id"))
+            return [msg] if name == "send_media_group" else msg
+        return _call
+
+    def sent(self, chat_id=None) -> list:
+        """Calls that put something in a chat (send_*), optionally for one chat."""
+        return [
+            (name, kw) for name, kw in self.calls
+            if name.startswith("send_") and (chat_id is None or kw.get("chat_id") == chat_id)
+        ]
+
+
+def callback_update(tg: int, bot: FakeBot, data: str = "") -> SimpleNamespace:
+    """A CallbackQuery update from fan `tg`; replies land in `bot.calls` too."""
+    user = SimpleNamespace(id=tg, username=f"fan{tg}", full_name=f"Fan {tg}")
+
+    async def _answer(*args, **kwargs):
+        return True
+
+    async def _reply(text, **kwargs):
+        return await bot.send_message(chat_id=tg, text=text, **kwargs)
+
+    message = SimpleNamespace(chat_id=tg, message_id=0, reply_text=_reply,
+                              reply_photo=bot.send_photo, reply_video=bot.send_video,
+                              reply_animation=bot.send_animation, reply_document=bot.send_document)
+    query = SimpleNamespace(answer=_answer, from_user=user, message=message, data=data)
+    return SimpleNamespace(effective_user=user, effective_chat=SimpleNamespace(id=tg),
+                           message=message, callback_query=query)
+
+
+@pytest.fixture(params=BACKENDS)
+def backend(request) -> str:
+    return request.param
+
+
+@pytest.fixture
+def nyx(tmp_path, monkeypatch, backend):
+    from api.utils import env, io, media, pending, resolve, state, trace, unlock_store
+    from api.jobs import digest, retry, wakeup
+
+    shared = tmp_path / "shared"
+    shared.mkdir()
+    for mod, attr, name in (
+        (io, "QUEUE_PATH", "command_queue.json"),
+        (io, "NOTIF_PATH", "fan_notifications.json"),
+        (io, "LOG_DIR", "command_log"),
+        (io, "QUEUE_DB", "command_queue.sqlite3"),
+        (unlock_store, "UNLOCK_DB", "unlock_index.sqlite3"),
+        (unlock_store, "LEGACY_JSON", "unlock_index.json"),
+        (media, "KINDS_PATH", "file_kinds.json"),
+        (state, "STATE_PATH", "fan_state.json"),
+        (digest, "STATE_PATH", "fan_digests.json"),
+        (retry, "DEAD_LETTER_PATH", "fan_dead_letters.jsonl"),
+    ):
+        monkeypatch.setattr(mod, attr, shared / name)
+    monkeypatch.setattr(trace, "TRACE_FILE", "")
+    monkeypatch.setattr(io, "_QUEUE", None)
+    monkeypatch.setattr(io, "_NOTIFS", {"data": {}, "stamp": None, "checked": 0.0})
+    monkeypatch.setattr(unlock_store, "_DB", {"conn": None, "path": None})
+    monkeypatch.setattr(media, "_KIND", {})
+    monkeypatch.setattr(media, "_STATE", {"loaded": True, "dirty": 0, "flushed": 0.0})
+    monkeypatch.setattr(digest, "_STATE", {"data": None})
+    monkeypatch.setitem(wakeup._STATE, "loop", None)
+    monkeypatch.setitem(state._DISK, "loaded", True)
+    for store in state._STORES.values():
+        store._data.clear()
+    _registry._MAP.clear()
+    _registry._MAP.update({f"nyx{i}": TG_BASE + i for i in range(FANS)})
+    resolve.invalidate()
+    pending._STATE["stale"] = True
+
+    bot = FakeBot()
+    monkeypatch.setitem(env._APP, "app", SimpleNamespace(bot=bot))
+    io.set_queue_backend(backend)
+    context = SimpleNamespace(bot=bot, job=None, args=None)
+
+    def run(coro):
+        return asyncio.run(coro)
+
+    def tick():
+        from api.jobs.processor_fan import process_fan_jobs
+        run(process_fan_jobs(context))
+
+    yield SimpleNamespace(
+        io=io, bot=bot, shared=shared, backend=backend, context=context,
+        tg=lambda i: TG_BASE + i, run=run, tick=tick,
+    )
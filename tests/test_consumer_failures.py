@@ -0,0 +1,63 @@
+# NyxFan/tests/test_consumer_failures.py
+"""A tick that raises part-way leaves nothing claimed: the next tick gets it all back."""
+
+from __future__ import annotations
+
+import pytest
+
+from api.jobs import processor_fan, refresh
+from api.utils.state import ALL_DASH_MSGS
+
+
+def _dm(nyx: str, message: str) -> dict:
+    return {"type": "fan_dm", "nyx_id": nyx, "creator": "creatorA", "message": message}
+
+
+def _fail_once(monkeypatch, module, name: str) -> None:
+    real = getattr(module, name)
+    calls = {"n": 0}
+
+    def flaky(*args, **kwargs):
+        calls["n"] += 1
+        if calls["n"] == 1:
+            raise RuntimeError(f"{name} failed")
+        return real(*args, **kwargs)
+    monkeypatch.setattr(module, name, flaky)
+
+
+@pytest.mark.parametrize("step", ["resolve_many", "enqueue", "ack"])
+def test_fan_tick_failure_releases_claims(nyx, monkeypatch, step):
+    nyx.io.enqueue(_dm("nyx1", "one"), _dm("nyx2", "two"))
+    _fail_once(monkeypatch, processor_fan, step)
+    with pytest.raises(RuntimeError):
+        nyx.tick()
+
+    nyx.tick()
+    assert {kw["chat_id"] for _, kw in nyx.bot.sent()} >= {nyx.tg(1), nyx.tg(2)}
+    assert [c for c in nyx.io.read_queue() if c["type"] == "fan_dm"] == []
+
+
+def test_fan_tick_failure_after_registration(nyx, monkeypatch):
+    nyx.io.enqueue(
+        {"type": "fan_unlock_register", "nyx_id": "nyx1", "content_id": "c1",
+         "items": [{"file_id": "F1", "kind": "video"}]},
+        _dm("nyx1", "hi"),
+    )
+    _fail_once(monkeypatch, processor_fan, "ack")
+    with pytest.raises(RuntimeError):
+        nyx.tick()
+
+    nyx.tick()
+    assert nyx.io.read_queue() == []
+
+
+def test_refresh_ack_failure_releases_pokes(nyx, monkeypatch):
+    tg = nyx.tg(1)
+    ALL_DASH_MSGS[tg] = [42]
+    nyx.io.enqueue({"type": "dash_refresh", "nyx_id": "nyx1"})
+    _fail_once(monkeypatch, refresh, "ack")
+    with pytest.raises(RuntimeError):
+        nyx.run(refresh.process_fan_queue(nyx.context))
+
+    nyx.run(refresh.process_fan_queue(nyx.context))
+    assert [c for c in nyx.io.read_queue() if c["type"] == "dash_refresh"] == []
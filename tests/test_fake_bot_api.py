@@ -0,0 +1,59 @@
+# NyxFan/tests/test_fake_bot_api.py
+"""bench/fake_bot_api.py answers the real PTB client the way Telegram would."""
+
+from __future__ import annotations
+
+import asyncio
+import json
+from urllib.request import urlopen
+
+import pytest
+from telegram import Bot, InputMediaPhoto
+from telegram.error import RetryAfter
+
+from api.utils.http import PooledRequest
+from bench.fake_bot_api import FakeBotAPI
+
+TOKEN = "123:fake"
+
+
+def _bot(api: FakeBotAPI) -> Bot:
+    return Bot(TOKEN, base_url=f"{api.url}/bot", request=PooledRequest("send", pool_size=4))
+
+
+def _run(api: FakeBotAPI, fn):
+    async def main():
+        async with _bot(api) as bot:
+            return await fn(bot)
+    return asyncio.run(main())
+
+
+def test_sends_are_answered_and_counted():
+    async def send(bot):
+        msg = await bot.send_message(chat_id=42, text="hi")
+        group = await bot.send_media_group(chat_id=42, media=[InputMediaPhoto("P1"), InputMediaPhoto("P2")])
+        return msg, group
+
+    with FakeBotAPI() as api:
+        msg, group = _run(api, send)
+        stats = json.load(urlopen(f"{api.url}/_fake/stats"))
+    assert msg.chat_id == 42 and msg.text == "hi"
+    assert len(group) == 2
+    assert stats["calls"]["sendMessage"] == 1 and stats["calls"]["sendMediaGroup"] == 1
+
+
+def test_injected_errors_are_flood_waits():
+    with FakeBotAPI(error_rate=1.0, retry_after=3, seed=1) as api:
+        with pytest.raises(RetryAfter) as err:
+            _run(api, lambda bot: bot.send_message(chat_id=42, text="hi"))
+        assert api.stats()["injected"] == 1
+    assert err.value.retry_after == 3
+
+
+def test_pushed_updates_come_back_from_get_updates():
+    with FakeBotAPI() as api:
+        api.push_update({"chat_id": 7, "text": "/start"})
+        api.push_update({"chat_id": 7, "data": "show_alerts"})
+        updates = _run(api, lambda bot: bot.get_updates(timeout=0))
+    assert updates[0].message.text == "/start"
+    assert updates[1].callback_query.data == "show_alerts"
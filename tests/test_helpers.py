@@ -0,0 +1,23 @@
+# NyxFan/tests/test_helpers.py
+"""utils/helpers.py re-exports the queue API instead of keeping its own copy."""
+
+from __future__ import annotations
+
+from api.utils import helpers, io
+
+
+def test_queue_helpers_are_the_io_ones(nyx):
+    assert helpers.read_queue is io.read_queue
+    assert helpers.update_queue is io.update_queue
+    assert not hasattr(helpers, "write_queue")   # a blind overwrite loses concurrent enqueues
+
+
+def test_update_through_helpers_keeps_concurrent_enqueue(nyx, monkeypatch):
+    woken = []
+    monkeypatch.setattr(io, "_LISTENERS", list(io._LISTENERS))
+    io.subscribe(lambda *change: woken.append(change))
+    base = helpers.read_queue()
+    io.enqueue({"type": "fan_dm", "nyx_id": "nyx1", "message": "meanwhile"})
+    helpers.write_queue_merged(base, base + [{"type": "dash_refresh", "nyx_id": "nyx2"}])
+    assert sorted(c["type"] for c in helpers.read_queue()) == ["dash_refresh", "fan_dm"]
+    assert woken   # listeners (worker wakeups) heard about it
@@ -0,0 +1,30 @@
+# NyxFan/tests/test_http.py
+"""PooledRequest: public HTTPXRequest knobs, plus the PTB internals keep-alive tuning needs."""
+
+from __future__ import annotations
+
+from types import SimpleNamespace
+
+from telegram.request import HTTPXRequest
+
+from api.utils.http import PooledRequest
+
+
+def test_ptb_internals_keepalive_tuning_relies_on():
+    # Fails on a python-telegram-bot upgrade that drops them: update http.py, then the pin
+    req = HTTPXRequest(connection_pool_size=4)
+    assert isinstance(req._client_kwargs, dict) and "limits" in req._client_kwargs
+    assert callable(req._build_client)
+
+
+def test_pool_and_keepalive_settings_reach_the_client():
+    req = PooledRequest("send", pool_size=7, keepalive=3, keepalive_expiry=12.0, pool_timeout=2.0)
+    limits = req._client_kwargs["limits"]
+    assert (limits.max_connections, limits.max_keepalive_connections, limits.keepalive_expiry) == (7, 3, 12.0)
+    assert req._client_kwargs["timeout"].pool == 2.0
+    assert req.stats()["pool_size"] == 7
+
+
+def test_missing_internals_warn_instead_of_breaking(capsys):
+    PooledRequest._tune_keepalive(SimpleNamespace(name="send"), 7, 3, 12.0)
+    assert "keep-alive settings ignored" in capsys.readouterr().out
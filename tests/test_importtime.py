@@ -0,0 +1,55 @@
+# NyxFan/tests/test_importtime.py
+"""
+The cold-start import budget (bench/importtime.py) as a test.
+
+Timings are the best of a few fresh interpreters against BUDGETS_MS, scaled
+by NYXFAN_IMPORT_BUDGET_SCALE on slow CI boxes. What keeps the budget — no
+telegram in the queue layer, no Application built on import — is asserted
+exactly, so a regression fails even on a fast machine.
+"""
+
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+BENCH = Path(__file__).resolve().parents[1] / "bench"
+sys.path.insert(0, str(BENCH))
+
+import importtime  # noqa: E402
+
+SCALE = float(os.getenv("NYXFAN_IMPORT_BUDGET_SCALE", "1"))
+TRIES = 3
+
+
+@pytest.mark.parametrize("module", sorted(importtime.BUDGETS_MS))
+def test_import_within_budget(module):
+    budget = importtime.BUDGETS_MS[module] * SCALE
+    took = min(importtime.measure(module)[0] for _ in range(TRIES))
+    assert took <= budget, f"import {module}: {took:.1f} ms > {budget:.0f} ms"
+
+
+def _loaded_after(code: str) -> str:
+    proc = subprocess.run(
+        [sys.executable, "-c", code], cwd=importtime.PROJECT_ROOT,
+        capture_output=True, text=True, env={**os.environ, "PYTHONDONTWRITEBYTECODE": "1"},
+    )
+    assert proc.returncode == 0, proc.stderr[-2000:]
+    return proc.stdout.strip()
+
+
+def test_queue_layer_does_not_import_telegram():
+    assert _loaded_after("import sys, api.utils.io; print('telegram' in sys.modules)") == "False"
+
+
+def test_package_import_is_lazy():
+    assert _loaded_after("import sys, api; print(sorted(m for m in sys.modules if m.startswith('api.')))") == "[]"
+
+
+def test_entry_point_does_not_build_the_application():
+    code = "import api.index; from api.utils import env; print(env._APP['app'] is None)"
+    assert _loaded_after(code) == "True"
@@ -0,0 +1,85 @@
+# NyxFan/tests/test_mute_release.py
+"""Muted / digest-held alerts stay queued and go out once the fan switches back."""
+
+from __future__ import annotations
+
+import pytest
+
+from api.handlers.callbacks import _set_user_prefs, show_alerts
+from conftest import callback_update
+
+
+def _dm(nyx: str, creator: str, message: str) -> dict:
+    return {"type": "fan_dm", "nyx_id": nyx, "creator": creator, "message": message}
+
+
+def _queued(nyx, type_="fan_dm") -> list:
+    return [c for c in nyx.io.read_queue() if c.get("type") == type_]
+
+
+def test_unmute_delivers_what_arrived_while_muted(nyx):
+    tg = nyx.tg(1)
+    _set_user_prefs(tg, "creatorA", muted=True)
+    nyx.io.enqueue(_dm("nyx1", "creatorA", "while muted"))
+    nyx.tick()
+    assert nyx.bot.sent(tg) == []
+    assert len(_queued(nyx)) == 1   # kept for the dashboard
+
+    _set_user_prefs(tg, "creatorA", muted=False)
+    for _ in range(3):
+        nyx.tick()
+    sent = nyx.bot.sent(tg)
+    assert len(sent) == 1 and "while muted" in sent[0][1]["text"]
+    assert _queued(nyx) == []
+
+
+@pytest.mark.parametrize("mode", ["daily", "weekly"])
+def test_back_to_immediate_delivers_digest_held(nyx, mode):
+    tg = nyx.tg(2)
+    _set_user_prefs(tg, "creatorA", mode=mode)
+    nyx.io.enqueue(_dm("nyx2", "creatorA", "a"), _dm("nyx2", "creatorA", "b"))
+    nyx.tick()
+    assert nyx.bot.sent(tg) == []
+
+    _set_user_prefs(tg, "creatorA", mode="immediate")
+    nyx.tick()
+    assert sorted(kw["text"][-1] for _, kw in nyx.bot.sent(tg)) == ["a", "b"]
+    assert _queued(nyx) == []
+
+
+def test_muted_to_digest_keeps_holding(nyx):
+    tg = nyx.tg(1)
+    _set_user_prefs(tg, "creatorA", muted=True)
+    nyx.io.enqueue(_dm("nyx1", "creatorA", "x"))
+    nyx.tick()
+    _set_user_prefs(tg, "creatorA", muted=False, mode="daily")
+    nyx.tick()
+    assert nyx.bot.sent(tg) == []
+    assert len(_queued(nyx)) == 1
+
+
+def test_view_all_drains_muted_and_held(nyx):
+    tg = nyx.tg(3)
+    _set_user_prefs(tg, "creatorA", muted=True)
+    _set_user_prefs(tg, "creatorB", mode="weekly")
+    nyx.io.enqueue(_dm("nyx3", "creatorA", "m"), _dm("nyx3", "creatorB", "w"))
+    nyx.tick()
+    assert len(_queued(nyx)) == 2
+
+    nyx.run(show_alerts(callback_update(tg, nyx.bot, "show_alerts"), nyx.context))
+    assert _queued(nyx) == []
+    texts = [kw.get("text", "") for _, kw in nyx.bot.sent(tg)]
+    assert any("m" == t.splitlines()[-1] for t in texts) and any("w" == t.splitlines()[-1] for t in texts)
+
+
+@pytest.mark.parametrize("backend", ["json"])
+def test_muted_items_not_reprocessed_after_restart(nyx):
+    tg = nyx.tg(1)
+    _set_user_prefs(tg, "creatorA", muted=True)
+    nyx.io.enqueue(_dm("nyx1", "creatorA", "kept"))
+    nyx.tick()
+    before = nyx.io.read_queue()
+
+    nyx.io.set_queue_backend("json")   # a new process: no in-memory claim state
+    nyx.tick()
+    assert nyx.io.read_queue() == before   # no second dash_refresh follow-up
@@ -0,0 +1,23 @@
+# NyxFan/tests/test_processor.py
+"""The legacy Proxy-command processor imports and runs (it is not scheduled by default)."""
+
+from __future__ import annotations
+
+import time
+
+from api.jobs import processor
+
+
+def test_process_proxy_commands(nyx):
+    nyx.io.enqueue(
+        {"type": "dm", "nyx_id": "nyx1", "creator": "creatorA", "message": "hello"},
+        {"type": "dm", "nyx_id": "nyx404", "creator": "creatorA", "message": "nobody yet"},
+        {"type": "dm", "nyx_id": "nyx2", "creator": "creatorA", "message": "later",
+         "not_before": time.time() + 3600},
+    )
+    nyx.run(processor.process_proxy_commands(nyx.context))
+
+    assert [kw["chat_id"] for _, kw in nyx.bot.sent()] == [nyx.tg(1)]
+    left = {c["message"]: c for c in nyx.io.read_queue()}
+    assert set(left) == {"nobody yet", "later"}
+    assert left["nobody yet"]["attempts"] == 1   # backed off, not retried every pass
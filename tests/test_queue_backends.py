@@ -0,0 +1,114 @@
+# NyxFan/tests/test_queue_backends.py
+"""claim / ack / commit on every queue backend: what a consumer is handed, and when again."""
+
+from __future__ import annotations
+
+import subprocess
+import sys
+
+import pytest
+
+from api.utils import io
+from conftest import PROJECT_ROOT
+
+
+def _dm(n: int) -> dict:
+    return {"type": "fan_dm", "nyx_id": f"nyx{n}", "creator": "creatorA", "message": f"m{n}"}
+
+
+def _messages(cmds) -> list:
+    return [c.get("message") for c in cmds]
+
+
+def test_claim_filters_types_and_limit(nyx):
+    nyx.io.enqueue(_dm(1), {"type": "dash_refresh", "nyx_id": "nyx1"}, _dm(2), _dm(3))
+    assert _messages(io.claim("fan", ["fan_dm"], limit=2)) == ["m1", "m2"]
+    assert _messages(io.claim("fan", ["fan_dm"])) == ["m3"]
+    assert [c["type"] for c in io.claim("refresh", ["dash_refresh"])] == ["dash_refresh"]
+
+
+def test_in_flight_items_are_not_handed_out_twice(nyx):
+    nyx.io.enqueue(_dm(1), _dm(2))
+    first = io.claim("fan", ["fan_dm"], limit=1)
+    second = io.claim("fan", ["fan_dm"])   # an overlapping tick
+    assert _messages(first) == ["m1"] and _messages(second) == ["m2"]
+    assert io.claim("fan", ["fan_dm"]) == []
+
+
+def test_ack_removes_and_commit_holds(nyx):
+    nyx.io.enqueue(_dm(1), _dm(2))
+    done, kept = io.claim("fan", ["fan_dm"])
+    io.ack([done])
+    io.commit("fan", [done, kept])
+    assert _messages(nyx.io.read_queue()) == ["m2"]   # still on the dashboard
+    assert io.claim("fan", ["fan_dm"]) == []          # but not handed out again
+
+    nyx.io.enqueue(_dm(3))
+    assert _messages(io.claim("fan", ["fan_dm"])) == ["m3"]
+
+
+def test_commit_with_retry_hands_it_back(nyx):
+    nyx.io.enqueue(_dm(1), _dm(2))
+    claimed = io.claim("fan", ["fan_dm"])
+    io.commit("fan", claimed, retry=claimed[1:])
+    assert _messages(io.claim("fan", ["fan_dm"])) == ["m2"]
+
+
+def test_duplicates_are_counted_one_by_one(nyx):
+    nyx.io.enqueue(_dm(1), _dm(1))
+    (one,) = io.claim("fan", ["fan_dm"], limit=1)
+    io.ack([one])
+    io.commit("fan", [one])
+    (other,) = io.claim("fan", ["fan_dm"])
+    io.ack([other])
+    io.commit("fan", [other])
+    assert nyx.io.read_queue() == []
+
+
+def test_uncommitted_ack_does_not_hide_a_new_copy(nyx):
+    nyx.io.enqueue(_dm(1))
+    (c,) = io.claim("fan", ["fan_dm"])
+    io.ack([c])
+    nyx.io.enqueue(_dm(1))   # the same command again while the first is in flight
+    io.commit("fan", [c])
+    assert _messages(io.claim("fan", ["fan_dm"])) == ["m1"]
+
+
+def test_change_feed_reports_added_and_removed(nyx, monkeypatch):
+    monkeypatch.setattr(io, "_LISTENERS", [])
+    changes = []
+    io.subscribe(lambda before, after, added, removed: changes.append((added, removed)))
+    nyx.io.enqueue(_dm(1))
+    (c,) = io.claim("fan", ["fan_dm"])
+    io.ack([c])
+    added = [a for a, _ in changes if a]
+    removed = [r for _, r in changes if r]
+    assert _messages(added[0]) == ["m1"] and _messages(removed[0]) == ["m1"]
+
+
+def test_claims_shared_across_processes(nyx):
+    assert io.queue_claims_shared() is (nyx.backend == "sqlite")
+
+
+@pytest.mark.parametrize("backend", ["sqlite"])
+def test_sqlite_connections_do_not_double_claim(nyx):
+    from api.utils.queue_sqlite import SqliteQueue
+
+    nyx.io.enqueue(*(_dm(i) for i in range(4)))
+    other = SqliteQueue(io.QUEUE_DB)   # another worker process on the same file
+    mine = io.claim("fan", ["fan_dm"], limit=2)
+    theirs = other.claim("fan", {"fan_dm"})
+    assert sorted(_messages(mine + theirs)) == ["m0", "m1", "m2", "m3"]
+    assert other.claim("fan", {"fan_dm"}) == [] and io.claim("fan", ["fan_dm"]) == []
+
+
+@pytest.mark.parametrize("backend", io.QUEUE_BACKENDS)
+def test_queue_benchmark_runs(backend, tmp_path):
+    """bench/queue_hot_paths.py at a toy size: it must run, timings are not checked here."""
+    out = subprocess.run(
+        [sys.executable, "bench/queue_hot_paths.py", "--sizes", "50", "--repeat", "1",
+         "--fans", "20", "--creators", "5", "--backend", backend, "--json", str(tmp_path / "out.json")],
+        cwd=PROJECT_ROOT, capture_output=True, text=True, timeout=120,
+    )
+    assert out.returncode == 0, out.stderr
+    assert (tmp_path / "out.json").exists()
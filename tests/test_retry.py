@@ -0,0 +1,130 @@
+# NyxFan/tests/test_retry.py
+"""Backoff, attempts and dead letters for jobs that can't be delivered yet."""
+
+from __future__ import annotations
+
+import json
+import time
+
+import pytest
+
+from api.jobs import retry
+from api.utils import io
+
+
+def _deliver(nyx: str, items: list) -> dict:
+    return {"type": "fan_unlock_deliver", "nyx_id": nyx, "content_id": "c1", "items": items}
+
+
+def _item(fid: str, kind: str) -> dict:
+    return {"file_id": fid * 12, "kind": kind}
+
+
+def _queued(nyx, type_: str) -> list:
+    return [c for c in nyx.io.read_queue() if c.get("type") == type_]
+
+
+def _dead(nyx) -> list:
+    path = nyx.shared / "fan_dead_letters.jsonl"
+    return [json.loads(l) for l in path.read_text().splitlines()] if path.exists() else []
+
+
+def _failing(nyx, method: str):
+    async def _raise(*args, **kwargs):
+        nyx.bot.calls.append((method, kwargs))
+        raise RuntimeError("Forbidden: bot was blocked by the user")
+    setattr(nyx.bot, method, _raise)
+
+
+def _make_due(nyx, type_: str) -> None:
+    """Rewrite the backing-off copies as due now (instead of sleeping through the backoff)."""
+    for c in _queued(nyx, type_):
+        nyx.io.ack([c])
+        nyx.io.enqueue(dict({k: v for k, v in c.items() if k != "_qid"}, not_before=time.time() - 1))
+
+
+def test_backoff_doubles_and_caps(monkeypatch):
+    monkeypatch.setattr(retry, "RETRY_BASE", 10.0)
+    monkeypatch.setattr(retry, "RETRY_MAX_DELAY", 60.0)
+    assert [retry.backoff(n) for n in (1, 2, 3, 4, 5)] == [10.0, 20.0, 40.0, 60.0, 60.0]
+
+
+def test_defer_counts_attempts_then_dead_letters(nyx, monkeypatch):
+    monkeypatch.setattr(retry, "RETRY_MAX_ATTEMPTS", 2)
+    cmd = {"type": "fan_dm", "nyx_id": "ghost", "_qid": 7}
+    first = retry.defer(cmd, "unknown nyx_id", now=1000.0)
+    assert first["attempts"] == 1 and first["not_before"] == 1000.0 + retry.backoff(1)
+    assert "_qid" not in first
+    second = retry.defer(first, "unknown nyx_id", now=2000.0)
+    assert second["attempts"] == 2
+    assert retry.defer(second, "unknown nyx_id", now=3000.0) is None
+    assert [d["cmd"]["nyx_id"] for d in _dead(nyx)] == ["ghost"]
+
+
+def test_backing_off_job_is_not_claimed_until_due(nyx):
+    nyx.io.enqueue({"type": "fan_dm", "nyx_id": "nyx1", "creator": "c", "message": "x",
+                    "not_before": time.time() + 3600})
+    assert io.claim("fan", ["fan_dm"]) == []
+    _make_due(nyx, "fan_dm")
+    assert len(io.claim("fan", ["fan_dm"])) == 1
+
+
+def test_unknown_fan_is_deferred_not_dropped(nyx):
+    nyx.io.enqueue({"type": "fan_dm", "nyx_id": "nyx404", "creator": "c", "message": "x"})
+    nyx.tick()
+    (later,) = _queued(nyx, "fan_dm")
+    assert later["attempts"] == 1 and later["not_before"] > time.time()
+    nyx.tick()   # not due → untouched
+    assert _queued(nyx, "fan_dm") == [later]
+
+
+def test_job_without_nyx_id_is_dead_lettered(nyx):
+    nyx.io.enqueue({"type": "fan_dm", "creator": "c", "message": "x"})
+    nyx.tick()
+    assert _queued(nyx, "fan_dm") == []
+    assert [d["reason"] for d in _dead(nyx)] == ["no nyx_id"]
+
+
+def test_handler_error_backs_off_then_dead_letters(nyx, monkeypatch):
+    monkeypatch.setattr(retry, "RETRY_MAX_ATTEMPTS", 2)
+    _failing(nyx, "send_video")
+    nyx.io.enqueue(_deliver("nyx1", [_item("v", "video")]))
+
+    nyx.tick()
+    (later,) = _queued(nyx, "fan_unlock_deliver")
+    assert later["attempts"] == 1 and later["not_before"] > time.time()
+    nyx.tick()   # backing off: no new attempt
+    assert len(nyx.bot.calls) == 1
+
+    for _ in range(2):
+        _make_due(nyx, "fan_unlock_deliver")
+        nyx.tick()
+    assert len(nyx.bot.calls) == 3
+    assert _queued(nyx, "fan_unlock_deliver") == []
+    assert [d["cmd"]["type"] for d in _dead(nyx)] == ["fan_unlock_deliver"]
+
+
+def test_partial_send_retries_only_what_is_left(nyx):
+    # animation alone, then photo+video as one media group that fails
+    items = [_item("a", "animation"), _item("p", "photo"), _item("v", "video")]
+    _failing(nyx, "send_media_group")
+    nyx.io.enqueue(_deliver("nyx1", items))
+    nyx.tick()
+
+    (later,) = _queued(nyx, "fan_unlock_deliver")
+    assert later["items"] == items[1:]
+    del nyx.bot.send_media_group   # Telegram is back
+    _make_due(nyx, "fan_unlock_deliver")
+    nyx.tick()
+    assert [name for name, _ in nyx.bot.calls] == ["send_animation", "send_media_group", "send_media_group"]
+    assert _queued(nyx, "fan_unlock_deliver") == []
+
+
+@pytest.mark.parametrize("backend", ["sqlite", "log"])
+def test_retry_body_is_stored(nyx):
+    nyx.io.enqueue({"type": "fan_dm", "nyx_id": "nyx1", "message": "x"})
+    (c,) = io.claim("fan", ["fan_dm"])
+    io.commit("fan", [c], retry=[dict(c, attempts=3, not_before=time.time() + 3600)])
+    (stored,) = _queued(nyx, "fan_dm")
+    assert stored["attempts"] == 3
+    assert io.claim("fan", ["fan_dm"]) == []   # not_before is honoured too
@@ -0,0 +1,67 @@
+# NyxFan/tests/test_unlock_register.py
+"""register_many: one write per content_id, same result as registering one by one."""
+
+from __future__ import annotations
+
+import random
+
+import pytest
+
+from api.jobs.handlers.fan_unlock_register import _merge_register, register_many
+from api.utils import unlock_store
+
+
+def _reg(cid: str, nyx: str, **kw) -> dict:
+    return {"type": "fan_unlock_register", "content_id": cid, "nyx_id": nyx, **kw}
+
+
+def _changes() -> int:
+    return unlock_store._conn().total_changes
+
+
+@pytest.mark.parametrize("backend", ["json"])
+def test_repeats_across_the_batch_are_written_once(nyx):
+    items = [{"file_id": "F" * 12, "kind": "video"}]
+    batch = [
+        _reg("c1", "nyx1", items=items, title="t"),
+        _reg("c2", "nyx1", items=items),
+        _reg("c1", "nyx2", items=items, title="t", teaser_msg_chat_id=5, teaser_msg_id=9),
+    ]
+    before = _changes()
+    register_many(batch)
+    assert _changes() - before == 2   # one row per content_id, not per registration
+    assert unlock_store.get("c1")["nyx_id"] == "nyx2"   # last write wins
+    assert unlock_store.get("c1")["teaser_msg_id"] == 9
+
+    before = _changes()
+    register_many(batch)   # same registrations again (e.g. a redelivered tick)
+    assert _changes() == before
+
+
+@pytest.mark.parametrize("backend", ["json"])
+@pytest.mark.parametrize("seed", range(20))
+def test_same_result_as_one_by_one(nyx, seed):
+    rng = random.Random(seed)
+
+    def one():
+        cmd = _reg(f"c{rng.randrange(3)}", f"nyx{rng.randrange(3)}")
+        if rng.random() < 0.5:
+            cmd["title"] = rng.choice(["a", "b"])
+        if rng.random() < 0.4:
+            cmd["items"] = [{"file_id": rng.choice("XYZ") * 12, "kind": "photo"}]
+        elif rng.random() < 0.5:
+            cmd["content"] = rng.choice(["raw1", "raw2"])
+        if rng.random() < 0.3:
+            cmd["teaser_msg_chat_id"], cmd["teaser_msg_id"] = 1, rng.randrange(100)
+        return cmd
+
+    start = {"c0": {"content": "old", "creator": "k"}, "c1": {"items": ["old"]}}
+    batch = [one() for _ in range(12)]
+    expected = {cid: dict(ent) for cid, ent in start.items()}
+    for cmd in batch:
+        expected[cmd["content_id"]] = _merge_register(dict(expected.get(cmd["content_id"], {})), cmd)
+
+    for cid, ent in start.items():
+        unlock_store.put(cid, ent)
+    register_many(batch)
+    assert {cid: unlock_store.get(cid) for cid in expected} == expected
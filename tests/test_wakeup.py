@@ -0,0 +1,66 @@
+# NyxFan/tests/test_wakeup.py
+"""Wakeup-driven worker runs: one concurrency cap with the schedule, no spurious wakes."""
+
+from __future__ import annotations
+
+import asyncio
+from types import SimpleNamespace
+
+from api.jobs import wakeup
+
+
+class _Tick:
+    """A worker callback that records how many of its runs overlapped."""
+
+    def __init__(self):
+        self.running = 0
+        self.peak = 0
+        self.runs = 0
+
+    async def __call__(self, context):
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        await asyncio.sleep(0.01)
+        self.running -= 1
+        self.runs += 1
+
+
+def test_limited_caps_concurrent_runs():
+    tick = _Tick()
+    run = wakeup.limited(tick, 2)
+
+    async def main():
+        await asyncio.gather(*(run(None) for _ in range(6)))
+    asyncio.run(main())
+    assert tick.runs == 6 and tick.peak == 2
+
+
+def test_woken_and_scheduled_runs_share_the_cap(monkeypatch):
+    tick = _Tick()
+    run = wakeup.limited(tick, 1)
+    job = SimpleNamespace(name="fan_consumer", run=lambda app: run(None))
+    monkeypatch.setattr(wakeup, "_WORKERS", {})
+    wakeup.register(job, types=("fan_dm",))
+
+    async def main():
+        w = wakeup._WORKERS["fan_consumer"]
+        w["event"] = asyncio.Event()
+        drain = asyncio.ensure_future(wakeup._drain(None, w))
+        for _ in range(3):   # scheduled ticks and wakeups arriving together
+            w["event"].set()
+            await asyncio.gather(run(None), run(None), asyncio.sleep(0))
+        await asyncio.sleep(0.05)
+        drain.cancel()
+    asyncio.run(main())
+    assert tick.peak == 1 and tick.runs >= 7
+
+
+def test_unreadable_queue_does_not_wake(monkeypatch):
+    woken = []
+    monkeypatch.setattr(wakeup, "wake", lambda *types, **kw: woken.append(types))
+    monkeypatch.setitem(wakeup._STATE, "version", "v1")
+    versions = iter(["", "", "v1", "", "v2", "v2"])
+    monkeypatch.setattr(wakeup, "queue_version", lambda: next(versions))
+    for _ in range(6):
+        wakeup._external()
+    assert len(woken) == 1 and wakeup._STATE["version"] == "v2"
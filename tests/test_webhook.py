@@ -0,0 +1,52 @@
+# NyxFan/tests/test_webhook.py
+"""Webhook routes refuse to run unsafely: no secret, or claims other instances can't see."""
+
+from __future__ import annotations
+
+import pytest
+
+from api import webhook
+
+SECRET = "s3cret"
+
+
+@pytest.fixture
+def client(nyx, monkeypatch):
+    monkeypatch.setattr(webhook, "WEBHOOK_SECRET", SECRET)
+    monkeypatch.setattr(webhook, "WEBHOOK_INSECURE", False)
+    monkeypatch.setattr(webhook, "WEBHOOK_SINGLE_INSTANCE", False)
+    return webhook.server.test_client()
+
+
+def _get(client, path="/api/metrics", token=SECRET):
+    headers = {"X-Telegram-Bot-Api-Secret-Token": token} if token is not None else {}
+    return client.get(path, headers=headers)
+
+
+def test_health_needs_nothing(client):
+    assert _get(client, "/api", token=None).status_code == 200
+
+
+@pytest.mark.parametrize("backend", ["sqlite"])
+def test_no_secret_fails_closed(client, monkeypatch):
+    monkeypatch.setattr(webhook, "WEBHOOK_SECRET", "")
+    assert _get(client, token=None).status_code == 503
+    monkeypatch.setattr(webhook, "WEBHOOK_INSECURE", True)
+    assert _get(client, token=None).status_code == 200
+
+
+@pytest.mark.parametrize("backend", ["sqlite"])
+def test_wrong_secret_is_forbidden(client):
+    assert _get(client, token=None).status_code == 403
+    assert _get(client, token="nope").status_code == 403
+    assert client.get("/api/metrics", headers={"Authorization": f"Bearer {SECRET}"}).status_code == 200
+
+
+def test_per_process_claims_refused_unless_single_instance(nyx, client, monkeypatch):
+    if nyx.backend == "sqlite":
+        assert _get(client).status_code == 200
+        return
+    assert _get(client).status_code == 503
+    assert client.post("/api/drain", headers={"X-Telegram-Bot-Api-Secret-Token": SECRET}).status_code == 503
+    monkeypatch.setattr(webhook, "WEBHOOK_SINGLE_INSTANCE", True)
+    assert _get(client).status_code == 200